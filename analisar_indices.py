@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+analisar_indices.py
+Consultor de índices: executa EXPLAIN (ANALYZE, BUFFERS) em cada consulta
+de relatório (trabalho.CONSULTAS) e aponta varreduras sequenciais em
+tabelas grandes, que normalmente indicam um índice ausente.
+
+Em tabelas particionadas (migração 007) mostra também quantas leituras de
+partição a consulta fez, do máximo possível (partições x execuções do
+Append), e avisa quando uma consulta de PODA_ESPERADA lê todas elas. As
+consultas de SEM_LEITURA não podem ler essas tabelas de forma alguma.
+
+O EXPLAIN ANALYZE executa a consulta de verdade, dentro de uma transação
+que é desfeita ao final.
+
+Uso:
+  python3 analisar_indices.py                 # todas as consultas
+  python3 analisar_indices.py reports_criticos --plano
+  python3 analisar_indices.py --min-linhas 50000
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+
+import trabalho
+
+# Tables smaller than this are cheaper to scan than to index
+DEFAULT_MIN_LINHAS = 10000
+
+# Reports that must not read every partition of these tables: their filters
+# or ORDER BY ... LIMIT on the partition key let the executor skip months
+PODA_ESPERADA = {
+    'comentarios_recentes': ('interacao',),
+}
+
+# Reports served from summary tables that must not read these tables at all
+# (a partition counts as its parent)
+SEM_LEITURA = {
+    'reports_criticos': ('interacao', 'historicoatualizacao'),
+}
+
+
+def _nodes(plan):
+    """Walks a JSON plan tree depth-first."""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from _nodes(child)
+
+
+def tamanho_tabelas(cur) -> dict:
+    """Estimated row count per table (pg_class.reltuples), keyed by lower-case name."""
+    cur.execute("""
+        SELECT c.relname, GREATEST(c.reltuples, 0)::bigint
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+    """)
+    return dict(cur.fetchall())
+
+
+def particoes(cur) -> dict:
+    """Partition name -> partitioned table name, both lower-case."""
+    cur.execute("""
+        SELECT c.relname, p.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relkind = 'p'
+    """)
+    return dict(cur.fetchall())
+
+
+def leituras_particoes(resultado: dict, pais: dict) -> dict:
+    """
+    {tabela particionada: (partições lidas, máximo)} summed over every Append
+    of the plan. A partition pruned at planning or execution time, or never
+    reached because a LIMIT was already satisfied, does not count as read.
+    """
+    total = Counter(pais.values())
+    leituras = {}
+    for node in _nodes(resultado['Plan']):
+        if node['Node Type'] not in ('Append', 'Merge Append'):
+            continue
+        filhos = [f for f in node.get('Plans', ()) if pais.get(f.get('Relation Name', '').lower())]
+        if not filhos:
+            continue
+        tabela = pais[filhos[0]['Relation Name'].lower()]
+        lidas, maximo = leituras.get(tabela, (0, 0))
+        leituras[tabela] = (lidas + sum(f.get('Actual Loops', 0) for f in filhos),
+                            maximo + node.get('Actual Loops', 0) * total[tabela])
+    return leituras
+
+
+def tabelas_lidas(resultado: dict, pais: dict) -> set:
+    """Lower-case names of the tables the plan scans, partitions mapped to their parent."""
+    lidas = set()
+    for node in _nodes(resultado['Plan']):
+        if 'Relation Name' in node:
+            tabela = node['Relation Name'].lower()
+            lidas.add(pais.get(tabela, tabela))
+    return lidas
+
+
+def explicar(cur, sql: str, params=None) -> dict:
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql.strip().rstrip(';'), params)
+    return cur.fetchone()[0][0]
+
+
+def avaliar(resultado: dict, tamanhos: dict, min_linhas: int) -> list:
+    """Returns one warning per sequential scan over a table with at least min_linhas rows."""
+    avisos = []
+    for node in _nodes(resultado['Plan']):
+        if node['Node Type'] != 'Seq Scan':
+            continue
+        tabela = node['Relation Name']
+        linhas = tamanhos.get(tabela.lower(), 0)
+        if linhas < min_linhas:
+            continue
+        aviso = f"Seq Scan em {tabela} (~{linhas} linhas"
+        if 'Filter' in node:
+            aviso += f", filtro {node['Filter']}, {node.get('Rows Removed by Filter', 0)} removidas"
+        avisos.append(aviso + ")")
+    return avisos
+
+
+def analisar(nomes=None, min_linhas: int = DEFAULT_MIN_LINHAS, mostrar_plano: bool = False) -> int:
+    """Analisa as consultas pedidas; retorna o número de avisos emitidos."""
+    total_avisos = 0
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            tamanhos = tamanho_tabelas(cur)
+            pais = particoes(cur)
+            for nome in nomes or trabalho.CONSULTAS:
+                resultado = explicar(cur, trabalho.CONSULTAS[nome], trabalho.parametros_consulta(nome))
+                plano = resultado['Plan']
+                avisos = avaliar(resultado, tamanhos, min_linhas)
+                leituras = leituras_particoes(resultado, pais)
+                for tabela in PODA_ESPERADA.get(nome, ()):
+                    lidas, maximo = leituras.get(tabela, (0, 0))
+                    if maximo and lidas == maximo and maximo > 1:
+                        avisos.append(f"Sem poda de partições em {tabela} ({lidas} leituras)")
+                lidas = tabelas_lidas(resultado, pais)
+                for tabela in SEM_LEITURA.get(nome, ()):
+                    if tabela in lidas:
+                        avisos.append(f"Lê {tabela}, que a consulta deveria evitar")
+                total_avisos += len(avisos)
+                status = "⚠️ " if avisos else "✅"
+                print(f"{status} {nome}: {resultado['Execution Time']:.1f} ms "
+                      f"(planejamento {resultado['Planning Time']:.1f} ms, "
+                      f"buffers hit={plano.get('Shared Hit Blocks', 0)} read={plano.get('Shared Read Blocks', 0)})")
+                for tabela, (lidas, maximo) in sorted(leituras.items()):
+                    print(f"     {tabela}: {lidas} de {maximo} leituras de partição")
+                for aviso in avisos:
+                    print(f"     - {aviso}")
+                if mostrar_plano:
+                    print(json.dumps(plano, indent=2, ensure_ascii=False))
+        conn.rollback()
+    return total_avisos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) das consultas de relatório.")
+    parser.add_argument('consultas', nargs='*', metavar='consulta',
+                        help=f"Consultas a analisar (padrão: todas): {', '.join(trabalho.CONSULTAS)}")
+    parser.add_argument('--min-linhas', type=int, default=DEFAULT_MIN_LINHAS,
+                        help=f"Tamanho mínimo de tabela para apontar Seq Scan (padrão {DEFAULT_MIN_LINHAS})")
+    parser.add_argument('--plano', action='store_true', help="Imprime o plano completo em JSON")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+    desconhecidas = [c for c in args.consultas if c not in trabalho.CONSULTAS]
+    if desconhecidas:
+        parser.error(f"consulta(s) desconhecida(s): {', '.join(desconhecidas)}")
+    try:
+        avisos = analisar(args.consultas, args.min_linhas, args.plano)
+    finally:
+        trabalho.close_pool()
+    print(f"\n{avisos} aviso(s): varreduras sequenciais em tabelas grandes, partições sem poda "
+          f"ou tabelas que não deveriam ser lidas.")
+    return 1 if avisos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+"""
+analise_offline.py
+Os sete relatórios de trabalho.CONSULTAS calculados em memória, sobre um
+retrato colunar (NumPy) das tabelas base, sem ida ao PostgreSQL por
+relatório.
+
+O retrato copia, numa única transação REPEATABLE READ, as colunas que os
+relatórios leem de CategoriaReport, Report, Usuario, Funcionario,
+Interacao, Comentario, Avaliacao e HistoricoAtualizacao (COPY binário,
+direto para arrays de largura fixa). Textos (status, tipo, localizacao,
+nomes, títulos...) são codificados por dicionário: o código é a posição do
+valor na ordem da colação do banco, então ORDER BY e MIN() sobre texto
+viram operações sobre inteiros com o mesmo resultado do SQL.
+
+Os relatórios são recalculados das tabelas base (contagens, junções e
+agrupamentos vetorizados), não das tabelas de resumo das migrações 003,
+008 e 009; `conferir` compara cada um com a versão SQL. Partições
+arquivadas (migração 007) continuam contadas nos resumos mas não estão no
+retrato: depois de arquivar, espere divergências nas contagens.
+
+Uso:
+  python3 analise_offline.py snapshot -o painel.npz
+  python3 analise_offline.py report critical --snapshot painel.npz --dias 7
+  python3 analise_offline.py report all --snapshot painel.npz --format json -o painel.json
+  python3 analise_offline.py conferir --repeat 5     # paridade e tempo contra o SQL
+
+Dependência opcional: pip install numpy
+"""
+
+import argparse
+import datetime
+import decimal
+import functools
+import io
+import statistics
+import struct
+import sys
+import time
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover - optional dependency
+    raise ImportError("analise_offline requer NumPy: pip install numpy") from e
+
+import psycopg2
+
+import trabalho
+
+# Sentinels for NULL in fixed-width columns (floats use NaN; text columns
+# keep NULL in the dictionary)
+INT4_NULO = -2 ** 31
+TS_NULO = -2 ** 63
+
+EPOCA = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+STATUS_ATIVOS = ('Aberto', 'Em Análise')
+
+# Table -> columns copied, as (column, kind). int4/float8 are copied as is;
+# ts as microseconds since the Unix epoch; dict as the rank of the value in
+# the column's collation order (NULL sorts last and gets the last code); cpf
+# as the code of the value in the Usuario.cpf dictionary, so CPFs join on
+# integers
+TABELAS = {
+    'categoriareport': (('idcategoriareport', 'int4'), ('nome', 'dict')),
+    'report': (('idreport', 'int4'), ('idcategoriareport', 'int4'), ('titulo', 'dict'),
+               ('status', 'dict'), ('datacriacao', 'ts'), ('localizacao', 'dict'),
+               ('localizacaonormalizada', 'dict'), ('latitude', 'float8'), ('longitude', 'float8'),
+               ('celulalat', 'int4'), ('celulalon', 'int4')),
+    'usuario': (('cpf', 'dict'), ('nome', 'dict')),
+    'funcionario': (('cpf', 'cpf'), ('setor', 'dict')),
+    'interacao': (('idinteracao', 'int4'), ('idreport', 'int4'), ('cpfcidadao', 'cpf'),
+                  ('datahora', 'ts'), ('tipo', 'dict')),
+    'comentario': (('idinteracao', 'int4'), ('texto', 'dict')),
+    'avaliacao': (('idinteracao', 'int4'), ('nota', 'int4')),
+    'historicoatualizacao': (('idreport', 'int4'), ('cpffuncionario', 'cpf'),
+                             ('datahoraatualizacao', 'ts')),
+}
+
+# Tables kept sorted by their key, for searchsorted lookups
+CHAVES = {'categoriareport': 'idcategoriareport', 'report': 'idreport', 'interacao': 'idinteracao'}
+
+_DTYPES = {'int4': '>i4', 'float8': '>f8', 'ts': '>i8', 'dict': '>i4', 'cpf': '>i4'}
+_EXPRESSOES = {
+    'int4': f"COALESCE(T.{{c}}, {INT4_NULO})::int4",
+    'float8': "COALESCE(T.{c}, 'NaN')::float8",
+    'ts': f"COALESCE((EXTRACT(EPOCH FROM T.{{c}}) * 1000000)::int8, '{TS_NULO}'::int8)",
+    # Only NULL misses the dictionary join; it has the last code
+    'dict': "COALESCE({a}.c, (SELECT MAX(c) FROM {d}))",
+    'cpf': "COALESCE({a}.c, -1)",
+}
+_ASSINATURA_COPY = b'PGCOPY\n\xff\r\n\x00'
+
+
+def _tabela_dicionario(tabela: str, coluna: str, tipo: str) -> str:
+    return 'dic_usuario_cpf' if tipo == 'cpf' else f'dic_{tabela}_{coluna}'
+
+
+def _criar_dicionario(cur, tabela: str, coluna: str) -> list:
+    """
+    Builds the temporary dictionary (value, code) of tabela.coluna, codes in
+    collation order, and returns its values by code. One sort of the
+    distinct values; the table is then coded with a hash join.
+    """
+    dic = _tabela_dicionario(tabela, coluna, 'dict')
+    cur.execute(f"CREATE TEMP TABLE {dic} ON COMMIT DROP AS "
+                f"SELECT v, (ROW_NUMBER() OVER (ORDER BY v) - 1)::int4 AS c "
+                f"FROM (SELECT DISTINCT {coluna} AS v FROM {tabela}) d")
+    cur.execute(f"ANALYZE {dic}")
+    cur.execute(f"SELECT v FROM {dic} ORDER BY c")
+    return [linha[0] for linha in cur.fetchall()]
+
+
+def _copiar(cur, tabela: str, colunas) -> dict:
+    """{column: native array} of `tabela`, read with one COPY ... (FORMAT binary)."""
+    select, juncoes = [], []
+    for nome, tipo in colunas:
+        if tipo in ('dict', 'cpf'):
+            dic = _tabela_dicionario(tabela, nome, tipo)
+            alias = f'd{len(juncoes)}'
+            juncoes.append(f"LEFT JOIN {dic} {alias} ON {alias}.v = T.{nome}")
+            select.append(_EXPRESSOES[tipo].format(a=alias, d=dic))
+        else:
+            select.append(_EXPRESSOES[tipo].format(c=nome))
+    buf = io.BytesIO()
+    cur.copy_expert(f"COPY (SELECT {', '.join(select)} FROM {tabela} T {' '.join(juncoes)}) "
+                    f"TO STDOUT WITH (FORMAT binary)", buf)
+    dados = buf.getbuffer()
+    if bytes(dados[:11]) != _ASSINATURA_COPY:
+        raise ValueError(f"COPY binário inesperado em {tabela}")
+    inicio = 19 + struct.unpack('>i', dados[15:19])[0]
+    # Every field is fixed-width and non-NULL, so each tuple is one record:
+    # field count, then (length, value) per column
+    dtype = [('_campos', '>i2')]
+    for nome, tipo in colunas:
+        dtype += [(f'_{nome}', '>i4'), (nome, _DTYPES[tipo])]
+    dtype = np.dtype(dtype)
+    linhas = (len(dados) - inicio - 2) // dtype.itemsize
+    registros = np.frombuffer(dados, dtype, count=linhas, offset=inicio)
+    return {nome: registros[nome].astype(_DTYPES[tipo].replace('>', '='))
+            for nome, tipo in colunas}
+
+
+class Snapshot:
+    """
+    Columnar copy of the tables the reports read.
+
+    tabelas[tabela][coluna] is a NumPy array; dicionarios[(tabela, coluna)]
+    the values of a dict-encoded column, indexed by code. Derived indexes
+    (joins, per-report counts) are computed on first use and reused by
+    every later report on the same snapshot.
+    """
+
+    def __init__(self, tabelas: dict, dicionarios: dict, tirado_em: datetime.datetime):
+        self.tabelas = tabelas
+        self.dicionarios = dicionarios
+        self.tirado_em = tirado_em
+        self._objetos = {}
+        for tabela, chave in CHAVES.items():
+            ordem = np.argsort(tabelas[tabela][chave], kind='stable')
+            tabelas[tabela] = {c: v[ordem] for c, v in tabelas[tabela].items()}
+
+    @classmethod
+    def do_banco(cls) -> 'Snapshot':
+        """Copies the tables from the database, all in one REPEATABLE READ transaction."""
+        tabelas, dicionarios = {}, {}
+        with trabalho.get_connection() as conn:
+            with conn.cursor() as cur:
+                # Not READ ONLY: the dictionaries are temporary tables
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute("SELECT NOW()")
+                tirado_em = cur.fetchone()[0]
+                for tabela, colunas in TABELAS.items():
+                    for coluna, tipo in colunas:
+                        if tipo == 'dict':
+                            dicionarios[(tabela, coluna)] = _criar_dicionario(cur, tabela, coluna)
+                for tabela, colunas in TABELAS.items():
+                    tabelas[tabela] = _copiar(cur, tabela, colunas)
+                conn.rollback()
+        return cls(tabelas, dicionarios, tirado_em)
+
+    def salvar(self, caminho: str):
+        """Writes the snapshot to a compressed .npz (no pickled objects)."""
+        arrays = {'tirado_em': np.array([(self.tirado_em - EPOCA) // datetime.timedelta(microseconds=1)])}
+        for tabela, colunas in self.tabelas.items():
+            for coluna, valores in colunas.items():
+                arrays[f'{tabela}.{coluna}'] = valores
+        for (tabela, coluna), valores in self.dicionarios.items():
+            # PostgreSQL text cannot hold NUL, so it separates the values;
+            # NULL, when present, is the last code
+            nulo = bool(valores) and valores[-1] is None
+            textos = valores[:-1] if nulo else valores
+            arrays[f'{tabela}.{coluna}:dicionario'] = np.frombuffer('\0'.join(textos).encode(), dtype=np.uint8)
+            arrays[f'{tabela}.{coluna}:tamanho'] = np.array([len(textos), nulo])
+        np.savez_compressed(caminho, **arrays)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> 'Snapshot':
+        with np.load(caminho) as arquivo:
+            tirado_em = EPOCA + datetime.timedelta(microseconds=int(arquivo['tirado_em'][0]))
+            tabelas, dicionarios = {}, {}
+            for chave in arquivo.files:
+                if chave.endswith(':dicionario'):
+                    nome = chave[:-len(':dicionario')]
+                    tamanho, nulo = arquivo[f'{nome}:tamanho'].tolist()
+                    textos = arquivo[chave].tobytes().decode().split('\0') if tamanho else []
+                    dicionarios[tuple(nome.split('.'))] = textos + [None] * nulo
+                elif '.' in chave and ':' not in chave:
+                    tabela, coluna = chave.split('.')
+                    tabelas.setdefault(tabela, {})[coluna] = arquivo[chave]
+        return cls(tabelas, dicionarios, tirado_em)
+
+    def __len__(self) -> int:
+        return sum(len(next(iter(c.values()))) for c in self.tabelas.values())
+
+    # ---- dictionaries ----
+
+    def textos(self, tabela: str, coluna: str, codigos) -> list:
+        """Decodes dict codes of tabela.coluna to their values (-1, no match, to None)."""
+        if (tabela, coluna) not in self.dicionarios:
+            tabela, coluna = 'usuario', 'cpf'  # cpf columns share Usuario's dictionary
+        objetos = self._objetos.get((tabela, coluna))
+        if objetos is None:
+            valores = self.dicionarios[(tabela, coluna)]
+            objetos = self._objetos[(tabela, coluna)] = np.empty(len(valores) + 1, dtype=object)
+            objetos[:-1] = valores
+        return objetos[codigos].tolist()
+
+    def texto(self, tabela: str, coluna: str, codigo: int):
+        return self.textos(tabela, coluna, [codigo])[0]
+
+    def codigo(self, tabela: str, coluna: str, valor) -> int:
+        """Code of `valor` in tabela.coluna, or -1 when absent."""
+        try:
+            return self.dicionarios[(tabela, coluna)].index(valor)
+        except ValueError:
+            return -1
+
+    # ---- derived indexes ----
+
+    @staticmethod
+    def _posicoes(chaves: np.ndarray, procurados: np.ndarray) -> np.ndarray:
+        """Row of each `procurados` value in the sorted `chaves`, -1 when absent."""
+        if len(chaves) == 0:
+            return np.full(len(procurados), -1, dtype=np.int64)
+        pos = np.searchsorted(chaves, procurados)
+        pos[pos == len(chaves)] = 0
+        return np.where(chaves[pos] == procurados, pos, -1)
+
+    @functools.cached_property
+    def interacao_report(self) -> np.ndarray:
+        return self._posicoes(self.tabelas['report']['idreport'], self.tabelas['interacao']['idreport'])
+
+    @functools.cached_property
+    def historico_report(self) -> np.ndarray:
+        return self._posicoes(self.tabelas['report']['idreport'],
+                              self.tabelas['historicoatualizacao']['idreport'])
+
+    @functools.cached_property
+    def report_categoria(self) -> np.ndarray:
+        return self._posicoes(self.tabelas['categoriareport']['idcategoriareport'],
+                              self.tabelas['report']['idcategoriareport'])
+
+    @functools.cached_property
+    def usuario_por_cpf(self) -> np.ndarray:
+        """Usuario row of each cpf code (cpf codes are a permutation of the rows)."""
+        linhas = np.empty(len(self.tabelas['usuario']['cpf']) + 1, dtype=np.int64)
+        linhas[self.tabelas['usuario']['cpf']] = np.arange(len(linhas) - 1)
+        linhas[-1] = -1
+        return linhas
+
+    @functools.cached_property
+    def interacoes_por_report(self) -> np.ndarray:
+        idx = self.interacao_report
+        return np.bincount(idx[idx >= 0], minlength=len(self.tabelas['report']['idreport']))
+
+    @functools.cached_property
+    def ultima_atualizacao(self) -> np.ndarray:
+        """MAX(dataHoraAtualizacao) per report, TS_NULO when never updated."""
+        ultima = np.full(len(self.tabelas['report']['idreport']), TS_NULO, dtype=np.int64)
+        idx = self.historico_report
+        validos = idx >= 0
+        np.maximum.at(ultima, idx[validos], self.tabelas['historicoatualizacao']['datahoraatualizacao'][validos])
+        return ultima
+
+    @functools.cached_property
+    def reports_por_cpf(self) -> np.ndarray:
+        """Distinct reports updated, per cpf code (ResumoFuncionario)."""
+        h = self.tabelas['historicoatualizacao']
+        pares = _distintos(h['cpffuncionario'].astype(np.int64) << 32 | h['idreport'].astype(np.int64))
+        return np.bincount((pares >> 32)[pares >= 0], minlength=len(self.tabelas['usuario']['cpf']))
+
+    @functools.cached_property
+    def categorias_por_cpf(self) -> np.ndarray:
+        """Distinct categories of the reports updated, per cpf code (CoberturaFuncionarioCategoria)."""
+        report = self.historico_report
+        categoria = np.where(report >= 0, self.report_categoria[report], -1)
+        cpf = self.tabelas['historicoatualizacao']['cpffuncionario']
+        validos = (categoria >= 0) & (cpf >= 0)
+        pares = _distintos(cpf[validos].astype(np.int64) << 32 | categoria[validos])
+        return np.bincount(pares >> 32, minlength=len(self.tabelas['usuario']['cpf']))
+
+    @functools.cached_property
+    def avaliacao_report(self) -> np.ndarray:
+        interacao = self._posicoes(self.tabelas['interacao']['idinteracao'],
+                                   self.tabelas['avaliacao']['idinteracao'])
+        return np.where(interacao >= 0, self.interacao_report[interacao], -1)
+
+    @functools.cached_property
+    def comentarios_por_data(self) -> tuple:
+        """(Comentario row, report, Usuario row, dataHora) of the joinable comments, newest first."""
+        i = self.tabelas['interacao']
+        interacao = self._posicoes(i['idinteracao'], self.tabelas['comentario']['idinteracao'])
+        linhas = np.flatnonzero(interacao >= 0)
+        interacao = interacao[linhas]
+        report = self.interacao_report[interacao]
+        usuario = self.usuario_por_cpf[i['cpfcidadao'][interacao]]
+        validos = (report >= 0) & (usuario >= 0)
+        data = i['datahora'][interacao[validos]]
+        ordem = np.argsort(-data, kind='stable')
+        return linhas[validos][ordem], report[validos][ordem], usuario[validos][ordem], data[ordem]
+
+    @functools.cached_property
+    def reports_ativos(self) -> np.ndarray:
+        status = self.tabelas['report']['status']
+        return np.isin(status, [self.codigo('report', 'status', s) for s in STATUS_ATIVOS])
+
+
+# -------------------------
+# Relatórios
+# -------------------------
+
+def _datas(microssegundos) -> list:
+    return [None if v == TS_NULO else EPOCA + datetime.timedelta(microseconds=v)
+            for v in microssegundos.tolist()]
+
+def _decimal(valor: float, casas: int) -> Optional[decimal.Decimal]:
+    """ROUND(valor::numeric, casas): float8 -> numeric keeps 15 significant digits, ties away from zero."""
+    if valor is None or valor != valor:
+        return None
+    return decimal.Decimal(f"{valor:.15g}").quantize(decimal.Decimal(1).scaleb(-casas), decimal.ROUND_HALF_UP)
+
+def _microssegundos(agora: datetime.datetime) -> int:
+    return (agora - EPOCA) // datetime.timedelta(microseconds=1)
+
+def _total_interacoes(s: Snapshot, params, agora) -> list:
+    r = s.tabelas['report']
+    total = s.interacoes_por_report
+    ordem = np.lexsort((r['idreport'], -total))
+    ordem = ordem[s.report_categoria[ordem] >= 0]
+    categorias = s.tabelas['categoriareport']['nome'][s.report_categoria[ordem]]
+    return list(zip(r['idreport'][ordem].tolist(), s.textos('report', 'titulo', r['titulo'][ordem]),
+                    s.textos('report', 'status', r['status'][ordem]),
+                    s.textos('categoriareport', 'nome', categorias), total[ordem].tolist()))
+
+def _reports_por_funcionario(s: Snapshot, params, agora) -> list:
+    f = s.tabelas['funcionario']
+    linhas_usuario = s.usuario_por_cpf[f['cpf']]
+    validos = linhas_usuario >= 0
+    cpfs, setores, linhas_usuario = f['cpf'][validos], f['setor'][validos], linhas_usuario[validos]
+    nomes = s.tabelas['usuario']['nome'][linhas_usuario]
+    # One row per (nome, setor); homonyms in the same sector count their distinct reports once
+    chaves, grupo = _grupos(nomes.astype(np.int64) << 32 | (setores.astype(np.int64) + 1))
+    grupo_por_cpf = np.full(len(s.tabelas['usuario']['cpf']) + 1, -1, dtype=np.int64)
+    grupo_por_cpf[cpfs] = grupo
+    h = s.tabelas['historicoatualizacao']
+    grupos = grupo_por_cpf[h['cpffuncionario']]
+    validos = grupos >= 0
+    pares = _distintos(grupos[validos] << 32 | h['idreport'][validos].astype(np.int64))
+    total = np.bincount(pares >> 32, minlength=len(chaves))
+    nomes, setores = chaves >> 32, (chaves & 0xFFFFFFFF) - 1
+    ordem = np.lexsort((nomes, -total))
+    return list(zip(s.textos('usuario', 'nome', nomes[ordem]), s.textos('funcionario', 'setor', setores[ordem]),
+                    total[ordem].tolist()))
+
+def _media_avaliacoes(s: Snapshot, params, agora) -> list:
+    a, r = s.tabelas['avaliacao'], s.tabelas['report']
+    report = s.avaliacao_report
+    validos = report >= 0
+    validos[validos] = r['status'][report[validos]] == s.codigo('report', 'status', 'Resolvido')
+    categoria = s.report_categoria[report[validos]]
+    notas = a['nota'][validos][categoria >= 0]
+    categoria = categoria[categoria >= 0]
+    n = len(s.tabelas['categoriareport']['idcategoriareport'])
+    soma = np.bincount(categoria, weights=notas, minlength=n)
+    qtd = np.bincount(categoria, minlength=n)
+    linhas = []
+    for c in np.flatnonzero((qtd > 0) & (soma > 4.0 * qtd)).tolist():
+        media = (decimal.Decimal(int(soma[c])) / decimal.Decimal(int(qtd[c]))).quantize(
+            decimal.Decimal('0.01'), decimal.ROUND_HALF_UP)
+        linhas.append((s.texto('categoriareport', 'nome', s.tabelas['categoriareport']['nome'][c]), media))
+    linhas.sort(key=lambda linha: linha[1], reverse=True)
+    return linhas
+
+def _funcionarios_todos_categorias(s: Snapshot, params, agora) -> list:
+    f = s.tabelas['funcionario']
+    n = len(s.tabelas['categoriareport']['idcategoriareport'])
+    linhas_usuario = s.usuario_por_cpf[f['cpf']]
+    cpfs = f['cpf'][linhas_usuario >= 0]
+    nomes = s.tabelas['usuario']['nome'][linhas_usuario[linhas_usuario >= 0]]
+    total = s.categorias_por_cpf[cpfs]
+    minimo = decimal.Decimal(str(params['min_percentual'])) * n
+    selecionados = np.array([100 * c >= minimo for c in total.tolist()], dtype=bool)
+    ordem = np.flatnonzero(selecionados)
+    ordem = ordem[np.lexsort((nomes[ordem], -total[ordem]))]
+    linhas = []
+    for cpf, nome, c in zip(s.textos('usuario', 'cpf', cpfs[ordem]), s.textos('usuario', 'nome', nomes[ordem]),
+                            total[ordem].tolist()):
+        percentual = ((decimal.Decimal(100 * c) / n).quantize(decimal.Decimal('0.1'), decimal.ROUND_HALF_UP)
+                      if n else decimal.Decimal(100))
+        linhas.append((cpf, nome, c, n, percentual))
+    return linhas
+
+def _reports_criticos(s: Snapshot, params, agora) -> list:
+    r = s.tabelas['report']
+    total = s.interacoes_por_report
+    ultima = s.ultima_atualizacao
+    # INNER JOIN ResumoInteracoesReport: reports without interactions never qualify
+    filtro = s.reports_ativos & (total > 0) & (total >= params['min_interacoes'])
+    if params['dias'] is not None:
+        referencia = np.where(ultima != TS_NULO, ultima, r['datacriacao'])
+        limite = _microssegundos(agora - datetime.timedelta(days=params['dias']))
+        filtro &= (referencia != TS_NULO) & (referencia < limite)
+    ordem = np.flatnonzero(filtro)
+    ordem = ordem[np.lexsort((r['idreport'][ordem], -total[ordem]))]
+    return list(zip(r['idreport'][ordem].tolist(), s.textos('report', 'titulo', r['titulo'][ordem]),
+                    _datas(r['datacriacao'][ordem]), total[ordem].tolist(), _datas(ultima[ordem])))
+
+def _distintos(valores: np.ndarray) -> np.ndarray:
+    """Sorted distinct values (sort-based; np.unique may hash, which is slower here)."""
+    valores = np.sort(valores)
+    return valores[np.concatenate(([True], valores[1:] != valores[:-1]))] if len(valores) else valores
+
+def _grupos(chaves: np.ndarray) -> tuple:
+    """(sorted distinct keys, group of each row)."""
+    return np.unique(chaves, return_inverse=True)
+
+def _areas_problematicas(s: Snapshot, params, agora) -> list:
+    r = s.tabelas['report']
+    agora_s = _microssegundos(agora) / 1e6
+    dias = params['dias']
+    corte = None if dias is None else _microssegundos(agora - datetime.timedelta(days=dias))
+    criacao = r['datacriacao']
+    geocodificados = s.reports_ativos & ~np.isnan(r['latitude'])
+    # ResumoHotspot (or the window) only counts reports with a creation date
+    if corte is None:
+        celulas = geocodificados & (criacao != TS_NULO)
+    else:
+        celulas = geocodificados & (criacao != TS_NULO) & (criacao >= corte)
+    k = max(1.0, float(np.rint(params['raio_m'] / 111.32)))
+    gy = np.floor(r['celulalat'][celulas] / k).astype(np.int64)
+    gx = np.floor(r['celulalon'][celulas] / k).astype(np.int64)
+    chaves, grupo = _grupos(gy << 32 | (gx + 2 ** 31))
+    total = np.bincount(grupo).astype(np.int64)
+    soma_lat = np.bincount(grupo, weights=r['latitude'][celulas])
+    soma_lon = np.bincount(grupo, weights=r['longitude'][celulas])
+    soma_criacao = np.bincount(grupo, weights=criacao[celulas] / 1e6)
+    gy, gx = chaves >> 32, (chaves & 0xFFFFFFFF) - 2 ** 31
+
+    # Each grid cell joined to its 8 neighbours
+    vizinhos = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+    posicoes = []
+    for dy, dx in vizinhos:
+        pos = Snapshot._posicoes(chaves, (gy + dy) << 32 | (gx + dx + 2 ** 31))
+        posicoes.append(pos)
+    soma = [np.zeros(len(chaves)) for _ in range(3)]
+    agrupado = np.zeros(len(chaves), dtype=np.int64)
+    for pos in posicoes:
+        achou = pos >= 0
+        agrupado[achou] += total[pos[achou]]
+        for acumulado, parcela in zip(soma, (soma_lat, soma_lon, soma_criacao)):
+            acumulado[achou] += parcela[pos[achou]]
+    # Local peaks: no neighbour with a larger (total, gy, gx)
+    pico = agrupado > 1
+    for (dy, dx), pos in zip(vizinhos, posicoes):
+        achou = pos >= 0
+        vizinho = np.where(achou, agrupado[np.maximum(pos, 0)], -1)
+        menor_ou_igual = (vizinho < agrupado) | ((vizinho == agrupado) & ((dy, dx) <= (0, 0)))
+        pico &= ~achou | menor_ou_igual
+    hotspots = []
+    for i in np.flatnonzero(pico).tolist():
+        media = soma[2][i] / agrupado[i]
+        hotspots.append((int(gy[i]), int(gx[i]), None, soma[0][i] / agrupado[i], soma[1][i] / agrupado[i],
+                         int(agrupado[i]), _decimal((agora_s - media) / 3600, 2)))
+
+    # Reports without coordinates, grouped by normalized address
+    sem_coordenadas = s.reports_ativos & np.isnan(r['latitude'])
+    if corte is not None:
+        sem_coordenadas &= (criacao != TS_NULO) & (criacao >= corte)
+    enderecos, grupo = _grupos(r['localizacaonormalizada'][sem_coordenadas])
+    contagem = np.bincount(grupo, minlength=len(enderecos))
+    localizacao = np.full(len(enderecos), np.iinfo(np.int32).max, dtype=np.int64)
+    np.minimum.at(localizacao, grupo, r['localizacao'][sem_coordenadas])
+    datas = criacao[sem_coordenadas]
+    com_data = datas != TS_NULO
+    n_datas = np.bincount(grupo[com_data], minlength=len(enderecos))
+    soma_datas = np.bincount(grupo[com_data], weights=datas[com_data] / 1e6, minlength=len(enderecos))
+    for g in np.flatnonzero(contagem > 1).tolist():
+        horas = (_decimal((agora_s - soma_datas[g] / n_datas[g]) / 3600, 2) if n_datas[g] else None)
+        hotspots.append((None, None, s.texto('report', 'localizacao', localizacao[g]), None, None,
+                         int(contagem[g]), horas))
+
+    # ORDER BY total DESC, MediaHorasAberto DESC (NULLs first) LIMIT
+    hotspots.sort(key=lambda h: (h[5], h[6] is None, h[6] or 0), reverse=True)
+    topo = hotspots[:params['limite']]
+    if any(h[2] is None for h in topo):
+        celula_lat, celula_lon = r['celulalat'], r['celulalon']
+        candidatos = np.flatnonzero(geocodificados)
+    linhas = []
+    for gy_, gx_, endereco, lat, lon, total_, horas in topo:
+        if endereco is None:
+            # Most frequent address in the peak's central cell
+            dentro = candidatos[(np.floor(celula_lat[candidatos] / k) == gy_)
+                                & (np.floor(celula_lon[candidatos] / k) == gx_)]
+            normalizados, grupo = _grupos(r['localizacaonormalizada'][dentro])
+            mais_frequente = np.argmax(np.bincount(grupo))  # first of the ties = lowest address
+            endereco = s.texto('report', 'localizacao',
+                                r['localizacao'][dentro][grupo == mais_frequente].min())
+        linhas.append((endereco, _decimal(lat, 5), _decimal(lon, 5), total_, horas))
+    return linhas
+
+def _comentarios_recentes(s: Snapshot, params, agora) -> list:
+    c, r = s.tabelas['comentario'], s.tabelas['report']
+    linhas, report, usuario, data = s.comentarios_por_data
+    ordem = np.flatnonzero(s.reports_ativos[report])[:params['limite']]
+    return list(zip(r['idreport'][report[ordem]].tolist(), s.textos('report', 'titulo', r['titulo'][report[ordem]]),
+                    s.textos('usuario', 'nome', s.tabelas['usuario']['nome'][usuario[ordem]]),
+                    s.textos('comentario', 'texto', c['texto'][linhas[ordem]]), _datas(data[ordem])))
+
+# CONSULTAS key -> (kernel, column names as returned by the SQL version)
+RELATORIOS = {
+    'total_interacoes': (_total_interacoes,
+                         ('idreport', 'titulo', 'status', 'categoria', 'totalinteracoes')),
+    'reports_por_funcionario': (_reports_por_funcionario,
+                                ('nomefuncionario', 'setor', 'reportsatualizados')),
+    'media_avaliacoes': (_media_avaliacoes, ('categoria', 'notamedia')),
+    'funcionarios_todos_categorias': (_funcionarios_todos_categorias,
+                                      ('cpf', 'nome', 'categoriascobertas', 'totalcategorias',
+                                       'percentualcobertura')),
+    'reports_criticos': (_reports_criticos,
+                         ('idreport', 'titulo', 'datacriacao', 'totalinteracoes',
+                          'ultimaatualizacaofuncionario')),
+    'areas_problematicas': (_areas_problematicas,
+                            ('localizacao', 'latitude', 'longitude', 'totalreportsativos',
+                             'mediahorasaberto')),
+    'comentarios_recentes': (_comentarios_recentes,
+                             ('idreport', 'tituloreport', 'nomecidadao', 'comentario', 'datacomentario')),
+}
+
+
+def consulta(snapshot: Snapshot, nome: str, params: Optional[dict] = None,
+             agora: Optional[datetime.datetime] = None, header: bool = False) -> list:
+    """
+    Rows of report `nome` computed on `snapshot`, as trabalho.consulta_rows()
+    would return them (same parameters and defaults, same column order and
+    Python types). `agora` stands for NOW() (default: the current time).
+    """
+    if nome not in RELATORIOS:
+        raise ValueError(f"Relatório desconhecido: {nome}")
+    params = trabalho.parametros_consulta(nome, params)
+    kernel, colunas = RELATORIOS[nome]
+    linhas = kernel(snapshot, params, agora or datetime.datetime.now(datetime.timezone.utc))
+    return [colunas, *linhas] if header else linhas
+
+
+def painel(snapshot: Snapshot, nomes=None, params: Optional[dict] = None,
+           max_linhas: Optional[int] = None) -> trabalho.Painel:
+    """Every report on `snapshot`, as the trabalho.Painel that trabalho.executar_painel() returns."""
+    nomes = list(nomes or RELATORIOS)
+    params = params or {}
+    if max_linhas is None:
+        max_linhas = trabalho.PAINEL_CONFIG['max_linhas']
+    inicio = datetime.datetime.now(datetime.timezone.utc)
+    t = time.perf_counter()
+    relatorios = {}
+    for nome in nomes:
+        t_relatorio = time.perf_counter()
+        try:
+            colunas, *linhas = consulta(snapshot, nome, params.get(nome), inicio, header=True)
+        except ValueError as e:
+            relatorios[nome] = trabalho.RelatorioPainel(nome, (), (), False,
+                                                        time.perf_counter() - t_relatorio, str(e))
+            continue
+        completo = max_linhas is None or len(linhas) <= max_linhas
+        relatorios[nome] = trabalho.RelatorioPainel(nome, colunas, tuple(linhas[:max_linhas]), completo,
+                                                    time.perf_counter() - t_relatorio, None)
+    return trabalho.Painel(inicio, time.perf_counter() - t, relatorios)
+
+
+# -------------------------
+# Paridade com o SQL
+# -------------------------
+
+# Ordering key of each report's ORDER BY: rows are compared in groups of
+# equal keys, since the order inside a group is not defined by the SQL
+ORDEM_RELATORIOS = {
+    'total_interacoes': lambda linha: (linha[4], linha[0]),
+    'reports_por_funcionario': lambda linha: (linha[2],),
+    'media_avaliacoes': lambda linha: (linha[1],),
+    'funcionarios_todos_categorias': lambda linha: (linha[2],),
+    'reports_criticos': lambda linha: (linha[3], linha[0]),
+    'areas_problematicas': lambda linha: (linha[3],),
+    'comentarios_recentes': lambda linha: (linha[4],),
+}
+
+# Columns computed from floating-point sums and NOW(): equal up to one unit
+# in the last rounded digit
+TOLERANCIAS = {
+    'areas_problematicas': {1: decimal.Decimal('0.00001'), 2: decimal.Decimal('0.00001'),
+                            4: decimal.Decimal('0.01')},
+}
+
+
+def _linhas_iguais(a: tuple, b: tuple, tolerancias: dict) -> bool:
+    if len(a) != len(b):
+        return False
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x == y:
+            continue
+        if i in tolerancias and x is not None and y is not None and abs(x - y) <= tolerancias[i]:
+            continue
+        return False
+    return True
+
+
+def _grupos_ordem(linhas: list, chave) -> list:
+    grupos = []
+    for linha in linhas:
+        if grupos and chave(grupos[-1][0]) == chave(linha):
+            grupos[-1].append(linha)
+        else:
+            grupos.append([linha])
+    return grupos
+
+
+def comparar(nome: str, esperadas: list, obtidas: list, params: Optional[dict] = None) -> Optional[str]:
+    """None when `obtidas` matches the SQL rows `esperadas` of report `nome`; otherwise what differs."""
+    if len(esperadas) != len(obtidas):
+        return f"{len(obtidas)} linhas, SQL retornou {len(esperadas)}"
+    chave = ORDEM_RELATORIOS[nome]
+    tolerancias = TOLERANCIAS.get(nome, {})
+    grupos_sql, grupos_offline = _grupos_ordem(esperadas, chave), _grupos_ordem(obtidas, chave)
+    params = trabalho.parametros_consulta(nome, params) or {}
+    cortado = 'limite' in params and len(esperadas) == params['limite']
+    for n, (g_sql, g_offline) in enumerate(zip(grupos_sql, grupos_offline)):
+        if len(g_sql) != len(g_offline) or chave(g_sql[0]) != chave(g_offline[0]):
+            return f"ordem difere a partir de {g_sql[0]!r} (offline: {g_offline[0]!r})"
+        if cortado and n == len(grupos_sql) - 1:
+            break  # LIMIT cut a group of ties: which of them come back is not defined
+        restantes = list(g_offline)
+        for linha in g_sql:
+            par = next((i for i, outra in enumerate(restantes) if _linhas_iguais(linha, outra, tolerancias)), None)
+            if par is None:
+                return f"linha {linha!r} sem correspondente offline"
+            del restantes[par]
+    if len(grupos_sql) != len(grupos_offline):
+        return "agrupamento da ordem difere"
+    return None
+
+
+def conferir(snapshot: Snapshot, nomes=None, repeat: int = 1) -> list:
+    """
+    Runs every report `repeat` times in SQL (uncached) and on `snapshot`.
+    Returns [(nome, divergence or None, SQL seconds, offline seconds)] with
+    median times; take the snapshot right before, with no writes in between.
+    """
+    resultado = []
+    for nome in nomes or RELATORIOS:
+        params = trabalho.parametros_consulta(nome)
+        tempos_sql, tempos_offline = [], []
+        for _ in range(repeat):
+            agora = datetime.datetime.now(datetime.timezone.utc)
+            t = time.perf_counter()
+            esperadas = list(trabalho.linhas_consulta(nome, params))
+            tempos_sql.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            obtidas = consulta(snapshot, nome, agora=agora)
+            tempos_offline.append(time.perf_counter() - t)
+        resultado.append((nome, comparar(nome, esperadas, obtidas), statistics.median(tempos_sql),
+                          statistics.median(tempos_offline)))
+    return resultado
+
+
+# -------------------------
+# Linha de comando
+# -------------------------
+
+def _snapshot(args) -> Snapshot:
+    if args.snapshot:
+        return Snapshot.carregar(args.snapshot)
+    return Snapshot.do_banco()
+
+
+def cli_snapshot(args) -> int:
+    t = time.perf_counter()
+    snapshot = Snapshot.do_banco()
+    copia = time.perf_counter() - t
+    snapshot.salvar(args.output)
+    print(f"{len(snapshot)} linhas copiadas em {copia:.2f} s -> {args.output}", file=sys.stderr)
+    return 0
+
+
+def cli_report(args) -> int:
+    snapshot = _snapshot(args)
+    if args.nome == 'all':
+        params = {nome: trabalho._params_cli(args, nome) or None for nome in RELATORIOS}
+        resultado = painel(snapshot, params=params, max_linhas=args.limit)
+        with trabalho._open_output(args.output) as out:
+            trabalho.exportar_painel(resultado, out, args.format)
+        print(f"{len(resultado.relatorios)} relatórios em {resultado.segundos:.3f} s "
+              f"(retrato de {snapshot.tirado_em.astimezone():%d/%m/%Y %H:%M})", file=sys.stderr)
+        return 1 if any(r.erro for r in resultado.relatorios.values()) else 0
+    nome = trabalho.RELATORIOS_CLI.get(args.nome, args.nome)
+    params = trabalho._params_cli(args, nome) if nome in RELATORIOS else {}
+    linhas = consulta(snapshot, nome, params or None, header=True)
+    if args.limit is not None and 'limite' not in params:
+        linhas = linhas[:args.limit + 1]  # + header
+    with trabalho._open_output(args.output) as out:
+        trabalho.exportar_linhas(iter(linhas), out, args.format)
+    return 0
+
+
+def cli_conferir(args) -> int:
+    t = time.perf_counter()
+    snapshot = _snapshot(args)
+    print(f"Retrato: {len(snapshot)} linhas em {time.perf_counter() - t:.2f} s")
+    divergentes = 0
+    print(f"{'Relatório':<32} | {'SQL ms':>9} | {'Offline ms':>10} | Paridade")
+    print("-" * 70)
+    resultado = conferir(snapshot, [trabalho.RELATORIOS_CLI.get(n, n) for n in args.reports] or None, args.repeat)
+    for nome, divergencia, sql, offline in resultado:
+        divergentes += divergencia is not None
+        print(f"{nome:<32} | {sql * 1000:>9.1f} | {offline * 1000:>10.1f} | {divergencia or 'ok'}")
+    soma_sql = sum(r[2] for r in resultado)
+    soma_offline = sum(r[3] for r in resultado)
+    print(f"{'Painel':<32} | {soma_sql * 1000:>9.1f} | {soma_offline * 1000:>10.1f} |")
+    return 1 if divergentes else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Relatórios calculados sobre um retrato colunar (NumPy) das tabelas.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    snap = sub.add_parser('snapshot', help="Copia as tabelas para um arquivo .npz")
+    snap.add_argument('--output', '-o', required=True, help="Arquivo .npz de saída")
+    snap.set_defaults(func=cli_snapshot)
+
+    rep = sub.add_parser('report', help="Calcula um relatório (ou all) sobre o retrato")
+    rep.add_argument('nome', help=f"Relatório: {', '.join(trabalho.RELATORIOS_CLI)} (ou o nome em CONSULTAS); all: todos")
+    rep.add_argument('--snapshot', help="Arquivo .npz (padrão: copia o banco agora)")
+    rep.add_argument('--limit', type=int, help="Máximo de linhas (hotspots/comments: parâmetro da consulta)")
+    rep.add_argument('--raio', type=float, help="hotspots: raio de agrupamento em metros")
+    rep.add_argument('--dias', type=int, help="hotspots: janela em dias; critical: sem atualização há mais de N dias")
+    rep.add_argument('--min-interacoes', type=int, help="critical: mínimo de interações (padrão 2)")
+    rep.add_argument('--min-percentual', type=float, help="experts: cobertura mínima de categorias em %%")
+    rep.add_argument('--format', choices=('csv', 'json', 'jsonl'), default='csv')
+    rep.add_argument('--output', '-o', help="Arquivo de saída (padrão: stdout)")
+    rep.set_defaults(func=cli_report)
+
+    conf = sub.add_parser('conferir', help="Compara cada relatório com a versão SQL (resultado e tempo)")
+    conf.add_argument('reports', nargs='*', help="Relatórios a conferir (padrão: todos)")
+    conf.add_argument('--snapshot', help="Arquivo .npz (padrão: copia o banco agora)")
+    conf.add_argument('--repeat', type=int, default=3, help="Execuções por relatório (padrão 3)")
+    conf.set_defaults(func=cli_conferir)
+
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+    try:
+        return args.func(args)
+    except (psycopg2.Error, ValueError, OSError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        trabalho.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
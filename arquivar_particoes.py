@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+arquivar_particoes.py
+Manutenção das partições mensais de Interacao e HistoricoAtualizacao
+(migração 007).
+
+A cada execução:
+  1. cria as partições do mês corrente e dos próximos --futuras meses
+     (criar_particoes_futuras()), para que nenhuma inserção fique sem
+     partição;
+  2. com --manter N, arquiva as partições dos meses anteriores aos N
+     últimos meses completos: DETACH PARTITION ... CONCURRENTLY, exporta as
+     linhas para <destino>/<partição>.csv.gz e, numa só transação, apaga as
+     especializações (Comentario/Upvote/Avaliacao) e a partição.
+
+O arquivo de interações já traz texto/nota/comentario das especializações,
+no layout de carga_em_massa.py, que o recarrega se preciso:
+  python3 carga_em_massa.py --interacoes arquivo/interacao_p2024_01.csv.gz
+
+Uma partição desanexada mas ainda não exportada (execução interrompida) é
+retomada na execução seguinte. Os resumos da migração 003 continuam
+contando o histórico arquivado; recalcular_resumos() recontaria apenas as
+partições presentes.
+
+Agendamento sugerido (cron, todo dia 1º):
+  0 3 1 * *  cd /app && python3 arquivar_particoes.py --manter 12 --destino /backups/apontai
+
+Uso:
+  python3 arquivar_particoes.py                          # só cria as partições futuras
+  python3 arquivar_particoes.py --manter 12 --destino arquivo/
+  python3 arquivar_particoes.py --manter 12 --simular
+"""
+
+import argparse
+import datetime
+import gzip
+import os
+import re
+import sys
+import time
+
+import psycopg2
+
+import trabalho
+
+DEFAULT_FUTURAS = 3
+DEFAULT_DESTINO = 'arquivo'
+
+# Partitioned table -> (export query over one partition, specialization tables)
+ARQUIVAMENTO = {
+    'interacao': ("""
+        SELECT I.idInteracao AS "idInteracao", I.idReport AS "idReport", I.cpfCidadao AS "cpfCidadao",
+               I.dataHora AS "dataHora", I.tipo, C.texto, A.nota, A.comentario
+        FROM {particao} I
+        LEFT JOIN Comentario C ON C.idInteracao = I.idInteracao
+        LEFT JOIN Avaliacao A ON A.idInteracao = I.idInteracao
+        ORDER BY I.dataHora, I.idInteracao
+        """, ('Comentario', 'Upvote', 'Avaliacao')),
+    'historicoatualizacao': ("""
+        SELECT idReport AS "idReport", cpfFuncionario AS "cpfFuncionario",
+               dataHoraAtualizacao AS "dataHoraAtualizacao", atributoAtualizado AS "atributoAtualizado"
+        FROM {particao}
+        ORDER BY dataHoraAtualizacao
+        """, ()),
+}
+
+NOME_PARTICAO = re.compile(r'^(interacao|historicoatualizacao)_p(\d{4})_(\d{2})$')
+
+# Partitions of both tables, attached or not: a detached one is an
+# interrupted archival; a pending one an interrupted DETACH CONCURRENTLY
+PARTICOES_SQL = """
+SELECT C.relname, I.inhrelid IS NOT NULL AS anexada, COALESCE(I.inhdetachpending, false) AS pendente
+FROM pg_class C
+JOIN pg_namespace N ON N.oid = C.relnamespace
+LEFT JOIN pg_inherits I ON I.inhrelid = C.oid
+WHERE N.nspname = 'public' AND C.relkind = 'r'
+  AND C.relname ~ '^(interacao|historicoatualizacao)_p[0-9]{4}_[0-9]{2}$'
+ORDER BY C.relname
+"""
+
+
+def criar_futuras(meses: int) -> int:
+    """Creates the partitions of the current month and the next `meses`. Returns how many were created."""
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT criar_particoes_futuras(%s)", (meses,))
+            return cur.fetchone()[0]
+
+
+def particoes_antigas(manter: int) -> list:
+    """[(partição, tabela, anexada, pendente)] of months before the last `manter` complete months."""
+    hoje = datetime.datetime.now(datetime.timezone.utc)
+    corte = hoje.year * 12 + hoje.month - 1 - manter
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(PARTICOES_SQL)
+            linhas = cur.fetchall()
+    antigas = []
+    for nome, anexada, pendente in linhas:
+        tabela, ano, mes = NOME_PARTICAO.match(nome).groups()
+        if int(ano) * 12 + int(mes) - 1 < corte or not anexada:
+            antigas.append((nome, tabela, anexada, pendente))
+    return antigas
+
+
+def desanexar(particao: str, tabela: str, pendente: bool):
+    """DETACH ... CONCURRENTLY: inserts and reports keep running on the other partitions."""
+    with trabalho.get_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                modo = "FINALIZE" if pendente else "CONCURRENTLY"
+                cur.execute(f'ALTER TABLE {tabela} DETACH PARTITION "{particao}" {modo}')
+        finally:
+            conn.autocommit = False
+
+
+def exportar(particao: str, tabela: str, destino: str) -> tuple:
+    """Writes the detached partition to <destino>/<partição>.csv.gz. Returns (path, rows)."""
+    consulta = ARQUIVAMENTO[tabela][0].format(particao=f'"{particao}"')
+    caminho = os.path.join(destino, f"{particao}.csv.gz")
+    parcial = caminho + '.parcial'
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            with gzip.open(parcial, 'wt', encoding='utf-8', newline='') as f:
+                cur.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+                linhas = cur.rowcount
+            with open(parcial, 'rb') as f:
+                os.fsync(f.fileno())
+    # Only a complete file gets the final name
+    os.replace(parcial, caminho)
+    return caminho, linhas
+
+
+def descartar(particao: str, tabela: str):
+    """Deletes the partition's specialization rows and drops it, in one transaction."""
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            for especializacao in ARQUIVAMENTO[tabela][1]:
+                cur.execute(f'DELETE FROM {especializacao} '
+                            f'WHERE idInteracao IN (SELECT idInteracao FROM "{particao}")')
+            cur.execute(f'DROP TABLE "{particao}"')
+
+
+def arquivar(manter: int, destino: str, simular: bool = False) -> list:
+    """Archives every partition older than the last `manter` months. Returns [(partition, path, rows, seconds)]."""
+    arquivadas = []
+    for particao, tabela, anexada, pendente in particoes_antigas(manter):
+        if simular:
+            arquivadas.append((particao, None, None, 0.0))
+            continue
+        inicio = time.perf_counter()
+        if anexada:
+            desanexar(particao, tabela, pendente)
+        caminho, linhas = exportar(particao, tabela, destino)
+        descartar(particao, tabela)
+        arquivadas.append((particao, caminho, linhas, time.perf_counter() - inicio))
+    return arquivadas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Cria as partições futuras e arquiva (DETACH + .csv.gz + DROP) as antigas.")
+    parser.add_argument('--futuras', type=int, default=DEFAULT_FUTURAS,
+                        help=f"Meses futuros com partição criada (padrão {DEFAULT_FUTURAS})")
+    parser.add_argument('--manter', type=int,
+                        help="Meses completos mantidos no banco; os anteriores são arquivados (padrão: não arquiva)")
+    parser.add_argument('--destino', default=DEFAULT_DESTINO,
+                        help=f"Diretório dos arquivos .csv.gz (padrão {DEFAULT_DESTINO}/)")
+    parser.add_argument('--simular', action='store_true', help="Só lista as partições que seriam arquivadas")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+    if args.futuras < 0:
+        parser.error("--futuras não pode ser negativo")
+    if args.manter is not None and args.manter < 1:
+        parser.error("--manter deve ser positivo")
+
+    try:
+        if not args.simular:
+            criadas = criar_futuras(args.futuras)
+            print(f"✓ {criadas} partição(ões) futura(s) criada(s)")
+        if args.manter is None:
+            return 0
+        if not args.simular:
+            os.makedirs(args.destino, exist_ok=True)
+        arquivadas = arquivar(args.manter, args.destino, args.simular)
+    except (psycopg2.Error, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        trabalho.close_pool()
+
+    if not arquivadas:
+        print(f"Nenhuma partição anterior aos últimos {args.manter} meses.")
+    for particao, caminho, linhas, segundos in arquivadas:
+        if args.simular:
+            print(f"  {particao}")
+        else:
+            print(f"  {particao:<32} {linhas:>10} linhas  {segundos:>6.2f} s  -> {caminho}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
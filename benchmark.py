@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+Gerador determinístico de dados sintéticos e benchmark das consultas e
+inserções do trabalho.py em escalas de produção.
+
+A geração roda no próprio PostgreSQL (INSERT ... SELECT sobre
+generate_series, com setseed para ser reprodutível), o que permite popular
+de 10^4 a 10^7 reports em segundos/minutos. Distribuições:
+  - localizacao: poucas ruas concentram a maioria dos reports (Zipf-like),
+    com coordenadas ao longo de cada rua;
+  - interações por report: lei de potência (Pareto, alfa configurável);
+  - histórico: 0 a 3 atualizações por report, funcionários com carga desigual;
+  - descrições e comentários: palavras de um vocabulário fixo, com
+    frequência enviesada (termos muito comuns e termos raros).
+
+ATENÇÃO: a geração APAGA todos os dados das tabelas (TRUNCATE) e exige --reset.
+
+Uso:
+  python3 benchmark.py --reset --escalas 10000,100000 --repeat 5 --saida resultados.json
+  python3 benchmark.py --sem-geracao --repeat 10     # mede os dados atuais
+  python3 benchmark.py --memoria 1000000             # bytes por linha de usuário (sem banco)
+"""
+
+import argparse
+import dataclasses
+import datetime
+import gc
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+import trabalho
+
+DEFAULT_SEED = 0.42
+DEFAULT_ALFA = 1.2          # expoente da lei de potência das interações
+MAX_INTERACOES_REPORT = 500
+NUM_CATEGORIAS = 20
+
+TABELAS_DADOS = ('CidadaoBeneficio', 'Beneficio', 'HistoricoAtualizacao', 'Avaliacao', 'Upvote',
+                 'Comentario', 'Interacao', 'Midia', 'Report', 'CategoriaReport',
+                 'Funcionario', 'Cidadao', 'Usuario')
+
+# Rebuild functions (from the numbered migrations) for tables normally kept
+# by triggers; the ones present in the database run after each generation
+RECONSTRUCOES = (
+    'recalcular_resumos',
+    'recalcular_hotspots',
+    'recalcular_pontos',
+    'recalcular_ultima_atualizacao',
+    'recalcular_cobertura',
+)
+
+# Words of the synthetic descriptions and comments, most frequent first;
+# texts draw from it with a skewed (Zipf-like) distribution so the search
+# benchmark sees both very common and rare terms
+VOCABULARIO = (
+    'problema', 'rua', 'buraco', 'calçada', 'iluminação', 'lixo', 'poste', 'árvore',
+    'esgoto', 'vazamento', 'água', 'sinalização', 'semáforo', 'praça', 'entulho',
+    'alagamento', 'bueiro', 'asfalto', 'lâmpada', 'queimada', 'quebrado', 'perigoso',
+    'escuro', 'acúmulo', 'mato', 'pichação', 'ônibus', 'ponto', 'faixa', 'pedestres',
+    'ciclovia', 'meio-fio', 'boca-de-lobo', 'desnível', 'erosão', 'poda', 'fiação',
+    'caçamba', 'descarte', 'irregular', 'animais', 'ratos', 'mosquitos', 'dengue',
+    'infiltração', 'cratera', 'obra', 'abandonada', 'vizinhança', 'escola', 'creche',
+    'hospital', 'urgente', 'semanas', 'meses', 'reclamação', 'prefeitura', 'resolvido',
+    'piorou', 'acidente',
+)
+
+# Text of 1 + n words from VOCABULARIO; `n` must reference the outer row so
+# the subquery is re-evaluated (and re-randomized) for each one
+TEXTO_SQL = ("(SELECT string_agg((%(vocabulario)s::text[])"
+             "[1 + floor(%(palavras)s * power(random(), 3))::int], ' ') "
+             "FROM generate_series(0, {n}))")
+
+# 11-digit integer -> CPF '000.000.000-00'
+CPF_SQL = r"regexp_replace(lpad(({expr})::text, 11, '0'), '(\d{{3}})(\d{{3}})(\d{{3}})(\d{{2}})', '\1.\2.\3-\4')"
+
+GERACAO_SQL = [
+    ('Usuario/Cidadao', """
+        INSERT INTO Usuario (cpf, nome, email, dataNascimento, role)
+        SELECT {cpf_i}, 'Cidadão ' || i, 'cidadao' || i || '@bench.apontai.org',
+               DATE '1950-01-01' + (random() * 20000)::int, 'Cidadao'
+        FROM generate_series(1, %(cidadaos)s) i;
+        INSERT INTO Cidadao (cpf, pontos)
+        SELECT {cpf_i}, (random() * 1000)::int FROM generate_series(1, %(cidadaos)s) i;
+    """),
+    ('Usuario/Funcionario', """
+        INSERT INTO Usuario (cpf, nome, email, dataNascimento, role)
+        SELECT {cpf_f}, 'Funcionário ' || i, 'funcionario' || i || '@bench.apontai.org',
+               DATE '1960-01-01' + (random() * 15000)::int, 'Funcionario'
+        FROM generate_series(1, %(funcionarios)s) i;
+        INSERT INTO Funcionario (cpf, setor, cidade)
+        SELECT {cpf_f}, 'Secretaria ' || (i %% 8), 'Cidade ' || (i %% 5)
+        FROM generate_series(1, %(funcionarios)s) i;
+    """),
+    ('CategoriaReport', """
+        INSERT INTO CategoriaReport (idCategoriaReport, nome, pontos)
+        SELECT i, 'Categoria ' || lpad(i::text, 2, '0'), 10 + (i * 7) %% 91
+        FROM generate_series(1, %(categorias)s) i;
+    """),
+    ('Report', """
+        INSERT INTO Report (idReport, titulo, localizacao, localizacaoNormalizada, latitude, longitude,
+                            descricao, dataCriacao, status, idCategoriaReport, cpfCidadao)
+        SELECT i,
+               'Problema sintético ' || i,
+               'Rua ' || rua || ', ' || numero,
+               'rua ' || rua || ' ' || numero,
+               -- each street is a ~200 m east-west segment placed pseudo-randomly
+               -- in a ~20 km box; numbers run along it, with GPS-like jitter
+               -23.65 + (rua * 7919 %% 1009) * 0.0002 + (random() - 0.5) * 0.0002,
+               -46.75 + (rua * 104729 %% 997) * 0.0002 + numero * 0.00001 + (random() - 0.5) * 0.0002,
+               CASE WHEN random() < 0.8 THEN {texto_report} END,
+               NOW() - random() * INTERVAL '365 days',
+               (ARRAY['Aberto', 'Aberto', 'Aberto', 'Em Análise', 'Em Análise',
+                      'Resolvido', 'Resolvido', 'Resolvido', 'Resolvido', 'Fechado'])
+                   [1 + floor(random() * 10)::int]::status_type,
+               1 + floor(%(categorias)s * power(random(), 2))::int,
+               {cpf_c}
+        FROM (
+            SELECT i, floor(%(ruas)s * power(random(), 3))::int AS rua,
+                   floor(random() * 20)::int * 10 AS numero
+            FROM generate_series(1, %(reports)s) i
+        ) s;
+    """),
+    ('Partições', """
+        -- Interacao/HistoricoAtualizacao partitioned by month (migração 007)
+        DO $$ BEGIN
+            IF to_regproc('criar_particoes') IS NOT NULL THEN
+                PERFORM criar_particoes('Interacao', NOW() - INTERVAL '366 days', NOW() + INTERVAL '1 month');
+                PERFORM criar_particoes('HistoricoAtualizacao', NOW() - INTERVAL '366 days', NOW() + INTERVAL '1 month');
+            END IF;
+        END $$;
+    """),
+    ('Interacao', """
+        CREATE TEMP TABLE bench_interacao ON COMMIT DROP AS
+        SELECT row_number() OVER () AS idInteracao, c.idReport,
+               {cpf_rc} AS cpfCidadao,
+               LEAST(c.dataCriacao + random() * INTERVAL '30 days', NOW()) AS dataHora,
+               CASE WHEN random() < 0.5 THEN 'Upvote'
+                    WHEN random() < 0.6 THEN 'Comentario'
+                    ELSE 'Avaliacao' END::interacao_type AS tipo
+        FROM (
+            SELECT idReport, dataCriacao,
+                   floor(random() * %(cidadaos)s)::bigint AS base,
+                   LEAST(%(max_interacoes)s, %(cidadaos)s - 1,
+                         floor(power(1 - random(), -1.0 / %(alfa)s))::int - 1) AS qtd
+            FROM Report
+        ) c, generate_series(1, c.qtd) g;
+        INSERT INTO Interacao (idInteracao, cpfCidadao, idReport, dataHora, tipo)
+        SELECT idInteracao, cpfCidadao, idReport, dataHora, tipo FROM bench_interacao;
+        INSERT INTO Comentario (idInteracao, texto)
+        SELECT idInteracao, {texto_comentario}
+        FROM bench_interacao WHERE tipo = 'Comentario';
+        INSERT INTO Upvote (idInteracao)
+        SELECT idInteracao FROM bench_interacao WHERE tipo = 'Upvote';
+        INSERT INTO Avaliacao (idInteracao, nota, comentario)
+        SELECT idInteracao, 5 - floor(power(random(), 2) * 5)::int, NULL
+        FROM bench_interacao WHERE tipo = 'Avaliacao';
+    """),
+    ('HistoricoAtualizacao', """
+        INSERT INTO HistoricoAtualizacao (idReport, cpfFuncionario, dataHoraAtualizacao, atributoAtualizado)
+        SELECT r.idReport,
+               {cpf_hf},
+               r.dataCriacao + g * INTERVAL '1 hour' + random() * INTERVAL '50 minutes',
+               'status'
+        FROM (SELECT idReport, dataCriacao, floor(random() * 4)::int AS qtd FROM Report) r,
+             generate_series(1, r.qtd) g;
+    """),
+]
+
+SEQUENCIAS = (('Report', 'idReport'), ('Interacao', 'idInteracao'),
+              ('CategoriaReport', 'idCategoriaReport'), ('Midia', 'idMidia'))
+
+
+def dimensoes(escala: int) -> dict:
+    """Tamanhos derivados de uma escala (número de reports)."""
+    return {
+        'reports': escala,
+        'cidadaos': max(100, escala // 10),
+        'funcionarios': max(10, escala // 1000),
+        'categorias': NUM_CATEGORIAS,
+        'ruas': max(10, escala // 50),
+    }
+
+
+def _sql_geracao(sql: str, dims: dict) -> str:
+    # Citizens are CPFs 1..C, employees C+1..C+F; cpf_rc spreads the
+    # interactions of one report over distinct citizens (UNIQUE per tipo)
+    return sql.format(
+        cpf_i=CPF_SQL.format(expr='i'),
+        cpf_f=CPF_SQL.format(expr=f"{dims['cidadaos']} + i"),
+        cpf_c=CPF_SQL.format(expr=f"1 + floor({dims['cidadaos']} * power(random(), 2))::bigint"),
+        cpf_rc=CPF_SQL.format(expr=f"1 + (c.base + g) %% {dims['cidadaos']}"),
+        cpf_hf=CPF_SQL.format(expr=f"{dims['cidadaos']} + 1 + floor({dims['funcionarios']} * power(random(), 2))::bigint"),
+        texto_report=TEXTO_SQL.format(n='5 + i %% 15'),
+        texto_comentario=TEXTO_SQL.format(n='2 + idInteracao %% 10'),
+    )
+
+
+def gerar_dados(escala: int, seed: float = DEFAULT_SEED, alfa: float = DEFAULT_ALFA) -> dict:
+    """
+    Apaga os dados atuais e gera um conjunto sintético com `escala` reports.
+    Retorna {'segundos': ..., 'etapas': {...}, 'linhas': {tabela: n}}.
+    """
+    dims = dimensoes(escala)
+    params = dict(dims, alfa=alfa, max_interacoes=MAX_INTERACOES_REPORT,
+                  vocabulario=list(VOCABULARIO), palavras=len(VOCABULARIO))
+    etapas = {}
+    inicio = time.perf_counter()
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(TABELAS_DADOS)} RESTART IDENTITY CASCADE")
+            # Events of the data just deleted (migração 010); consumer
+            # checkpoints stay valid, they order by transaction id first
+            cur.execute("SELECT to_regclass('evento') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("TRUNCATE Evento")
+            # Data is generated consistent: skip FK checks and user triggers,
+            # then rebuild the derived tables once at the end
+            cur.execute("SET LOCAL session_replication_role = replica")
+            cur.execute("SELECT setseed(%s)", (seed,))
+            for etapa, sql in GERACAO_SQL:
+                t = time.perf_counter()
+                cur.execute(_sql_geracao(sql, dims), params)
+                etapas[etapa] = time.perf_counter() - t
+            for tabela, coluna in SEQUENCIAS:
+                cur.execute(f"SELECT setval(pg_get_serial_sequence(%s, %s), "
+                            f"COALESCE((SELECT MAX({coluna}) FROM {tabela}), 0) + 1, false)",
+                            (tabela.lower(), coluna.lower()))
+            cur.execute("SET LOCAL session_replication_role = origin")
+            for funcao in RECONSTRUCOES:
+                cur.execute("SELECT to_regproc(%s) IS NOT NULL", (funcao,))
+                if cur.fetchone()[0]:
+                    t = time.perf_counter()
+                    cur.execute(f"SELECT {funcao}()")
+                    etapas[funcao] = time.perf_counter() - t
+        conn.commit()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                t = time.perf_counter()
+                cur.execute("ANALYZE")
+                etapas['ANALYZE'] = time.perf_counter() - t
+        finally:
+            conn.autocommit = False
+        linhas = contar_linhas(conn)
+    trabalho.invalidar_cache(*TABELAS_DADOS)
+    return {'segundos': time.perf_counter() - inicio, 'etapas': etapas, 'linhas': linhas}
+
+
+def contar_linhas(conn) -> dict:
+    with conn.cursor() as cur:
+        linhas = {}
+        for tabela in ('Usuario', 'Report', 'Interacao', 'Comentario', 'Avaliacao', 'HistoricoAtualizacao'):
+            cur.execute(f"SELECT COUNT(*) FROM {tabela}")
+            linhas[tabela] = cur.fetchone()[0]
+        return linhas
+
+
+def resumir(tempos: list) -> dict:
+    """Estatísticas (ms) de uma lista de durações em segundos."""
+    ms = sorted(t * 1000 for t in tempos)
+    return {
+        'n': len(ms),
+        'min_ms': ms[0],
+        'mediana_ms': statistics.median(ms),
+        'p95_ms': ms[min(len(ms) - 1, int(0.95 * len(ms)))],
+        'media_ms': statistics.fmean(ms),
+        'max_ms': ms[-1],
+    }
+
+
+def medir_consultas(repeat: int) -> dict:
+    """Executa cada consulta de trabalho.CONSULTAS `repeat` vezes, sem cache, lendo todas as linhas."""
+    resultado = {}
+    for nome, sql in trabalho.CONSULTAS.items():
+        params = trabalho.parametros_consulta(nome)
+        tempos = []
+        linhas = 0
+        for _ in range(repeat):
+            t = time.perf_counter()
+            linhas = sum(1 for _row in trabalho.stream_query(sql, params))
+            tempos.append(time.perf_counter() - t)
+        resultado[nome] = dict(resumir(tempos), linhas=linhas)
+        print(f"  {nome:<32} mediana {resultado[nome]['mediana_ms']:>9.2f} ms  ({linhas} linhas)")
+    return resultado
+
+
+def medir_painel(repeat: int) -> dict:
+    """Todas as consultas de uma vez (trabalho.executar_painel), sem cache: parede contra a soma das consultas."""
+    paredes, somas, maiores = [], [], []
+    for _ in range(repeat):
+        painel = trabalho.executar_painel(usar_cache=False)
+        erros = [r.erro for r in painel.relatorios.values() if r.erro]
+        if erros:
+            raise RuntimeError(f"painel com erro: {erros[0]}")
+        paredes.append(painel.segundos)
+        somas.append(sum(r.segundos for r in painel.relatorios.values()))
+        maiores.append(max(r.segundos for r in painel.relatorios.values()))
+    resultado = {'parede': resumir(paredes), 'soma_consultas': resumir(somas),
+                 'consulta_mais_lenta': resumir(maiores)}
+    print(f"  parede mediana {resultado['parede']['mediana_ms']:>9.2f} ms  "
+          f"(soma {resultado['soma_consultas']['mediana_ms']:.2f} ms, "
+          f"mais lenta {resultado['consulta_mais_lenta']['mediana_ms']:.2f} ms)")
+    return resultado
+
+
+# (name, terms) of the search benchmark: frequent, rare, multi-word,
+# phrase and negated terms; accents are ignored by the search config
+BUSCAS = (
+    ('termo_comum', 'problema'),
+    ('termo_raro', 'acidente'),
+    ('sem_acento', 'iluminacao'),
+    ('varios_termos', 'buraco calçada perigoso'),
+    ('frase', '"poste quebrado"'),
+    ('negacao', 'lixo -entulho'),
+)
+
+
+def medir_busca(repeat: int) -> dict:
+    """Mede trabalho.buscar() (primeira página, reports e comentários) para cada termo de BUSCAS."""
+    resultado = {}
+    for nome, termos in BUSCAS:
+        tempos = []
+        linhas = 0
+        for _ in range(repeat):
+            t = time.perf_counter()
+            linhas = len(trabalho.buscar(termos))
+            tempos.append(time.perf_counter() - t)
+        resultado[nome] = dict(resumir(tempos), termos=termos, linhas=linhas)
+        print(f"  {nome:<32} mediana {resultado[nome]['mediana_ms']:>9.2f} ms  ({linhas} linhas)")
+    return resultado
+
+
+def _amostra(sql: str):
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            return cur.fetchone()
+
+
+def medir_insercoes(repeat: int) -> dict:
+    """Mede cada caminho de inserção (um commit por chamada, como no menu)."""
+    cpf_cidadao, = _amostra("SELECT cpf FROM Cidadao ORDER BY cpf LIMIT 1")
+    cpf_funcionario, = _amostra("SELECT cpf FROM Funcionario ORDER BY cpf LIMIT 1")
+    id_categoria, = _amostra("SELECT MIN(idCategoriaReport) FROM CategoriaReport")
+    marca = int(time.time() * 1000)
+
+    caminhos = {}
+
+    def medir(nome, func):
+        tempos = []
+        for i in range(repeat):
+            t = time.perf_counter()
+            func(i)
+            tempos.append(time.perf_counter() - t)
+        caminhos[nome] = resumir(tempos)
+        print(f"  {nome:<32} mediana {caminhos[nome]['mediana_ms']:>9.2f} ms")
+
+    reports = []
+    medir('report', lambda i: reports.append(trabalho.inserir_registro('report', {
+        'titulo': f'Benchmark {marca}-{i}', 'localizacao': 'Rua Benchmark, 1',
+        'idCategoriaReport': id_categoria, 'cpfCidadao': cpf_cidadao})))
+    interacoes = []
+    medir('interacao', lambda i: interacoes.append(trabalho.inserir_registro('interacao', {
+        'cpfCidadao': cpf_cidadao, 'idReport': reports[i], 'tipo': 'Comentario'})))
+    medir('comentario', lambda i: trabalho.inserir_registro('comentario', {
+        'idInteracao': interacoes[i], 'texto': f'Comentário de benchmark {i}'}))
+    medir('interacao_completa', lambda i: trabalho.registrar_interacao(
+        cpf_cidadao, reports[i], 'Avaliacao', nota=4))
+    medir('midia', lambda i: trabalho.inserir_registro('midia', {
+        'link': f'https://bench.apontai.org/{marca}/{i}.jpg', 'idReport': reports[i]}))
+    medir('historico', lambda i: trabalho.inserir_registro('historico', {
+        'cpfFuncionario': cpf_funcionario, 'idReport': reports[i], 'atributoAtualizado': 'status'}))
+    return caminhos
+
+
+def medir_group_commit(threads: int = 8, por_thread: int = 100) -> dict:
+    """
+    Vazão de `threads` escritores concorrentes de interações completas
+    (Interacao + Comentario): uma transação por chamada de
+    trabalho.registrar_interacao() × trabalho.GroupCommitWriter.
+    """
+    total = threads * por_thread
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT cpf FROM Cidadao ORDER BY cpf LIMIT %s", (total,))
+            cpfs = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT cpfCidadao, idCategoriaReport FROM Report LIMIT 1")
+            cpf_report, categoria = cur.fetchone()
+
+    def itens():
+        # Fresh reports, so (cidadão, report, tipo) never repeats
+        marca = int(time.time() * 1000)
+        reports = [trabalho.inserir_registro('report', {
+            'titulo': f'Group commit {marca}-{n}', 'localizacao': 'Rua Benchmark, 1',
+            'idCategoriaReport': categoria, 'cpfCidadao': cpf_report})
+            for n in range(-(-total // len(cpfs)))]
+        return [trabalho.interacao(cpfs[i % len(cpfs)], reports[i // len(cpfs)], 'Comentario',
+                                   f'Comentário de benchmark {i}')
+                for i in range(total)]
+
+    def rodar(escrever, lista) -> float:
+        partes = [lista[t::threads] for t in range(threads)]
+        workers = [threading.Thread(target=lambda p=p: [escrever(i) for i in p]) for p in partes]
+        inicio = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return time.perf_counter() - inicio
+
+    trabalho.POOL_CONFIG['maxconn'] = max(trabalho.POOL_CONFIG['maxconn'], threads + 1)
+    seg_direto = rodar(lambda i: trabalho.registrar_interacoes([i]), itens())
+    with trabalho.GroupCommitWriter() as writer:
+        seg_grupo = rodar(lambda i: writer.submit(i).result(), itens())
+        stats = writer.stats()
+    resultado = {
+        'threads': threads,
+        'interacoes': total,
+        'direto_por_s': total / seg_direto,
+        'group_commit_por_s': total / seg_grupo,
+        'group_commit': stats,
+    }
+    print(f"  direto {resultado['direto_por_s']:>9.0f}/s   group commit {resultado['group_commit_por_s']:>9.0f}/s"
+          f"   ({stats['lotes']} lotes, média {stats['media_lote']:.1f}, p99 {stats['latencia_p99_ms']:.1f} ms)")
+    return resultado
+
+
+@dataclasses.dataclass
+class UsuarioDataclass:
+    """Row type used by trabalho.py before the NamedTuple records, kept for comparison."""
+    cpf: str
+    nome: str
+    email: str
+    dataNasc: datetime.date
+    role: str
+
+
+def _linhas_usuario(n: int) -> list:
+    """Column values of `n` Usuario rows (distinct str/date objects per row), one list per row."""
+    base = datetime.date(1950, 1, 1)
+    return [[f'{i:011d}', f'Cidadão {i}', f'cidadao{i}@bench.apontai.org',
+             base + datetime.timedelta(days=i % 20000), 'Cidadao']
+            for i in range(n)]
+
+
+def medir_memoria(linhas: int) -> dict:
+    """
+    Bytes per row and build time of a `linhas`-user listing held as plain
+    tuples (what the driver returns), the old dataclass and the
+    trabalho.Usuario record. Counts only the row objects and the list
+    holding them; the column values are shared by all three.
+    """
+    dados = _linhas_usuario(linhas)
+    formatos = {
+        'tupla': lambda rows: [tuple(r) for r in rows],
+        'dataclass': lambda rows: [UsuarioDataclass(*r) for r in rows],
+        'namedtuple': lambda rows: trabalho.registros(trabalho.Usuario, rows),
+    }
+    resultado = {'linhas': linhas}
+    for nome, construir in formatos.items():
+        gc.collect()
+        tracemalloc.start()
+        t = time.perf_counter()
+        lista = construir(dados)
+        segundos = time.perf_counter() - t
+        atual, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultado[nome] = {'bytes_por_linha': atual / linhas, 'pico_bytes_por_linha': pico / linhas,
+                           'segundos': segundos}
+        print(f"  {nome:<12} {atual / linhas:>8.1f} bytes/linha   {segundos:>6.2f} s")
+        del lista
+    return resultado
+
+
+def meta(args) -> dict:
+    versao, = _amostra("SHOW server_version")
+    return {
+        'gerado_em': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'seed': args.seed,
+        'alfa': args.alfa,
+        'repeat': args.repeat,
+        'postgres': versao,
+        'python': platform.python_version(),
+        'config': trabalho.config_efetiva(),
+        'stream_itersize': trabalho.STREAM_CONFIG['itersize'],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gerador sintético e benchmark das consultas/inserções.")
+    parser.add_argument('--escalas', default='10000',
+                        help="Números de reports separados por vírgula, ex.: 10000,100000,1000000")
+    parser.add_argument('--repeat', type=int, default=5, help="Execuções por consulta/inserção (padrão 5)")
+    parser.add_argument('--seed', type=float, default=DEFAULT_SEED, help="Semente em [-1, 1] (setseed)")
+    parser.add_argument('--alfa', type=float, default=DEFAULT_ALFA, help="Expoente da lei de potência das interações")
+    parser.add_argument('--saida', default='benchmark_resultados.json', help="Arquivo JSON de resultados")
+    parser.add_argument('--reset', action='store_true', help="Confirma que os dados atuais podem ser APAGADOS")
+    parser.add_argument('--sem-geracao', action='store_true', help="Mede os dados atuais sem gerar nada")
+    parser.add_argument('--memoria', type=int, metavar='LINHAS',
+                        help="Só compara a memória por linha de uma listagem de LINHAS usuários (sem banco)")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+
+    if args.memoria:
+        print(f"-- Memória de {args.memoria} linhas de Usuario --")
+        resultado = medir_memoria(args.memoria)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'memoria': resultado}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.saida}")
+        return 0
+
+    if not args.sem_geracao and not args.reset:
+        parser.error("a geração apaga todos os dados; use --reset para confirmar ou --sem-geracao")
+    if args.repeat < 1:
+        parser.error("--repeat deve ser positivo")
+    try:
+        escalas = [None] if args.sem_geracao else [int(e) for e in args.escalas.split(',')]
+    except ValueError:
+        parser.error("--escalas deve ser uma lista de inteiros")
+
+    resultados = {'meta': None, 'execucoes': []}
+    try:
+        resultados['meta'] = meta(args)
+        for escala in escalas:
+            execucao = {'escala': escala}
+            if escala is not None:
+                print(f"\n== Gerando escala {escala} ==")
+                execucao['geracao'] = gerar_dados(escala, args.seed, args.alfa)
+                print(f"  {execucao['geracao']['segundos']:.1f} s: {execucao['geracao']['linhas']}")
+            print("-- Consultas --")
+            execucao['consultas'] = medir_consultas(args.repeat)
+            print("-- Painel (consultas em paralelo) --")
+            execucao['painel'] = medir_painel(args.repeat)
+            print("-- Busca textual --")
+            execucao['busca'] = medir_busca(args.repeat)
+            print("-- Inserções --")
+            execucao['insercoes'] = medir_insercoes(args.repeat)
+            print("-- Group commit de interações --")
+            execucao['group_commit'] = medir_group_commit()
+            resultados['execucoes'].append(execucao)
+    finally:
+        trabalho.close_pool()
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+carga_em_massa.py
+Carga em massa (não interativa) de Reports, Interações e Mídias via COPY.
+
+Os arquivos podem ser CSV (com cabeçalho) ou JSONL (um objeto por linha),
+compactados ou não com gzip (.csv.gz, .jsonl.gz).
+Cada arquivo é lido em streaming e gravado em blocos: cada bloco é copiado
+com COPY FROM STDIN para uma tabela temporária de staging e então inserido
+nas tabelas definitivas na mesma transação.
+
+Colunas esperadas:
+  reports     idReport*, titulo, localizacao, descricao, dataCriacao, status,
+              idCategoriaReport, cpfCidadao, latitude**, longitude**
+  interacoes  idReport, cpfCidadao, dataHora, tipo, texto, nota, comentario
+  midias      link, idReport, dataUpload
+
+* idReport no arquivo de reports é a chave do sistema de origem (opcional).
+  Nos arquivos de interações e mídias, idReport é resolvido primeiro contra
+  essas chaves de origem e, se não encontrado, tratado como um idReport já
+  existente no banco. As especializações (Comentario/Upvote/Avaliacao) são
+  derivadas da coluna tipo de cada interação.
+** Opcionais. Sem elas, as coordenadas vêm do cache Geocodificacao (trigger
+  da migração 004); os endereços restantes podem ser geocodificados depois
+  com `python3 trabalho.py geocode`.
+
+Uso:
+  python3 carga_em_massa.py --reports reports.csv --interacoes interacoes.jsonl --midias midias.csv
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+import psycopg2
+
+import trabalho
+
+DEFAULT_CHUNK = 5000
+
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS carga_mapa_report (
+    chave TEXT PRIMARY KEY,
+    idReport INTEGER NOT NULL
+);
+CREATE TEMP TABLE IF NOT EXISTS carga_report (
+    chave TEXT,
+    titulo TEXT,
+    localizacao TEXT,
+    descricao TEXT,
+    dataCriacao TIMESTAMPTZ,
+    status status_type,
+    idCategoriaReport INTEGER,
+    cpfCidadao VARCHAR(14),
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    idReport INTEGER
+);
+CREATE TEMP TABLE IF NOT EXISTS carga_interacao (
+    report TEXT,
+    cpfCidadao VARCHAR(14),
+    dataHora TIMESTAMPTZ,
+    tipo interacao_type,
+    texto TEXT,
+    nota INTEGER,
+    comentario TEXT,
+    idReport INTEGER,
+    idInteracao INTEGER
+);
+CREATE TEMP TABLE IF NOT EXISTS carga_midia (
+    link TEXT,
+    report TEXT,
+    dataUpload TIMESTAMPTZ,
+    idReport INTEGER
+);
+"""
+
+# (staging table, file columns in COPY order, staging columns in COPY order)
+LAYOUTS = {
+    'reports': ('carga_report',
+                ('idReport', 'titulo', 'localizacao', 'descricao', 'dataCriacao',
+                 'status', 'idCategoriaReport', 'cpfCidadao', 'latitude', 'longitude'),
+                ('chave', 'titulo', 'localizacao', 'descricao', 'dataCriacao',
+                 'status', 'idCategoriaReport', 'cpfCidadao', 'latitude', 'longitude')),
+    'interacoes': ('carga_interacao',
+                   ('idReport', 'cpfCidadao', 'dataHora', 'tipo', 'texto', 'nota', 'comentario'),
+                   ('report', 'cpfCidadao', 'dataHora', 'tipo', 'texto', 'nota', 'comentario')),
+    'midias': ('carga_midia',
+               ('link', 'idReport', 'dataUpload'),
+               ('link', 'report', 'dataUpload')),
+}
+
+# Resolves the report reference of child rows: source key first, then existing idReport
+RESOLVE_REPORT_SQL = """
+UPDATE {tabela} s
+SET idReport = COALESCE(
+    (SELECT m.idReport FROM carga_mapa_report m WHERE m.chave = s.report),
+    CASE WHEN s.report ~ '^[0-9]+$' THEN s.report::integer END
+)
+"""
+
+UNRESOLVED_SQL = "SELECT report FROM {tabela} WHERE idReport IS NULL LIMIT 1"
+
+FLUSH_SQL = {
+    'reports': [
+        "UPDATE carga_report SET idReport = nextval(pg_get_serial_sequence('report', 'idreport'))",
+        """
+        INSERT INTO Report (idReport, titulo, localizacao, descricao, dataCriacao, status, idCategoriaReport,
+                            cpfCidadao, latitude, longitude)
+        SELECT idReport, titulo, localizacao, descricao,
+               COALESCE(dataCriacao, NOW()), COALESCE(status, 'Aberto'), idCategoriaReport, cpfCidadao,
+               latitude, longitude
+        FROM carga_report
+        """,
+        """
+        INSERT INTO carga_mapa_report (chave, idReport)
+        SELECT chave, idReport FROM carga_report WHERE chave IS NOT NULL
+        ON CONFLICT (chave) DO UPDATE SET idReport = EXCLUDED.idReport
+        """,
+    ],
+    'interacoes': [
+        # Interacao is partitioned by month (migração 007): old dates need their partitions
+        "SELECT criar_particoes('Interacao', MIN(COALESCE(dataHora, NOW())), MAX(COALESCE(dataHora, NOW()))) "
+        "FROM carga_interacao",
+        "UPDATE carga_interacao SET idInteracao = nextval(pg_get_serial_sequence('interacao', 'idinteracao'))",
+        """
+        INSERT INTO Interacao (idInteracao, cpfCidadao, idReport, dataHora, tipo)
+        SELECT idInteracao, cpfCidadao, idReport, COALESCE(dataHora, NOW()), tipo
+        FROM carga_interacao
+        """,
+        "INSERT INTO Comentario (idInteracao, texto) SELECT idInteracao, texto FROM carga_interacao WHERE tipo = 'Comentario'",
+        "INSERT INTO Upvote (idInteracao) SELECT idInteracao FROM carga_interacao WHERE tipo = 'Upvote'",
+        """
+        INSERT INTO Avaliacao (idInteracao, nota, comentario)
+        SELECT idInteracao, nota, comentario FROM carga_interacao WHERE tipo = 'Avaliacao'
+        """,
+    ],
+    'midias': [
+        """
+        INSERT INTO Midia (link, idReport, dataUpload)
+        SELECT link, idReport, COALESCE(dataUpload, NOW()) FROM carga_midia
+        """,
+    ],
+}
+
+
+def ler_registros(caminho: str):
+    """Streams a CSV or JSONL file (optionally .gz), yielding one dict per line."""
+    nome = caminho.lower()
+    abrir = open
+    if nome.endswith('.gz'):
+        nome, abrir = nome[:-3], gzip.open
+    with abrir(caminho, 'rt', newline='', encoding='utf-8') as f:
+        if nome.endswith(('.jsonl', '.ndjson', '.json')):
+            for num, linha in enumerate(f, 1):
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{caminho}:{num}: JSON inválido ({e})") from None
+        else:
+            yield from csv.DictReader(f)
+
+
+def _copy_value(value) -> str:
+    """Formats a value for COPY text format (NULL is \\N)."""
+    if value is None or value == '':
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+def _copy_buffer(registros, colunas) -> io.StringIO:
+    buf = io.StringIO()
+    for reg in registros:
+        buf.write('\t'.join(_copy_value(reg.get(c)) for c in colunas))
+        buf.write('\n')
+    buf.seek(0)
+    return buf
+
+
+def carregar_arquivo(conn, tipo: str, caminho: str, chunk: int = DEFAULT_CHUNK) -> int:
+    """Loads a file in blocks of `chunk` lines, one commit per block. Returns the number of lines loaded."""
+    tabela, colunas_arquivo, colunas_staging = LAYOUTS[tipo]
+    copy_sql = f"COPY {tabela} ({', '.join(colunas_staging)}) FROM STDIN"
+    registros = ler_registros(caminho)
+    total = 0
+    bloco_num = 0
+    while True:
+        bloco = list(islice(registros, chunk))
+        if not bloco:
+            return total
+        bloco_num += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE {tabela}")
+                cur.copy_expert(copy_sql, _copy_buffer(bloco, colunas_arquivo))
+                if tipo != 'reports':
+                    cur.execute(RESOLVE_REPORT_SQL.format(tabela=tabela))
+                    cur.execute(UNRESOLVED_SQL.format(tabela=tabela))
+                    pendente = cur.fetchone()
+                    if pendente:
+                        raise ValueError(f"idReport '{pendente[0]}' não corresponde a nenhum report carregado ou existente")
+                for sql in FLUSH_SQL[tipo]:
+                    cur.execute(sql)
+            conn.commit()
+        except (psycopg2.Error, ValueError) as e:
+            conn.rollback()
+            raise RuntimeError(
+                f"{caminho}: falha no bloco {bloco_num} (linhas {total + 1}-{total + len(bloco)}); "
+                f"{total} linhas já confirmadas. Erro: {e}") from e
+        total += len(bloco)
+
+
+def carregar(arquivos: dict, chunk: int = DEFAULT_CHUNK) -> dict:
+    """
+    Loads the given files ({'reports': path, ...}) in the order
+    reports → interacoes → midias. Returns {tipo: (lines, seconds)}.
+    """
+    resultado = {}
+    with trabalho.get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(STAGING_DDL)
+            conn.commit()
+            for tipo in ('reports', 'interacoes', 'midias'):
+                caminho = arquivos.get(tipo)
+                if not caminho:
+                    continue
+                inicio = time.perf_counter()
+                linhas = carregar_arquivo(conn, tipo, caminho, chunk)
+                resultado[tipo] = (linhas, time.perf_counter() - inicio)
+        finally:
+            # Staging tables live in the session; don't leak them into the pool
+            if not conn.closed:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute("DISCARD TEMP")
+                conn.commit()
+    return resultado
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Carga em massa via COPY de reports, interações e mídias.")
+    parser.add_argument('--reports', help="Arquivo CSV/JSONL de reports")
+    parser.add_argument('--interacoes', help="Arquivo CSV/JSONL de interações (com Comentario/Upvote/Avaliacao)")
+    parser.add_argument('--midias', help="Arquivo CSV/JSONL de mídias")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help=f"Linhas por transação (padrão {DEFAULT_CHUNK})")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+
+    arquivos = {'reports': args.reports, 'interacoes': args.interacoes, 'midias': args.midias}
+    if not any(arquivos.values()):
+        parser.error("informe ao menos um arquivo (--reports, --interacoes ou --midias)")
+    if args.chunk < 1:
+        parser.error("--chunk deve ser positivo")
+
+    inicio = time.perf_counter()
+    try:
+        resultado = carregar(arquivos, args.chunk)
+    except (RuntimeError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        trabalho.close_pool()
+    total_seg = time.perf_counter() - inicio
+
+    print(f"{'Arquivo':<12} | {'Linhas':>10} | {'Segundos':>9} | {'Linhas/s':>10}")
+    print("-" * 52)
+    total_linhas = 0
+    for tipo, (linhas, seg) in resultado.items():
+        total_linhas += linhas
+        taxa = linhas / seg if seg > 0 else 0.0
+        print(f"{tipo:<12} | {linhas:>10} | {seg:>9.2f} | {taxa:>10.0f}")
+    print("-" * 52)
+    taxa = total_linhas / total_seg if total_seg > 0 else 0.0
+    print(f"{'total':<12} | {total_linhas:>10} | {total_seg:>9.2f} | {taxa:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+conferir_replicas.py
+Confere o roteamento de leituras para réplicas (REPLICA_CONFIG) contra dois
+PostgreSQL locais: o primário de DB_CONFIG e uma réplica em streaming
+(make replica-up sobe uma na porta 5436).
+
+Conferências:
+  - relatórios e listagens rodam na réplica (pg_is_in_recovery());
+  - leia-o-que-escreveu: logo após cada inserção, a leitura já encontra o
+    report novo, seja na réplica (se já o reproduziu) seja no primário;
+  - lag: com a reprodução da réplica pausada e o primário recebendo
+    escritas de outro processo, as leituras voltam ao primário acima de
+    --max-lag e retornam à réplica depois que ela alcança o primário;
+  - réplica inacessível (porta sem servidor): as leituras continuam, no
+    primário, sem erro.
+
+A conferência de lag pausa a reprodução com pg_wal_replay_pause(), o que
+exige superusuário na réplica (o usuário do docker-compose é). Os reports
+inseridos ('Conferência de réplica') permanecem no banco; use um banco de
+desenvolvimento.
+
+Uso:
+  python3 conferir_replicas.py --replica localhost:5436 --insercoes 50
+"""
+
+import argparse
+import sys
+import time
+
+import psycopg2
+
+import trabalho
+
+TITULO = 'Conferência de réplica'
+
+LEITURA_SQL = "SELECT pg_is_in_recovery(), EXISTS (SELECT 1 FROM Report WHERE idReport = %s)"
+
+
+def endereco(texto: str) -> dict:
+    host, _, porta = texto.rpartition(':')
+    return {'host': host or 'localhost', 'port': int(porta)}
+
+
+def ler(id_report: int = 0) -> tuple:
+    """(ran on a replica, report `id_report` visible) through get_connection(leitura=True)."""
+    with trabalho.get_connection(leitura=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(LEITURA_SQL, (id_report,))
+            return cur.fetchone()
+
+
+def conferir_roteamento() -> list:
+    antes = trabalho.replica_stats()['leituras_replica']
+    for nome in trabalho.CONSULTAS:
+        for _row in trabalho.linhas_consulta(nome, trabalho.parametros_consulta(nome)):
+            pass
+    trabalho.pagina_usuarios()
+    roteadas = trabalho.replica_stats()['leituras_replica'] - antes
+    esperadas = len(trabalho.CONSULTAS) + 1
+    em_replica, _ = ler()
+    print(f"  roteamento: {roteadas}/{esperadas} leituras na réplica")
+    falhas = []
+    if roteadas != esperadas or not em_replica:
+        falhas.append(f"roteamento: só {roteadas} de {esperadas} leituras foram para a réplica")
+    return falhas
+
+
+def conferir_leia_o_que_escreveu(insercoes: int) -> list:
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT cpf FROM Cidadao ORDER BY cpf LIMIT 1")
+            cpf, = cur.fetchone()
+    falhas = []
+    na_replica = 0
+    for i in range(insercoes):
+        id_report = trabalho.inserir_registro('report', {
+            'titulo': TITULO, 'localizacao': f'Rua da Conferência, {i + 1}',
+            'idCategoriaReport': 1, 'cpfCidadao': cpf})
+        em_replica, visivel = ler(id_report)
+        na_replica += em_replica
+        if not visivel:
+            falhas.append(f"leia-o-que-escreveu: report {id_report} invisível logo após a inserção "
+                          f"({'réplica' if em_replica else 'primário'})")
+    print(f"  leia-o-que-escreveu: {insercoes} inserções, leitura seguinte na réplica em {na_replica}")
+    return falhas
+
+
+def conferir_lag(replica: dict, max_lag: float) -> list:
+    router = trabalho.get_router()
+    falhas = []
+    direta = psycopg2.connect(**trabalho.parametros_conexao(replica))
+    direta.autocommit = True
+    try:
+        with direta.cursor() as cur:
+            cur.execute("SELECT pg_wal_replay_pause()")
+        # Writes from another connection, not tracked by read_your_writes
+        escritor = psycopg2.connect(**trabalho.parametros_conexao())
+        try:
+            with escritor, escritor.cursor() as cur:
+                cur.execute("UPDATE Report SET titulo = titulo WHERE titulo = %s", (TITULO,))
+        finally:
+            escritor.close()
+        time.sleep(max_lag + router.lag_check_interval + 0.5)
+        em_replica, _ = ler()
+        lag = router.stats()['replicas'][0]['lag']
+        print(f"  lag com a réplica pausada: {lag or 0:.1f} s, "
+              f"leitura {'na réplica' if em_replica else 'no primário'}")
+        if em_replica:
+            falhas.append(f"lag: réplica pausada há mais de {max_lag} s continuou recebendo leituras")
+    finally:
+        with direta.cursor() as cur:
+            cur.execute("SELECT pg_wal_replay_resume()")
+        direta.close()
+    limite = time.monotonic() + 30
+    em_replica = False
+    while not em_replica and time.monotonic() < limite:
+        time.sleep(router.lag_check_interval)
+        em_replica, _ = ler()
+    print(f"  após retomar a reprodução: leitura {'na réplica' if em_replica else 'no primário'}")
+    if not em_replica:
+        falhas.append("lag: a réplica não voltou a receber leituras 30 s após retomar a reprodução")
+    return falhas
+
+
+def conferir_indisponivel(porta: int) -> list:
+    trabalho.close_pool()
+    replicas = trabalho.REPLICA_CONFIG['replicas']
+    trabalho.REPLICA_CONFIG['replicas'] = [{'port': porta}]
+    try:
+        em_replica, _ = ler()
+        stats = trabalho.replica_stats()
+    finally:
+        trabalho.close_pool()
+        trabalho.REPLICA_CONFIG['replicas'] = replicas
+    print(f"  réplica inacessível (porta {porta}): leitura {'na réplica' if em_replica else 'no primário'}")
+    if em_replica or not stats['replicas'][0]['indisponivel']:
+        return [f"indisponível: a réplica na porta {porta} não foi marcada como indisponível"]
+    return []
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Roteamento de leituras para réplicas: destino, lag e leia-o-que-escreveu.")
+    parser.add_argument('--replica', default='localhost:5436', help="HOST:PORTA da réplica (padrão localhost:5436)")
+    parser.add_argument('--insercoes', type=int, default=50, help="Inserções seguidas de leitura (padrão 50)")
+    parser.add_argument('--max-lag', type=float, default=1.0, help="REPLICA_CONFIG['max_lag'] na conferência (padrão 1 s)")
+    parser.add_argument('--porta-inacessivel', type=int, default=5499, help="Porta sem servidor (padrão 5499)")
+    parser.add_argument('--sem-lag', action='store_true', help="Pula a conferência que pausa a réplica")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+
+    replica = endereco(args.replica)
+    trabalho.REPLICA_CONFIG.update(replicas=[replica], max_lag=args.max_lag, read_your_writes=True)
+    trabalho.PROFILE_CONFIG['enabled'] = False
+    falhas = []
+    try:
+        trabalho.get_router().refresh()
+        estado = trabalho.replica_stats()['replicas'][0]
+        if estado['indisponivel'] or not estado['em_recuperacao']:
+            print(f"❌ {args.replica} não é uma réplica acessível: {estado['erro'] or 'não está em recuperação'}")
+            return 1
+        print(f"Réplica {args.replica} (lag {estado['lag'] or 0:.3f} s)")
+        falhas += conferir_roteamento()
+        falhas += conferir_leia_o_que_escreveu(args.insercoes)
+        if not args.sem_lag:
+            falhas += conferir_lag(replica, args.max_lag)
+        falhas += conferir_indisponivel(args.porta_inacessivel)
+    except psycopg2.Error as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        trabalho.close_pool()
+
+    if falhas:
+        print("❌ Falhas:")
+        for f in falhas:
+            print(f"  {f}")
+        return 1
+    print("✓ Leituras roteadas: réplica quando em dia, primário após escritas, com lag ou sem réplica")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+consumidor_eventos.py
+Consumo da fila de eventos de alteração (migração 010): inserções em
+Report, Interacao e HistoricoAtualizacao e mudanças de status de reports.
+
+Cada consumidor tem um nome e um checkpoint em ConsumidorEvento. Uma
+thread leitora aguarda em LISTEN eventos (com uma varredura de segurança a
+cada --espera segundos), lê a tabela Evento em lotes na ordem (xid,
+idEvento) e os coloca numa fila limitada; a thread do consumidor entrega
+cada lote ao processador e, na mesma transação em que ele pode escrever,
+avança o checkpoint.
+
+  - Entrega pelo menos uma vez: o checkpoint só avança depois que o lote
+    foi processado; após uma queda, o lote em andamento é entregue de novo
+    (idEvento identifica as repetições).
+  - Contrapressão: com a fila cheia (--fila lotes), a leitora para de ler;
+    os eventos atrasados esperam no banco, não na memória.
+  - Um processador que falha é repetido com espera crescente; esgotadas as
+    tentativas, o consumidor para sem avançar o checkpoint.
+
+O checkpoint só cobre eventos ainda na tabela: limpar apaga os que todos
+os consumidores registrados já passaram.
+
+Uso:
+  python3 consumidor_eventos.py consumir --nome painel             # JSON Lines na saída
+  python3 consumidor_eventos.py consumir --nome auditoria -o eventos.jsonl --max-eventos 10000
+  python3 consumidor_eventos.py status
+  python3 consumidor_eventos.py limpar [--manter-horas 72]
+  python3 consumidor_eventos.py medir --taxa 2000 --segundos 30    # grava reports e upvotes de teste
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import queue
+import random
+import select
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+import psycopg2
+
+import trabalho
+
+CANAL = 'eventos'
+
+EVENTOS_CONFIG = {
+    'lote': 500,          # events read and delivered per batch
+    'espera': 5.0,        # seconds between safety polls when no NOTIFY arrives
+    'fila': 4,            # batches read ahead of the processor (backpressure bound)
+    'tentativas': 5,      # attempts per batch before the consumer stops
+}
+
+
+class Evento(NamedTuple):
+    idEvento: int
+    xid: int
+    criadoEm: datetime.datetime
+    tabela: str
+    operacao: str
+    idReport: int
+    dados: dict
+
+
+REGISTRAR_SQL = """
+INSERT INTO ConsumidorEvento (nome) VALUES (%s)
+ON CONFLICT (nome) DO NOTHING
+"""
+
+CHECKPOINT_SQL = """
+SELECT ultimoXid::text::bigint, ultimoEvento FROM ConsumidorEvento WHERE nome = %s
+"""
+
+# Only events of transactions that have ended: an open transaction can no
+# longer add anything before the returned position
+LER_EVENTOS_SQL = trabalho.declarar('ler_eventos', """
+SELECT idEvento, xid, criadoEm, tabela, operacao, idReport, dados
+FROM Evento
+WHERE (xid, idEvento) > (%(xid)s::text::xid8, %(evento)s)
+  AND xid < pg_snapshot_xmin(pg_current_snapshot())
+ORDER BY xid, idEvento
+LIMIT %(lote)s
+""")
+
+# Committed events not readable yet because an older transaction is still open
+OCULTOS_SQL = trabalho.declarar('eventos_ocultos', """
+SELECT EXISTS (SELECT 1 FROM Evento WHERE xid >= pg_snapshot_xmin(pg_current_snapshot()))
+""")
+
+AVANCAR_SQL = trabalho.declarar('avancar_checkpoint', """
+UPDATE ConsumidorEvento
+SET ultimoXid = %(xid)s::text::xid8, ultimoEvento = %(evento)s,
+    entregues = entregues + %(n)s, atualizadoEm = NOW()
+WHERE nome = %(nome)s
+""")
+
+STATUS_SQL = """
+SELECT C.nome, C.ultimoXid::text::bigint, C.ultimoEvento, C.entregues, C.atualizadoEm,
+       P.pendentes, P.mais_antigo
+FROM ConsumidorEvento C
+CROSS JOIN LATERAL (
+    SELECT COUNT(*) AS pendentes, MIN(E.criadoEm) AS mais_antigo
+    FROM Evento E
+    WHERE (E.xid, E.idEvento) > (C.ultimoXid, C.ultimoEvento)
+) P
+ORDER BY C.nome
+"""
+
+
+def _conectar_listen():
+    """Dedicated autocommit connection for LISTEN: a pooled one would be held for the consumer's lifetime."""
+    conn = psycopg2.connect(**trabalho.parametros_conexao())
+    conn.set_session(autocommit=True)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {CANAL}")
+    return conn
+
+
+class ConsumidorEventos:
+    """
+    Named, checkpointed consumer of the Evento outbox.
+
+    processar(eventos, cur) receives each batch (a list of Evento, in
+    (xid, idEvento) order) and a cursor of the transaction that then moves
+    the checkpoint past the batch: writes made through `cur` commit
+    together with it, so a database sink sees each event exactly once.
+    Other side effects get at-least-once delivery.
+    """
+
+    def __init__(self, nome: str, processar: Callable, lote: Optional[int] = None,
+                 espera: Optional[float] = None, fila: Optional[int] = None,
+                 tentativas: Optional[int] = None):
+        self.nome = nome
+        self.processar = processar
+        self.lote = lote or EVENTOS_CONFIG['lote']
+        self.espera = EVENTOS_CONFIG['espera'] if espera is None else espera
+        self.tentativas = tentativas or EVENTOS_CONFIG['tentativas']
+        self._fila = queue.Queue(maxsize=fila or EVENTOS_CONFIG['fila'])
+        self._parar = threading.Event()
+        self._erro = None
+        self._lock = threading.Lock()
+        self._stats = {'lotes': 0, 'eventos': 0, 'leituras': 0, 'leituras_vazias': 0,
+                       'notificacoes': 0, 'esperas_fila': 0, 'repeticoes': 0,
+                       'tempo_processar': 0.0, 'tempo_checkpoint': 0.0}
+        self._atrasos = trabalho.Histogram(trabalho.PROFILE_CONFIG['sample_size'])
+        self._inicio = time.monotonic()
+        self._leitora = None
+
+    def _contar(self, chave: str, valor=1):
+        with self._lock:
+            self._stats[chave] += valor
+
+    def parar(self):
+        """Asks both threads to stop; executar() returns after the batch in hand is checkpointed."""
+        self._parar.set()
+
+    # -- leitura --------------------------------------------------------------
+
+    def _ler(self, cur, posicao: tuple) -> list:
+        trabalho.executar(cur, LER_EVENTOS_SQL, {'xid': posicao[0], 'evento': posicao[1], 'lote': self.lote})
+        self._contar('leituras')
+        # xid8 has no psycopg2 adapter and arrives as text
+        return [Evento(id_evento, int(xid), *resto) for id_evento, xid, *resto in cur.fetchall()]
+
+    def _ocultos(self, cur) -> bool:
+        trabalho.executar(cur, OCULTOS_SQL)
+        return cur.fetchone()[0]
+
+    def _enfileirar(self, eventos: list) -> bool:
+        """Blocks while the queue is full (backpressure); False if asked to stop meanwhile."""
+        esperou = False
+        while not self._parar.is_set():
+            try:
+                self._fila.put(eventos, timeout=0.1)
+                return True
+            except queue.Full:
+                if not esperou:
+                    esperou = True
+                    self._contar('esperas_fila')
+        return False
+
+    def _aguardar(self, conn, timeout: float) -> bool:
+        """Waits for a NOTIFY on the channel (or the timeout, or stop). True if one arrived."""
+        prazo = time.monotonic() + timeout
+        while not self._parar.is_set():
+            # Notifications received while a query ran are already buffered
+            if not conn.notifies:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    return False
+                if select.select([conn], [], [], min(restante, 0.5))[0]:
+                    conn.poll()
+            if conn.notifies:
+                self._contar('notificacoes', len(conn.notifies))
+                conn.notifies.clear()
+                return True
+        return False
+
+    def _executar_leitora(self, posicao: tuple):
+        conn = None
+        try:
+            conn = _conectar_listen()
+            recuo = 0.01
+            while not self._parar.is_set():
+                with conn.cursor() as cur:
+                    eventos = self._ler(cur, posicao)
+                    ocultos = len(eventos) < self.lote and self._ocultos(cur)
+                if eventos:
+                    if not self._enfileirar(eventos):
+                        break
+                    posicao = (eventos[-1].xid, eventos[-1].idEvento)
+                    if len(eventos) == self.lote:
+                        continue
+                else:
+                    self._contar('leituras_vazias')
+                if ocultos:
+                    # Committed events behind an older open transaction:
+                    # no NOTIFY will announce them, so poll with backoff
+                    self._aguardar(conn, recuo)
+                    recuo = min(recuo * 2, self.espera)
+                else:
+                    recuo = 0.01
+                    self._aguardar(conn, self.espera)
+        except Exception as e:
+            self._erro = e
+            self._parar.set()
+        finally:
+            if conn is not None:
+                conn.close()
+            self._fila.put(None)
+
+    # -- entrega --------------------------------------------------------------
+
+    def _checkpoint(self) -> tuple:
+        with trabalho.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(REGISTRAR_SQL, (self.nome,))
+                cur.execute(CHECKPOINT_SQL, (self.nome,))
+                return cur.fetchone()
+
+    def _entregar(self, eventos: list):
+        """Processes the batch and moves the checkpoint in one transaction, retrying with backoff."""
+        espera = 0.1
+        for tentativa in range(1, self.tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                with trabalho.get_connection() as conn:
+                    with conn.cursor() as cur:
+                        self.processar(eventos, cur)
+                        processado = time.perf_counter()
+                        trabalho.executar(cur, AVANCAR_SQL, {
+                            'xid': eventos[-1].xid, 'evento': eventos[-1].idEvento,
+                            'n': len(eventos), 'nome': self.nome})
+            except Exception:
+                if tentativa == self.tentativas or self._parar.is_set():
+                    raise
+                self._contar('repeticoes')
+                time.sleep(espera * (1 + random.random()))
+                espera *= 2
+            else:
+                fim = time.perf_counter()
+                agora = datetime.datetime.now(datetime.timezone.utc)
+                with self._lock:
+                    self._stats['lotes'] += 1
+                    self._stats['eventos'] += len(eventos)
+                    self._stats['tempo_processar'] += processado - inicio
+                    self._stats['tempo_checkpoint'] += fim - processado
+                    for evento in eventos:
+                        self._atrasos.add((agora - evento.criadoEm).total_seconds() * 1000)
+                return
+
+    def executar(self, max_eventos: Optional[int] = None) -> int:
+        """
+        Runs until parar(), until `max_eventos` were delivered, or until a
+        batch exhausts its attempts (re-raised). Returns the events delivered.
+        """
+        posicao = self._checkpoint()
+        self._parar.clear()
+        self._erro = None
+        self._leitora = threading.Thread(target=self._executar_leitora, args=(posicao,),
+                                         name=f'eventos-{self.nome}', daemon=True)
+        self._leitora.start()
+        entregues = 0
+        try:
+            while True:
+                eventos = self._fila.get()
+                if eventos is None:
+                    break
+                if self._parar.is_set() and self._erro is None:
+                    continue  # stopping: batches read ahead stay after the checkpoint
+                self._entregar(eventos)
+                entregues += len(eventos)
+                if max_eventos is not None and entregues >= max_eventos:
+                    self.parar()
+        finally:
+            self.parar()
+            # Drain so a reader blocked on a full queue can exit
+            while self._leitora.is_alive() or not self._fila.empty():
+                try:
+                    self._fila.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._leitora.join()
+        if self._erro is not None:
+            raise self._erro
+        return entregues
+
+    def stats(self) -> dict:
+        """Batches and events delivered, rates, queue occupancy and delivery delay percentiles (ms after the write)."""
+        with self._lock:
+            data = dict(self._stats)
+            data['atraso_p50_ms'] = self._atrasos.percentile(50)
+            data['atraso_p99_ms'] = self._atrasos.percentile(99)
+            data['atraso_max_ms'] = self._atrasos.max
+        decorrido = time.monotonic() - self._inicio
+        data['eventos_por_s'] = data['eventos'] / decorrido if decorrido else 0.0
+        data['media_lote'] = data['eventos'] / data['lotes'] if data['lotes'] else 0.0
+        data['fila'] = self._fila.qsize()
+        return data
+
+
+def evento_json(evento: Evento) -> dict:
+    return {'idEvento': evento.idEvento, 'xid': evento.xid, 'criadoEm': evento.criadoEm.isoformat(),
+            'tabela': evento.tabela, 'operacao': evento.operacao, 'idReport': evento.idReport,
+            'dados': evento.dados}
+
+
+def gravador_jsonl(out) -> Callable:
+    """Processor writing one JSON line per event; flushed per batch, before the checkpoint moves."""
+    def processar(eventos: list, _cur):
+        for evento in eventos:
+            out.write(json.dumps(evento_json(evento), ensure_ascii=False))
+            out.write('\n')
+        out.flush()
+    return processar
+
+
+def invalidador_cache() -> Callable:
+    """Processor dropping this process's cached reports that read the changed tables."""
+    def processar(eventos: list, _cur):
+        trabalho.invalidar_cache(*{evento.tabela for evento in eventos})
+    return processar
+
+
+def status() -> list:
+    """[(nome, xid, idEvento, entregues, atualizadoEm, pendentes, criadoEm do pendente mais antigo)]"""
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(STATUS_SQL)
+            return cur.fetchall()
+
+
+def limpar(manter: Optional[datetime.timedelta] = None) -> int:
+    """Deletes the events every consumer has passed (and, with `manter`, older ones). Returns how many."""
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT limpar_eventos(%s)", (manter,))
+            return cur.fetchone()[0]
+
+
+# -------------------------
+# Medição
+# -------------------------
+MEDICAO_CIDADAOS = 5000
+
+# Fresh reports for the run: no citizen has interacted with them yet, so
+# every (citizen, report) pair is a valid new interaction
+PREPARAR_MEDICAO_SQL = """
+WITH cidadaos AS (SELECT cpf FROM Cidadao ORDER BY cpf LIMIT %(cidadaos)s),
+novos AS (
+    INSERT INTO Report (titulo, localizacao, idCategoriaReport, cpfCidadao)
+    SELECT 'Medição de eventos ' || i, 'consumidor_eventos.py',
+           (SELECT MIN(idCategoriaReport) FROM CategoriaReport), (SELECT MIN(cpf) FROM cidadaos)
+    FROM generate_series(1, %(reports)s) i
+    RETURNING idReport
+)
+SELECT (SELECT array_agg(idReport ORDER BY idReport) FROM novos), (SELECT array_agg(cpf) FROM cidadaos)
+"""
+
+
+def _produzir(pares, trava: threading.Lock, taxa: float, segundos: float, lote: int,
+              parar: threading.Event, resultado: dict):
+    """Writes upvotes for the shared (report, cpf) pairs at `taxa` per second, in batches of `lote`, for `segundos`."""
+    intervalo = lote / taxa
+    inicio = time.monotonic()
+    proximo = inicio
+    escritos = 0
+    tempo_escrita = 0.0
+    try:
+        while not parar.is_set() and time.monotonic() - inicio < segundos:
+            with trava:
+                itens = [trabalho.interacao(cpf, id_report, 'Upvote')
+                         for id_report, cpf in itertools.islice(pares, lote)]
+            t0 = time.perf_counter()
+            trabalho.registrar_interacoes(itens)
+            tempo_escrita += time.perf_counter() - t0
+            escritos += len(itens)
+            proximo += intervalo
+            atraso = proximo - time.monotonic()
+            if atraso > 0:
+                time.sleep(atraso)
+    except Exception as e:
+        resultado['erro'] = e
+    resultado.update(escritos=escritos, segundos=time.monotonic() - inicio, tempo_escrita=tempo_escrita)
+
+
+def medir(taxa: float, segundos: float, lote_producao: int, produtores: int = 1,
+          lote: Optional[int] = None, fila: Optional[int] = None, atraso_ms: float = 0.0,
+          nome: str = 'medicao') -> dict:
+    """
+    Sustained-rate run: `produtores` threads write interactions at `taxa`
+    events/s in total while a consumer (starting at the current end of the
+    outbox) takes `atraso_ms` per batch. Returns produced/consumed rates
+    and delivery delays.
+    """
+    total = int(taxa * segundos) + lote_producao
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(PREPARAR_MEDICAO_SQL, {'cidadaos': MEDICAO_CIDADAOS,
+                                               'reports': -(-total // MEDICAO_CIDADAOS)})
+            reports, cpfs = cur.fetchone()
+            cur.execute("DELETE FROM ConsumidorEvento WHERE nome = %s", (nome,))
+    # Separate transaction: the checkpoint starts after the reports just created
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO ConsumidorEvento (nome, ultimoXid, ultimoEvento)
+                SELECT %s, COALESCE(MAX(xid), '0'), COALESCE(MAX(idEvento), 0) FROM Evento
+                """, (nome,))
+
+    def processar(_eventos, _cur):
+        if atraso_ms:
+            time.sleep(atraso_ms / 1000)
+
+    consumidor = ConsumidorEventos(nome, processar, lote=lote, fila=fila)
+    parar = threading.Event()
+    pares = itertools.product(reports, cpfs)
+    trava = threading.Lock()
+    resultados = [{} for _ in range(produtores)]
+    threads = [threading.Thread(target=_produzir, args=(pares, trava, taxa / produtores, segundos,
+                                                         lote_producao, parar, r))
+               for r in resultados]
+
+    def vigiar():
+        for produtor in threads:
+            produtor.join()
+        # Let the consumer catch up, then stop it
+        escritos = sum(r['escritos'] for r in resultados)
+        while consumidor.stats()['eventos'] < escritos:
+            time.sleep(0.05)
+        consumidor.parar()
+
+    for produtor in threads:
+        produtor.start()
+    threading.Thread(target=vigiar, daemon=True).start()
+    try:
+        consumidor.executar()
+    finally:
+        parar.set()
+        for produtor in threads:
+            produtor.join()
+        with trabalho.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM ConsumidorEvento WHERE nome = %s", (nome,))
+    for r in resultados:
+        if 'erro' in r:
+            raise r['erro']
+    producao = {'escritos': sum(r['escritos'] for r in resultados),
+                'segundos': max(r['segundos'] for r in resultados),
+                'tempo_escrita': sum(r['tempo_escrita'] for r in resultados)}
+    dados = consumidor.stats()
+    dados.update(producao)
+    dados['produzidos_por_s'] = producao['escritos'] / producao['segundos'] if producao['segundos'] else 0.0
+    return dados
+
+
+def _consumir(args) -> int:
+    out = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    consumidor = ConsumidorEventos(args.nome, gravador_jsonl(out), lote=args.lote, espera=args.espera,
+                                   fila=args.fila)
+    try:
+        entregues = consumidor.executar(args.max_eventos)
+    except KeyboardInterrupt:
+        consumidor.parar()
+        entregues = consumidor.stats()['eventos']
+    finally:
+        if args.output:
+            out.close()
+    print(f"✓ {entregues} evento(s) entregue(s) a '{args.nome}'", file=sys.stderr)
+    return 0
+
+
+def _status(_args) -> int:
+    linhas = status()
+    if not linhas:
+        print("Nenhum consumidor registrado.")
+    for nome, xid, evento, entregues, atualizado, pendentes, mais_antigo in linhas:
+        atraso = ''
+        if mais_antigo is not None:
+            segundos = (datetime.datetime.now(datetime.timezone.utc) - mais_antigo).total_seconds()
+            atraso = f"  pendente mais antigo há {segundos:.1f} s"
+        print(f"  {nome:<24} checkpoint ({xid}, {evento})  entregues {entregues:>10}  "
+              f"pendentes {pendentes:>8}{atraso}")
+    return 0
+
+
+def _limpar(args) -> int:
+    manter = datetime.timedelta(hours=args.manter_horas) if args.manter_horas is not None else None
+    print(f"✓ {limpar(manter)} evento(s) apagado(s)")
+    return 0
+
+
+def _medir(args) -> int:
+    dados = medir(args.taxa, args.segundos, args.lote_producao, args.produtores, lote=args.lote,
+                  fila=args.fila, atraso_ms=args.atraso_ms)
+    print(f"Produção: {dados['escritos']} eventos em {dados['segundos']:.1f} s "
+          f"({dados['produzidos_por_s']:.0f}/s; alvo {args.taxa:.0f}/s; "
+          f"escrita {dados['tempo_escrita'] * 1000 / max(1, dados['escritos'] / args.lote_producao):.1f} ms/lote)")
+    print(f"Consumo:  {dados['eventos']} eventos em {dados['lotes']} lotes "
+          f"(média {dados['media_lote']:.0f}/lote), {dados['eventos_por_s']:.0f}/s")
+    print(f"Atraso escrita→entrega: p50 {dados['atraso_p50_ms']:.1f} ms  "
+          f"p99 {dados['atraso_p99_ms']:.1f} ms  máx {dados['atraso_max_ms']:.1f} ms")
+    print(f"Leituras {dados['leituras']} (vazias {dados['leituras_vazias']}), NOTIFYs {dados['notificacoes']}, "
+          f"fila cheia {dados['esperas_fila']}x, checkpoint {dados['tempo_checkpoint'] * 1000 / max(1, dados['lotes']):.2f} ms/lote")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Consumidores da fila de eventos (migração 010).")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('consumir', help="Entrega os eventos a partir do checkpoint, em JSON Lines")
+    p.add_argument('--nome', required=True, help="Nome do consumidor (checkpoint próprio)")
+    p.add_argument('-o', '--output', help="Arquivo de saída, acrescentado (padrão: saída padrão)")
+    p.add_argument('--max-eventos', type=int, help="Para após entregar este número de eventos")
+    p.add_argument('--lote', type=int, help=f"Eventos por lote (padrão {EVENTOS_CONFIG['lote']})")
+    p.add_argument('--fila', type=int, help=f"Lotes lidos à frente (padrão {EVENTOS_CONFIG['fila']})")
+    p.add_argument('--espera', type=float, help=f"Segundos entre varreduras sem NOTIFY (padrão {EVENTOS_CONFIG['espera']})")
+    p.set_defaults(func=_consumir)
+
+    p = sub.add_parser('status', help="Checkpoint e eventos pendentes de cada consumidor")
+    p.set_defaults(func=_status)
+
+    p = sub.add_parser('limpar', help="Apaga os eventos já entregues a todos os consumidores")
+    p.add_argument('--manter-horas', type=float, help="Apaga também os eventos mais antigos que isto")
+    p.set_defaults(func=_limpar)
+
+    p = sub.add_parser('medir', help="Vazão sustentada: grava upvotes de teste e consome os eventos")
+    p.add_argument('--taxa', type=float, default=1000, help="Eventos por segundo gravados (padrão 1000)")
+    p.add_argument('--segundos', type=float, default=10, help="Duração da produção (padrão 10)")
+    p.add_argument('--lote-producao', type=int, default=50, help="Interações por transação do produtor (padrão 50)")
+    p.add_argument('--produtores', type=int, default=1, help="Threads gravando em paralelo (padrão 1)")
+    p.add_argument('--lote', type=int, help=f"Eventos por lote do consumidor (padrão {EVENTOS_CONFIG['lote']})")
+    p.add_argument('--fila', type=int, help=f"Lotes lidos à frente (padrão {EVENTOS_CONFIG['fila']})")
+    p.add_argument('--atraso-ms', type=float, default=0.0,
+                   help="Tempo simulado de processamento por lote, para ver a contrapressão (padrão 0)")
+    p.set_defaults(func=_medir)
+
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+    try:
+        return args.func(args)
+    except (psycopg2.Error, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        trabalho.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 002: Índices para as consultas do trabalho.py
+-- ===============================================
+-- esquema.sql cria apenas chaves primárias e UNIQUE. Estes índices cobrem
+-- as junções e filtros das sete consultas (consultar_* / CONSULTAS) e a
+-- paginação de usuários. Criados com CONCURRENTLY para não bloquear
+-- escritas; por isso este arquivo NÃO deve ser executado dentro de uma
+-- transação (psql -1).
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 2) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 002 já aplicada.'
+\quit
+\endif
+
+-- ===============================================
+-- INTERACAO
+-- ===============================================
+
+-- Consultas 1, 3, 5: junção Report -> Interacao por idReport.
+-- O composto também serve "interações mais recentes de um report".
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_interacao_report_datahora
+    ON Interacao (idReport, dataHora DESC);
+
+-- Consulta 7: ORDER BY dataHora DESC LIMIT 10 (varredura ordenada, para cedo)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_interacao_datahora
+    ON Interacao (dataHora DESC);
+
+-- FK para Cidadao (deleção/ranking de cidadãos)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_interacao_cidadao
+    ON Interacao (cpfCidadao);
+
+-- ===============================================
+-- REPORT
+-- ===============================================
+
+-- Consulta 3: filtro status = 'Resolvido' agrupado por categoria
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_status_categoria
+    ON Report (status, idCategoriaReport);
+
+-- Consultas 1/3/4: junção com CategoriaReport
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_categoria
+    ON Report (idCategoriaReport);
+
+-- Consultas 5 e 7: apenas reports ativos; parcial = pequeno e sempre quente
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_ativos
+    ON Report (idReport) INCLUDE (titulo, dataCriacao)
+    WHERE status IN ('Aberto', 'Em Análise');
+
+-- Consulta 6: agrupamento por localização dos reports ativos
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_ativos_localizacao
+    ON Report (localizacao, dataCriacao)
+    WHERE status IN ('Aberto', 'Em Análise');
+
+-- FK para Cidadao
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_cidadao
+    ON Report (cpfCidadao);
+
+-- ===============================================
+-- HISTORICOATUALIZACAO
+-- ===============================================
+
+-- Consultas 2 e 4: atualizações por funcionário (index-only scan p/ COUNT DISTINCT)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historico_funcionario_report
+    ON HistoricoAtualizacao (cpfFuncionario, idReport);
+
+-- Consulta 5: MAX(dataHoraAtualizacao) por report
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historico_report_data
+    ON HistoricoAtualizacao (idReport, dataHoraAtualizacao DESC);
+
+-- ===============================================
+-- DEMAIS
+-- ===============================================
+
+-- Paginação por chave (nome, cpf) em pagina_usuarios()
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuario_nome_cpf
+    ON Usuario (nome, cpf);
+
+-- FK de Midia para Report (ON DELETE CASCADE)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_midia_report
+    ON Midia (idReport);
+
+ANALYZE Usuario;
+ANALYZE Report;
+ANALYZE Interacao;
+ANALYZE HistoricoAtualizacao;
+ANALYZE Midia;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (2, 'Índices para as consultas de relatório');
@@ -0,0 +1,316 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 003: Tabelas de resumo para os relatórios do painel
+-- ===============================================
+-- As consultas 1, 2 e 3 recalculavam GROUP BY sobre Interacao,
+-- HistoricoAtualizacao e Avaliacao a cada abertura. Estas tabelas guardam
+-- os agregados já prontos e são mantidas incrementalmente por triggers
+-- (por comando, com tabelas de transição, para que cargas em massa gerem
+-- um único UPSERT por report/funcionário em vez de um por linha).
+--
+-- Resumos mantidos:
+--   ResumoInteracoesReport    total de interações por report        (consulta 1)
+--   ResumoFuncionarioReport   pares distintos funcionário × report    (consulta 2)
+--   ResumoFuncionario         reports distintos atualizados           (consulta 2)
+--   ResumoAvaliacaoReport     soma/quantidade de notas por report
+--   ResumoAvaliacaoCategoria  soma/quantidade de notas de reports
+--                             'Resolvido' por categoria               (consulta 3)
+--
+-- recalcular_resumos() reconstrói tudo a partir das tabelas base.
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 3) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 003 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+-- ===============================================
+-- TABELAS DE RESUMO
+-- ===============================================
+
+CREATE TABLE ResumoInteracoesReport (
+    idReport INTEGER PRIMARY KEY,
+    totalInteracoes INTEGER NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (idReport) REFERENCES Report (idReport)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE ResumoFuncionarioReport (
+    cpfFuncionario VARCHAR(14) NOT NULL,
+    idReport INTEGER NOT NULL,
+    totalAtualizacoes INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (cpfFuncionario, idReport),
+
+    FOREIGN KEY (cpfFuncionario) REFERENCES Funcionario (cpf)
+        ON DELETE CASCADE,
+    FOREIGN KEY (idReport) REFERENCES Report (idReport)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE ResumoFuncionario (
+    cpfFuncionario VARCHAR(14) PRIMARY KEY,
+    reportsAtualizados INTEGER NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (cpfFuncionario) REFERENCES Funcionario (cpf)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE ResumoAvaliacaoReport (
+    idReport INTEGER PRIMARY KEY,
+    somaNotas BIGINT NOT NULL DEFAULT 0,
+    qtdAvaliacoes INTEGER NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (idReport) REFERENCES Report (idReport)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE ResumoAvaliacaoCategoria (
+    idCategoriaReport INTEGER PRIMARY KEY,
+    somaNotas BIGINT NOT NULL DEFAULT 0,
+    qtdAvaliacoes INTEGER NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (idCategoriaReport) REFERENCES CategoriaReport (idCategoriaReport)
+        ON DELETE CASCADE
+);
+
+-- ===============================================
+-- INTERACAO -> ResumoInteracoesReport
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_resumo_interacao_ins() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO ResumoInteracoesReport AS r (idReport, totalInteracoes)
+    SELECT idReport, COUNT(*)
+    FROM novas
+    GROUP BY idReport
+    ORDER BY idReport  -- ordem fixa de locks entre transações concorrentes
+    ON CONFLICT (idReport) DO UPDATE
+        SET totalInteracoes = r.totalInteracoes + EXCLUDED.totalInteracoes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_resumo_interacao_del() RETURNS trigger AS $$
+BEGIN
+    UPDATE ResumoInteracoesReport r
+    SET totalInteracoes = r.totalInteracoes - d.qtd
+    FROM (SELECT idReport, COUNT(*) AS qtd FROM antigas GROUP BY idReport) d
+    WHERE r.idReport = d.idReport;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resumo_interacao_ins
+    AFTER INSERT ON Interacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_interacao_ins();
+
+CREATE TRIGGER resumo_interacao_del
+    AFTER DELETE ON Interacao
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_interacao_del();
+
+-- ===============================================
+-- HISTORICOATUALIZACAO -> ResumoFuncionario(Report)
+-- ===============================================
+-- Um par (funcionário, report) novo incrementa reportsAtualizados; o
+-- ON CONFLICT serializa pares concorrentes e (xmax = 0) distingue
+-- inserção de atualização.
+
+CREATE OR REPLACE FUNCTION trg_resumo_historico_ins() RETURNS trigger AS $$
+BEGIN
+    WITH pares AS (
+        INSERT INTO ResumoFuncionarioReport AS p (cpfFuncionario, idReport, totalAtualizacoes)
+        SELECT cpfFuncionario, idReport, COUNT(*)
+        FROM novas
+        GROUP BY cpfFuncionario, idReport
+        ORDER BY cpfFuncionario, idReport
+        ON CONFLICT (cpfFuncionario, idReport) DO UPDATE
+            SET totalAtualizacoes = p.totalAtualizacoes + EXCLUDED.totalAtualizacoes
+        RETURNING p.cpfFuncionario, (p.xmax = 0) AS novo
+    )
+    INSERT INTO ResumoFuncionario AS f (cpfFuncionario, reportsAtualizados)
+    SELECT cpfFuncionario, COUNT(*)
+    FROM pares
+    WHERE novo
+    GROUP BY cpfFuncionario
+    ORDER BY cpfFuncionario
+    ON CONFLICT (cpfFuncionario) DO UPDATE
+        SET reportsAtualizados = f.reportsAtualizados + EXCLUDED.reportsAtualizados;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resumo_historico_ins
+    AFTER INSERT ON HistoricoAtualizacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_historico_ins();
+
+-- ===============================================
+-- AVALIACAO -> ResumoAvaliacaoReport / ResumoAvaliacaoCategoria
+-- ===============================================
+-- Os reports envolvidos são travados FOR SHARE para não correr em paralelo
+-- com uma mudança de status, que move a soma do report entre categorias.
+
+CREATE OR REPLACE FUNCTION aplicar_delta_avaliacao(
+    p_reports INTEGER[], p_somas BIGINT[], p_qtds INTEGER[]
+) RETURNS void AS $$
+BEGIN
+    PERFORM 1 FROM Report
+    WHERE idReport = ANY (p_reports)
+    ORDER BY idReport FOR SHARE;
+
+    INSERT INTO ResumoAvaliacaoReport AS r (idReport, somaNotas, qtdAvaliacoes)
+    SELECT d.idReport, d.soma, d.qtd
+    FROM unnest(p_reports, p_somas, p_qtds) AS d(idReport, soma, qtd)
+    ORDER BY d.idReport
+    ON CONFLICT (idReport) DO UPDATE
+        SET somaNotas = r.somaNotas + EXCLUDED.somaNotas,
+            qtdAvaliacoes = r.qtdAvaliacoes + EXCLUDED.qtdAvaliacoes;
+
+    INSERT INTO ResumoAvaliacaoCategoria AS c (idCategoriaReport, somaNotas, qtdAvaliacoes)
+    SELECT R.idCategoriaReport, SUM(d.soma), SUM(d.qtd)
+    FROM unnest(p_reports, p_somas, p_qtds) AS d(idReport, soma, qtd)
+    JOIN Report R ON R.idReport = d.idReport
+    WHERE R.status = 'Resolvido'
+    GROUP BY R.idCategoriaReport
+    ORDER BY R.idCategoriaReport
+    ON CONFLICT (idCategoriaReport) DO UPDATE
+        SET somaNotas = c.somaNotas + EXCLUDED.somaNotas,
+            qtdAvaliacoes = c.qtdAvaliacoes + EXCLUDED.qtdAvaliacoes;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_resumo_avaliacao_ins() RETURNS trigger AS $$
+BEGIN
+    PERFORM aplicar_delta_avaliacao(array_agg(idReport), array_agg(soma), array_agg(qtd))
+    FROM (
+        SELECT I.idReport, SUM(n.nota)::bigint AS soma, COUNT(*)::integer AS qtd
+        FROM novas n JOIN Interacao I ON I.idInteracao = n.idInteracao
+        GROUP BY I.idReport
+    ) d;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_resumo_avaliacao_del() RETURNS trigger AS $$
+BEGIN
+    PERFORM aplicar_delta_avaliacao(array_agg(idReport), array_agg(-soma), array_agg(-qtd))
+    FROM (
+        SELECT I.idReport, SUM(a.nota)::bigint AS soma, COUNT(*)::integer AS qtd
+        FROM antigas a JOIN Interacao I ON I.idInteracao = a.idInteracao
+        GROUP BY I.idReport
+    ) d;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resumo_avaliacao_ins
+    AFTER INSERT ON Avaliacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_avaliacao_ins();
+
+CREATE TRIGGER resumo_avaliacao_del
+    AFTER DELETE ON Avaliacao
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_avaliacao_del();
+
+-- ===============================================
+-- REPORT (status/categoria) -> ResumoAvaliacaoCategoria
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_resumo_report_status() RETURNS trigger AS $$
+DECLARE
+    v_soma BIGINT;
+    v_qtd INTEGER;
+BEGIN
+    SELECT somaNotas, qtdAvaliacoes INTO v_soma, v_qtd
+    FROM ResumoAvaliacaoReport WHERE idReport = NEW.idReport;
+    IF NOT FOUND OR v_qtd = 0 THEN
+        RETURN NULL;
+    END IF;
+
+    IF OLD.status = 'Resolvido' THEN
+        UPDATE ResumoAvaliacaoCategoria
+        SET somaNotas = somaNotas - v_soma, qtdAvaliacoes = qtdAvaliacoes - v_qtd
+        WHERE idCategoriaReport = OLD.idCategoriaReport;
+    END IF;
+
+    IF NEW.status = 'Resolvido' THEN
+        INSERT INTO ResumoAvaliacaoCategoria AS c (idCategoriaReport, somaNotas, qtdAvaliacoes)
+        VALUES (NEW.idCategoriaReport, v_soma, v_qtd)
+        ON CONFLICT (idCategoriaReport) DO UPDATE
+            SET somaNotas = c.somaNotas + EXCLUDED.somaNotas,
+                qtdAvaliacoes = c.qtdAvaliacoes + EXCLUDED.qtdAvaliacoes;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER resumo_report_status
+    AFTER UPDATE OF status, idCategoriaReport ON Report
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.idCategoriaReport IS DISTINCT FROM NEW.idCategoriaReport)
+    EXECUTE FUNCTION trg_resumo_report_status();
+
+-- ===============================================
+-- RECONSTRUÇÃO COMPLETA
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION recalcular_resumos() RETURNS void AS $$
+BEGIN
+    -- Bloqueia escritas nas tabelas base enquanto reconstrói
+    LOCK TABLE Report, Interacao, Avaliacao, HistoricoAtualizacao IN SHARE MODE;
+
+    TRUNCATE ResumoInteracoesReport, ResumoFuncionarioReport, ResumoFuncionario,
+             ResumoAvaliacaoReport, ResumoAvaliacaoCategoria;
+
+    INSERT INTO ResumoInteracoesReport (idReport, totalInteracoes)
+    SELECT idReport, COUNT(*) FROM Interacao GROUP BY idReport;
+
+    INSERT INTO ResumoFuncionarioReport (cpfFuncionario, idReport, totalAtualizacoes)
+    SELECT cpfFuncionario, idReport, COUNT(*)
+    FROM HistoricoAtualizacao
+    GROUP BY cpfFuncionario, idReport;
+
+    INSERT INTO ResumoFuncionario (cpfFuncionario, reportsAtualizados)
+    SELECT cpfFuncionario, COUNT(*) FROM ResumoFuncionarioReport GROUP BY cpfFuncionario;
+
+    INSERT INTO ResumoAvaliacaoReport (idReport, somaNotas, qtdAvaliacoes)
+    SELECT I.idReport, SUM(A.nota), COUNT(*)
+    FROM Avaliacao A JOIN Interacao I ON I.idInteracao = A.idInteracao
+    GROUP BY I.idReport;
+
+    INSERT INTO ResumoAvaliacaoCategoria (idCategoriaReport, somaNotas, qtdAvaliacoes)
+    SELECT R.idCategoriaReport, SUM(RA.somaNotas), SUM(RA.qtdAvaliacoes)
+    FROM ResumoAvaliacaoReport RA JOIN Report R ON R.idReport = RA.idReport
+    WHERE R.status = 'Resolvido'
+    GROUP BY R.idCategoriaReport;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$ BEGIN PERFORM recalcular_resumos(); END $$;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (3, 'Tabelas de resumo mantidas por trigger para o painel');
+
+COMMIT;
+
+ANALYZE ResumoInteracoesReport;
+ANALYZE ResumoFuncionario;
+ANALYZE ResumoAvaliacaoCategoria;
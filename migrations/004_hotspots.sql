@@ -0,0 +1,279 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 004: Localização normalizada, coordenadas e hotspots
+-- ===============================================
+-- A consulta 6 agrupava reports ativos pelo texto exato de localizacao
+-- ("Rua A, 100" e "Rua A 100" eram áreas diferentes) e varria todos os
+-- reports ativos a cada execução. Agora:
+--
+--   Report.localizacaoNormalizada  texto sem acentos/pontuação, com
+--                                  abreviações expandidas (trigger)
+--   Report.latitude/longitude      coordenadas, vindas do cache
+--                                  Geocodificacao (trigger) ou do
+--                                  geocodificador do trabalho.py
+--   Report.celulaLat/celulaLon     célula da grade de 0,001° (~110 m),
+--                                  colunas geradas
+--   ResumoHotspot                  reports ativos por célula, mantido
+--                                  por triggers
+--
+-- A consulta de hotspots agrega ResumoHotspot em células do tamanho do
+-- raio pedido e junta células vizinhas: o custo depende do número de
+-- células ocupadas, não do número de reports. Com janela de tempo, lê só
+-- os reports ativos da janela (idx_report_ativos_recentes).
+-- recalcular_hotspots() reconstrói o resumo a partir de Report.
+--
+-- ADD COLUMN ... GENERATED reescreve Report sob bloqueio exclusivo; os
+-- índices são criados depois com CONCURRENTLY, por isso este arquivo NÃO
+-- deve ser executado dentro de uma transação (psql -1).
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 4) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 004 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+-- ===============================================
+-- NORMALIZAÇÃO E GEOCODIFICAÇÃO
+-- ===============================================
+
+-- 'R. das Flores, nº 523 - Campinas/SP' -> 'rua das flores 523 campinas sp'
+CREATE OR REPLACE FUNCTION normalizar_localizacao(texto TEXT) RETURNS TEXT AS $$
+    SELECT btrim(
+        regexp_replace(regexp_replace(regexp_replace(regexp_replace(
+        regexp_replace(regexp_replace(regexp_replace(regexp_replace(
+            ' ' || regexp_replace(
+                translate(lower(texto), 'áàâãäéèêëíìîïóòôõöúùûüçñ', 'aaaaaeeeeiiiiooooouuuucn'),
+                '[^a-z0-9]+', ' ', 'g') || ' ',
+            ' (av|avn) ', ' avenida ', 'g'),
+            ' r ', ' rua ', 'g'),
+            ' (pca|pc) ', ' praca ', 'g'),
+            ' al ', ' alameda ', 'g'),
+            ' (tv|trav) ', ' travessa ', 'g'),
+            ' (estr|est) ', ' estrada ', 'g'),
+            ' rod ', ' rodovia ', 'g'),
+            ' (n|no|num) ([0-9])', ' \2', 'g'))
+$$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE;
+
+-- Cache de geocodificação por endereço normalizado. Coordenadas NULL
+-- registram que o geocodificador não encontrou o endereço.
+CREATE TABLE IF NOT EXISTS Geocodificacao (
+    endereco TEXT PRIMARY KEY,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    fonte VARCHAR(50) NOT NULL,
+    consultadoEm TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    CHECK ((latitude IS NULL) = (longitude IS NULL)),
+    CHECK (latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180)
+);
+
+ALTER TABLE Report
+    ADD COLUMN IF NOT EXISTS localizacaoNormalizada TEXT,
+    ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS celulaLat INTEGER GENERATED ALWAYS AS (floor(latitude * 1000)::integer) STORED,
+    ADD COLUMN IF NOT EXISTS celulaLon INTEGER GENERATED ALWAYS AS (floor(longitude * 1000)::integer) STORED;
+
+-- Normaliza a localização e, sem coordenadas informadas, usa as do cache.
+-- Mudar a localização sem informar coordenadas descarta as antigas.
+CREATE OR REPLACE FUNCTION trg_report_localizacao() RETURNS trigger AS $$
+BEGIN
+    NEW.localizacaoNormalizada := normalizar_localizacao(NEW.localizacao);
+    IF TG_OP = 'UPDATE'
+       AND NEW.localizacao IS DISTINCT FROM OLD.localizacao
+       AND NEW.latitude IS NOT DISTINCT FROM OLD.latitude
+       AND NEW.longitude IS NOT DISTINCT FROM OLD.longitude THEN
+        NEW.latitude := NULL;
+        NEW.longitude := NULL;
+    END IF;
+    IF NEW.latitude IS NULL OR NEW.longitude IS NULL THEN
+        SELECT G.latitude, G.longitude INTO NEW.latitude, NEW.longitude
+        FROM Geocodificacao G
+        WHERE G.endereco = NEW.localizacaoNormalizada;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS report_localizacao ON Report;
+CREATE TRIGGER report_localizacao
+    BEFORE INSERT OR UPDATE OF localizacao, latitude, longitude ON Report
+    FOR EACH ROW EXECUTE FUNCTION trg_report_localizacao();
+
+-- Preenche localizacaoNormalizada (e coordenadas já em cache) dos reports existentes
+UPDATE Report SET localizacao = localizacao WHERE localizacaoNormalizada IS NULL;
+
+-- ===============================================
+-- REPORT -> ResumoHotspot
+-- ===============================================
+-- Reports ativos ('Aberto'/'Em Análise') com coordenadas, por célula de
+-- 0,001°. As somas permitem calcular o centroide e a idade média de
+-- qualquer agrupamento de células.
+
+CREATE TABLE IF NOT EXISTS ResumoHotspot (
+    celulaLat INTEGER NOT NULL,
+    celulaLon INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    somaLatitude DOUBLE PRECISION NOT NULL,
+    somaLongitude DOUBLE PRECISION NOT NULL,
+    somaCriacao DOUBLE PRECISION NOT NULL,  -- soma de EXTRACT(EPOCH FROM dataCriacao)
+
+    PRIMARY KEY (celulaLat, celulaLon)
+);
+
+-- Só contém linhas zeradas entre o UPSERT e o DELETE de aplicar_delta_hotspot()
+CREATE INDEX IF NOT EXISTS idx_resumo_hotspot_zerado
+    ON ResumoHotspot (celulaLat) WHERE total <= 0;
+
+CREATE OR REPLACE FUNCTION aplicar_delta_hotspot(
+    p_lat INTEGER[], p_lon INTEGER[], p_total INTEGER[],
+    p_soma_lat DOUBLE PRECISION[], p_soma_lon DOUBLE PRECISION[], p_soma_criacao DOUBLE PRECISION[]
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO ResumoHotspot AS h (celulaLat, celulaLon, total,
+                                    somaLatitude, somaLongitude, somaCriacao)
+    SELECT * FROM unnest(p_lat, p_lon, p_total, p_soma_lat, p_soma_lon, p_soma_criacao)
+    ORDER BY 1, 2  -- ordem fixa de locks entre transações concorrentes
+    ON CONFLICT (celulaLat, celulaLon) DO UPDATE
+        SET total = h.total + EXCLUDED.total,
+            somaLatitude = h.somaLatitude + EXCLUDED.somaLatitude,
+            somaLongitude = h.somaLongitude + EXCLUDED.somaLongitude,
+            somaCriacao = h.somaCriacao + EXCLUDED.somaCriacao;
+    DELETE FROM ResumoHotspot WHERE total <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_resumo_hotspot() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM aplicar_delta_hotspot(array_agg(celulaLat), array_agg(celulaLon),
+                                      array_agg(total), array_agg(somaLat), array_agg(somaLon),
+                                      array_agg(somaCriacao))
+        FROM (
+            SELECT celulaLat, celulaLon,
+                   COUNT(*)::integer AS total, SUM(latitude) AS somaLat, SUM(longitude) AS somaLon,
+                   SUM(EXTRACT(EPOCH FROM dataCriacao))::double precision AS somaCriacao
+            FROM novas
+            WHERE status IN ('Aberto', 'Em Análise') AND latitude IS NOT NULL AND dataCriacao IS NOT NULL
+            GROUP BY 1, 2
+        ) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM aplicar_delta_hotspot(array_agg(celulaLat), array_agg(celulaLon),
+                                      array_agg(total), array_agg(somaLat), array_agg(somaLon),
+                                      array_agg(somaCriacao))
+        FROM (
+            SELECT celulaLat, celulaLon,
+                   -COUNT(*)::integer AS total, -SUM(latitude) AS somaLat, -SUM(longitude) AS somaLon,
+                   -SUM(EXTRACT(EPOCH FROM dataCriacao))::double precision AS somaCriacao
+            FROM antigas
+            WHERE status IN ('Aberto', 'Em Análise') AND latitude IS NOT NULL AND dataCriacao IS NOT NULL
+            GROUP BY 1, 2
+        ) d;
+    ELSE
+        -- Só as linhas cujo status, coordenadas ou data mudaram geram delta
+        PERFORM aplicar_delta_hotspot(array_agg(celulaLat), array_agg(celulaLon),
+                                      array_agg(total), array_agg(somaLat), array_agg(somaLon),
+                                      array_agg(somaCriacao))
+        FROM (
+            SELECT celulaLat, celulaLon,
+                   SUM(sinal)::integer AS total, SUM(sinal * latitude) AS somaLat,
+                   SUM(sinal * longitude) AS somaLon,
+                   SUM(sinal * EXTRACT(EPOCH FROM dataCriacao))::double precision AS somaCriacao
+            FROM (
+                SELECT m.*
+                FROM antigas o
+                JOIN novas n ON n.idReport = o.idReport
+                CROSS JOIN LATERAL (
+                    VALUES (-1, o.status, o.latitude, o.longitude, o.celulaLat, o.celulaLon, o.dataCriacao),
+                           (1, n.status, n.latitude, n.longitude, n.celulaLat, n.celulaLon, n.dataCriacao)
+                ) m (sinal, status, latitude, longitude, celulaLat, celulaLon, dataCriacao)
+                WHERE (o.status, o.latitude, o.longitude, o.dataCriacao)
+                      IS DISTINCT FROM (n.status, n.latitude, n.longitude, n.dataCriacao)
+            ) x
+            WHERE status IN ('Aberto', 'Em Análise') AND latitude IS NOT NULL AND dataCriacao IS NOT NULL
+            GROUP BY 1, 2
+        ) d;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS resumo_hotspot_ins ON Report;
+CREATE TRIGGER resumo_hotspot_ins
+    AFTER INSERT ON Report
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_hotspot();
+
+DROP TRIGGER IF EXISTS resumo_hotspot_upd ON Report;
+CREATE TRIGGER resumo_hotspot_upd
+    AFTER UPDATE ON Report
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_hotspot();
+
+DROP TRIGGER IF EXISTS resumo_hotspot_del ON Report;
+CREATE TRIGGER resumo_hotspot_del
+    AFTER DELETE ON Report
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_hotspot();
+
+CREATE OR REPLACE FUNCTION recalcular_hotspots() RETURNS void AS $$
+BEGIN
+    LOCK TABLE Report IN SHARE MODE;
+
+    TRUNCATE ResumoHotspot;
+
+    INSERT INTO ResumoHotspot (celulaLat, celulaLon, total,
+                               somaLatitude, somaLongitude, somaCriacao)
+    SELECT celulaLat, celulaLon, COUNT(*),
+           SUM(latitude), SUM(longitude), SUM(EXTRACT(EPOCH FROM dataCriacao))
+    FROM Report
+    WHERE status IN ('Aberto', 'Em Análise') AND latitude IS NOT NULL AND dataCriacao IS NOT NULL
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$ BEGIN PERFORM recalcular_hotspots(); END $$;
+
+COMMIT;
+
+-- ===============================================
+-- ÍNDICES
+-- ===============================================
+
+-- Endereço representativo da célula de cada hotspot
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_ativos_celula
+    ON Report (celulaLat, celulaLon)
+    WHERE status IN ('Aberto', 'Em Análise');
+
+-- Consulta 6 com janela de tempo: varredura só-índice dos reports da janela
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_ativos_recentes
+    ON Report (dataCriacao)
+    INCLUDE (celulaLat, celulaLon, latitude, longitude)
+    WHERE status IN ('Aberto', 'Em Análise') AND latitude IS NOT NULL;
+
+-- Reports ativos ainda sem coordenadas: agrupados pelo endereço normalizado
+-- na consulta 6 e pendências de trabalho.geocodificar_pendentes()
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_ativos_sem_coordenadas
+    ON Report (localizacaoNormalizada, dataCriacao)
+    WHERE status IN ('Aberto', 'Em Análise') AND latitude IS NULL;
+
+-- Substituído pelos índices acima (agrupava pelo texto bruto)
+DROP INDEX CONCURRENTLY IF EXISTS idx_report_ativos_localizacao;
+
+ANALYZE Report;
+ANALYZE ResumoHotspot;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (4, 'Localização normalizada, coordenadas e resumo de hotspots');
@@ -0,0 +1,70 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 005: Busca textual em reports e comentários
+-- ===============================================
+-- Report (titulo, descricao) e Comentario (texto) ganham uma coluna
+-- tsvector gerada, indexada com GIN, usada por trabalho.buscar().
+--
+-- A configuração pt_sem_acento é a 'portuguese' com o dicionário unaccent
+-- antes do stemmer: "iluminação", "iluminacao" e "ILUMINAÇÃO" geram o
+-- mesmo lexema, tanto nos documentos quanto nas buscas e nos trechos
+-- destacados por ts_headline.
+--
+-- As colunas geradas reescrevem Report e Comentario sob bloqueio
+-- exclusivo; os índices são criados depois com CONCURRENTLY, por isso este
+-- arquivo NÃO deve ser executado dentro de uma transação (psql -1).
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 5) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 005 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_sem_acento') THEN
+        CREATE TEXT SEARCH CONFIGURATION pt_sem_acento (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION pt_sem_acento
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END $$;
+
+-- Título pesa mais que a descrição no ranking (pesos A e B)
+ALTER TABLE Report
+    ADD COLUMN IF NOT EXISTS buscaDocumento TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_sem_acento', titulo), 'A') ||
+        setweight(to_tsvector('pt_sem_acento', COALESCE(descricao, '')), 'B')
+    ) STORED;
+
+ALTER TABLE Comentario
+    ADD COLUMN IF NOT EXISTS buscaDocumento TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('pt_sem_acento', texto)
+    ) STORED;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_busca
+    ON Report USING GIN (buscaDocumento);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comentario_busca
+    ON Comentario USING GIN (buscaDocumento);
+
+ANALYZE Report;
+ANALYZE Comentario;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (5, 'Busca textual (tsvector + GIN) em reports e comentários');
@@ -0,0 +1,182 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 006: Extrato de pontos (ledger) dos cidadãos
+-- ===============================================
+-- Até aqui Cidadao.pontos era editado livremente: resgates gravavam
+-- CidadaoBeneficio com pontos digitados, sem debitar o saldo nem conferir
+-- Beneficio.custo, e reports não creditavam CategoriaReport.pontos.
+--
+-- MovimentoPontos é o extrato, só de inserção (UPDATE/DELETE são
+-- rejeitados). Cidadao.pontos passa a ser o saldo em cache do extrato,
+-- atualizado por trigger a cada movimento, na mesma transação:
+--   saldo_inicial  saldo que o cidadão já tinha ao entrar no extrato
+--                  (cadastro com pontos > 0 ou adoção por
+--                  recalcular_pontos()); não altera Cidadao.pontos
+--   report         crédito de CategoriaReport.pontos ao criar um report
+--                  (trigger em Report, no máximo um por report)
+--   resgate        débito de Beneficio.custo (trabalho.resgatar_beneficio)
+--   ajuste         crédito/débito manual (trabalho.creditar_pontos)
+--
+-- O CHECK (pontos >= 0) de Cidadao continua sendo a última barreira: um
+-- débito concorrente que deixaria o saldo negativo aborta a transação.
+--
+-- recalcular_pontos() adota o saldo atual de cidadãos sem extrato e
+-- corrige caches divergentes da soma do extrato.
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 6) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 006 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+CREATE TABLE MovimentoPontos (
+    idMovimento BIGSERIAL PRIMARY KEY,
+    cpfCidadao VARCHAR(14) NOT NULL,
+    delta INTEGER NOT NULL,
+    motivo VARCHAR(20) NOT NULL,
+    idReport INTEGER,            -- motivo 'report' (sem FK: o extrato sobrevive ao report)
+    nomeBeneficio VARCHAR(100),  -- motivo 'resgate'
+    dataHora TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+
+    CHECK (delta <> 0),
+    CHECK (motivo IN ('saldo_inicial', 'report', 'resgate', 'ajuste')),
+    CHECK (motivo <> 'report' OR idReport IS NOT NULL),
+    CHECK (motivo <> 'resgate' OR (nomeBeneficio IS NOT NULL AND delta < 0)),
+
+    FOREIGN KEY (cpfCidadao) REFERENCES Cidadao (cpf),
+    FOREIGN KEY (nomeBeneficio) REFERENCES Beneficio (nomeBeneficio)
+);
+
+COMMENT ON TABLE MovimentoPontos IS 'Extrato (somente inserção) de créditos e débitos de pontos dos cidadãos';
+
+CREATE INDEX idx_movimento_pontos_cidadao ON MovimentoPontos (cpfCidadao, idMovimento DESC);
+
+-- Um crédito por report, mesmo com inserções repetidas do mesmo idReport
+CREATE UNIQUE INDEX idx_movimento_pontos_report ON MovimentoPontos (idReport)
+    WHERE motivo = 'report';
+
+-- ===============================================
+-- EXTRATO SÓ DE INSERÇÃO
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_movimento_pontos_imutavel() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'MovimentoPontos é somente inserção; lance um movimento de ajuste'
+        USING ERRCODE = 'restrict_violation';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER movimento_pontos_imutavel
+    BEFORE UPDATE OR DELETE ON MovimentoPontos
+    FOR EACH ROW EXECUTE FUNCTION trg_movimento_pontos_imutavel();
+
+-- ===============================================
+-- MovimentoPontos -> Cidadao.pontos (saldo em cache)
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_saldo_pontos() RETURNS trigger AS $$
+BEGIN
+    UPDATE Cidadao C
+    SET pontos = COALESCE(C.pontos, 0) + d.delta
+    FROM (SELECT cpfCidadao, SUM(delta) AS delta
+          FROM novos
+          WHERE motivo <> 'saldo_inicial'
+          GROUP BY cpfCidadao) d
+    WHERE C.cpf = d.cpfCidadao;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER saldo_pontos
+    AFTER INSERT ON MovimentoPontos
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_saldo_pontos();
+
+-- Cadastro de cidadão já com pontos: registra o saldo de abertura
+CREATE OR REPLACE FUNCTION trg_cidadao_saldo_inicial() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO MovimentoPontos (cpfCidadao, delta, motivo)
+    SELECT cpf, pontos, 'saldo_inicial' FROM novos WHERE pontos > 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER cidadao_saldo_inicial
+    AFTER INSERT ON Cidadao
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_cidadao_saldo_inicial();
+
+-- ===============================================
+-- Report -> crédito dos pontos da categoria
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_pontos_report() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO MovimentoPontos (cpfCidadao, delta, motivo, idReport)
+    SELECT n.cpfCidadao, C.pontos, 'report', n.idReport
+    FROM novos n
+    JOIN CategoriaReport C ON C.idCategoriaReport = n.idCategoriaReport
+    ORDER BY n.idReport
+    ON CONFLICT (idReport) WHERE motivo = 'report' DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pontos_report
+    AFTER INSERT ON Report
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_pontos_report();
+
+-- ===============================================
+-- RECONCILIAÇÃO
+-- ===============================================
+
+-- Adota o saldo dos cidadãos sem lançamentos no extrato (dados carregados
+-- com os triggers desligados, linhas anteriores a esta migração) e corrige
+-- todo saldo em cache que difere da soma do extrato. Retorna os saldos
+-- corrigidos.
+CREATE OR REPLACE FUNCTION recalcular_pontos() RETURNS integer AS $$
+DECLARE
+    corrigidos integer;
+BEGIN
+    LOCK TABLE MovimentoPontos IN SHARE ROW EXCLUSIVE MODE;
+
+    INSERT INTO MovimentoPontos (cpfCidadao, delta, motivo)
+    SELECT C.cpf, C.pontos, 'saldo_inicial'
+    FROM Cidadao C
+    WHERE C.pontos > 0
+      AND NOT EXISTS (SELECT 1 FROM MovimentoPontos M WHERE M.cpfCidadao = C.cpf);
+
+    UPDATE Cidadao C
+    SET pontos = COALESCE(L.saldo, 0)
+    FROM Cidadao C2
+    LEFT JOIN (SELECT cpfCidadao, SUM(delta) AS saldo
+               FROM MovimentoPontos
+               GROUP BY cpfCidadao) L ON L.cpfCidadao = C2.cpf
+    WHERE C.cpf = C2.cpf
+      AND C.pontos IS DISTINCT FROM COALESCE(L.saldo, 0);
+    GET DIAGNOSTICS corrigidos = ROW_COUNT;
+    RETURN corrigidos;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$ BEGIN PERFORM recalcular_pontos(); END $$;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (6, 'Extrato de pontos (MovimentoPontos) e saldo em cache');
+
+COMMIT;
+
+ANALYZE MovimentoPontos;
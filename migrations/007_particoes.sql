@@ -0,0 +1,263 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 007: Particionamento mensal de Interacao e HistoricoAtualizacao
+-- ===============================================
+-- As duas tabelas só recebem inserções, sempre com a data corrente, e são
+-- as maiores do banco. Passam a ser particionadas por intervalo de mês
+-- (dataHora / dataHoraAtualizacao, meses em UTC), com partições
+-- interacao_pAAAA_MM e historicoatualizacao_pAAAA_MM:
+--   - consultas com filtro ou ORDER BY ... LIMIT na data leem só as
+--     partições recentes (poda no planejamento ou na execução);
+--   - meses antigos saem do banco com DETACH + DROP, sem DELETE em massa
+--     (arquivar_particoes.py exporta cada partição para .csv.gz antes).
+--
+-- Não há partição DEFAULT: ela impediria o Append ordenado por data e
+-- esconderia meses sem partição. criar_particoes_futuras() mantém os
+-- próximos meses criados (arquivar_particoes.py, via cron) e
+-- criar_particoes() cobre cargas de datas antigas (carga_em_massa.py).
+--
+-- Restrições que o PostgreSQL não garante entre partições viram triggers:
+--   - a chave primária de Interacao passa a ser (idInteracao, dataHora);
+--     idInteracao continua vindo da mesma sequência;
+--   - UNIQUE (cpfCidadao, idReport, tipo) é conferido por trigger de
+--     comando, serializado por advisory locks (no máximo 1024 por comando);
+--     deixa de ser adiável e vale só entre as partições presentes;
+--   - as FKs de Comentario/Upvote/Avaliacao para Interacao viram um
+--     trigger de existência na inserção e um DELETE em cascata.
+--
+-- Reescreve as duas tabelas sob bloqueio exclusivo.
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 7) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 007 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+LOCK TABLE Interacao, HistoricoAtualizacao, Comentario, Upvote, Avaliacao IN ACCESS EXCLUSIVE MODE;
+
+-- ===============================================
+-- CRIAÇÃO DE PARTIÇÕES
+-- ===============================================
+
+-- Cria as partições mensais que faltam de `p_tabela` (Interacao ou
+-- HistoricoAtualizacao) cobrindo [p_de, p_ate]. Retorna quantas criou.
+CREATE OR REPLACE FUNCTION criar_particoes(p_tabela text, p_de timestamptz, p_ate timestamptz)
+RETURNS integer AS $$
+DECLARE
+    v_tabela text := lower(p_tabela);
+    v_mes timestamp;
+    v_nome text;
+    criadas integer := 0;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table P JOIN pg_class C ON C.oid = P.partrelid
+                   WHERE C.oid = to_regclass(v_tabela)) THEN
+        RAISE EXCEPTION 'Tabela % não é particionada', p_tabela;
+    END IF;
+    v_mes := date_trunc('month', p_de AT TIME ZONE 'UTC');
+    WHILE v_mes <= p_ate AT TIME ZONE 'UTC' LOOP
+        v_nome := v_tabela || '_p' || to_char(v_mes, 'YYYY_MM');
+        IF to_regclass(v_nome) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           v_nome, v_tabela,
+                           v_mes AT TIME ZONE 'UTC', (v_mes + INTERVAL '1 month') AT TIME ZONE 'UTC');
+            criadas := criadas + 1;
+        END IF;
+        v_mes := v_mes + INTERVAL '1 month';
+    END LOOP;
+    RETURN criadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- O mês corrente e os próximos `p_meses` meses das duas tabelas
+CREATE OR REPLACE FUNCTION criar_particoes_futuras(p_meses integer DEFAULT 3) RETURNS integer AS $$
+    SELECT criar_particoes('Interacao', NOW(), NOW() + make_interval(months => p_meses))
+         + criar_particoes('HistoricoAtualizacao', NOW(), NOW() + make_interval(months => p_meses));
+$$ LANGUAGE sql;
+
+-- ===============================================
+-- INTERACAO
+-- ===============================================
+
+ALTER TABLE Comentario DROP CONSTRAINT comentario_idinteracao_fkey;
+ALTER TABLE Upvote DROP CONSTRAINT upvote_idinteracao_fkey;
+ALTER TABLE Avaliacao DROP CONSTRAINT avaliacao_idinteracao_fkey;
+
+ALTER SEQUENCE interacao_idinteracao_seq OWNED BY NONE;
+ALTER TABLE Interacao RENAME TO InteracaoAntiga;
+
+CREATE TABLE Interacao (
+    idInteracao INTEGER NOT NULL DEFAULT nextval('interacao_idinteracao_seq'),
+    cpfCidadao VARCHAR(14) NOT NULL,
+    idReport INTEGER NOT NULL,
+    dataHora TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    tipo interacao_type NOT NULL
+) PARTITION BY RANGE (dataHora);
+
+ALTER SEQUENCE interacao_idinteracao_seq OWNED BY Interacao.idInteracao;
+
+COMMENT ON TABLE Interacao IS 'Entidade base para interações dos cidadãos com reports (partições mensais)';
+
+DO $$ BEGIN
+    PERFORM criar_particoes('Interacao', COALESCE(MIN(dataHora), NOW()), NOW() + INTERVAL '3 months')
+    FROM InteracaoAntiga;
+END $$;
+
+INSERT INTO Interacao (idInteracao, cpfCidadao, idReport, dataHora, tipo)
+SELECT idInteracao, cpfCidadao, idReport, dataHora, tipo FROM InteracaoAntiga;
+
+DROP TABLE InteracaoAntiga;
+
+ALTER TABLE Interacao
+    ADD PRIMARY KEY (idInteracao, dataHora),
+    ADD FOREIGN KEY (cpfCidadao) REFERENCES Cidadao (cpf),
+    ADD FOREIGN KEY (idReport) REFERENCES Report (idReport) ON DELETE CASCADE;
+
+-- Os índices da migração 002, agora em cada partição
+CREATE INDEX idx_interacao_report_datahora ON Interacao (idReport, dataHora DESC);
+CREATE INDEX idx_interacao_datahora ON Interacao (dataHora DESC);
+CREATE INDEX idx_interacao_cidadao ON Interacao (cpfCidadao);
+
+-- Triggers de resumo da migração 003
+CREATE TRIGGER resumo_interacao_ins
+    AFTER INSERT ON Interacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_interacao_ins();
+
+CREATE TRIGGER resumo_interacao_del
+    AFTER DELETE ON Interacao
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_interacao_del();
+
+-- UNIQUE (cpfCidadao, idReport, tipo): o advisory lock do balde de cada
+-- chave fica retido até o commit, então uma inserção concorrente da mesma
+-- chave espera por ele e depois enxerga a linha já gravada
+CREATE OR REPLACE FUNCTION trg_interacao_unica() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(7, b)
+    FROM (SELECT DISTINCT hashtext(cpfCidadao || '/' || idReport || '/' || tipo) & 1023 AS b
+          FROM novas ORDER BY 1) k;
+
+    IF EXISTS (SELECT 1
+               FROM (SELECT DISTINCT cpfCidadao, idReport, tipo FROM novas) k
+               JOIN Interacao I USING (cpfCidadao, idReport, tipo)
+               GROUP BY k.cpfCidadao, k.idReport, k.tipo
+               HAVING COUNT(*) > 1) THEN
+        RAISE EXCEPTION 'Interação duplicada: o cidadão já registrou uma interação deste tipo no report'
+            USING ERRCODE = 'unique_violation';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER interacao_unica
+    AFTER INSERT ON Interacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_interacao_unica();
+
+-- ON DELETE CASCADE das especializações
+CREATE OR REPLACE FUNCTION trg_interacao_cascata() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM Comentario WHERE idInteracao IN (SELECT idInteracao FROM antigas);
+    DELETE FROM Upvote WHERE idInteracao IN (SELECT idInteracao FROM antigas);
+    DELETE FROM Avaliacao WHERE idInteracao IN (SELECT idInteracao FROM antigas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER interacao_cascata
+    AFTER DELETE ON Interacao
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_interacao_cascata();
+
+-- FOREIGN KEY (idInteracao) REFERENCES Interacao: as linhas pai são
+-- bloqueadas FOR KEY SHARE, como a FK faria, para não serem apagadas
+-- durante a inserção
+CREATE OR REPLACE FUNCTION trg_especializacao_interacao() RETURNS trigger AS $$
+DECLARE
+    encontradas integer;
+BEGIN
+    SELECT COUNT(*) INTO encontradas
+    FROM (SELECT 1 FROM Interacao I
+          WHERE I.idInteracao IN (SELECT idInteracao FROM novas)
+          FOR KEY SHARE OF I) s;
+    IF encontradas < (SELECT COUNT(*) FROM novas) THEN
+        RAISE EXCEPTION '%: idInteracao sem linha correspondente em Interacao', TG_TABLE_NAME
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER comentario_interacao
+    AFTER INSERT ON Comentario
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_especializacao_interacao();
+
+CREATE TRIGGER upvote_interacao
+    AFTER INSERT ON Upvote
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_especializacao_interacao();
+
+CREATE TRIGGER avaliacao_interacao
+    AFTER INSERT ON Avaliacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_especializacao_interacao();
+
+-- ===============================================
+-- HISTORICOATUALIZACAO
+-- ===============================================
+-- A chave primária já contém dataHoraAtualizacao.
+
+ALTER TABLE HistoricoAtualizacao RENAME TO HistoricoAtualizacaoAntigo;
+
+CREATE TABLE HistoricoAtualizacao (
+    idReport INTEGER NOT NULL,
+    cpfFuncionario VARCHAR(14) NOT NULL,
+    dataHoraAtualizacao TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    atributoAtualizado VARCHAR(100) NOT NULL
+) PARTITION BY RANGE (dataHoraAtualizacao);
+
+COMMENT ON TABLE HistoricoAtualizacao IS 'Auditoria de atualizações em reports por funcionários (partições mensais)';
+
+DO $$ BEGIN
+    PERFORM criar_particoes('HistoricoAtualizacao', COALESCE(MIN(dataHoraAtualizacao), NOW()), NOW() + INTERVAL '3 months')
+    FROM HistoricoAtualizacaoAntigo;
+END $$;
+
+INSERT INTO HistoricoAtualizacao (idReport, cpfFuncionario, dataHoraAtualizacao, atributoAtualizado)
+SELECT idReport, cpfFuncionario, dataHoraAtualizacao, atributoAtualizado FROM HistoricoAtualizacaoAntigo;
+
+DROP TABLE HistoricoAtualizacaoAntigo;
+
+ALTER TABLE HistoricoAtualizacao
+    ADD PRIMARY KEY (idReport, cpfFuncionario, dataHoraAtualizacao),
+    ADD FOREIGN KEY (idReport) REFERENCES Report (idReport),
+    ADD FOREIGN KEY (cpfFuncionario) REFERENCES Funcionario (cpf);
+
+CREATE INDEX idx_historico_funcionario_report ON HistoricoAtualizacao (cpfFuncionario, idReport);
+CREATE INDEX idx_historico_report_data ON HistoricoAtualizacao (idReport, dataHoraAtualizacao DESC);
+
+CREATE TRIGGER resumo_historico_ins
+    AFTER INSERT ON HistoricoAtualizacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_historico_ins();
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (7, 'Partições mensais de Interacao e HistoricoAtualizacao');
+
+COMMIT;
+
+ANALYZE Interacao;
+ANALYZE HistoricoAtualizacao;
@@ -0,0 +1,96 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 008: Última atualização de cada report, desnormalizada
+-- ===============================================
+-- A consulta 5 (reports críticos) buscava MAX(dataHoraAtualizacao) em
+-- HistoricoAtualizacao com uma subconsulta correlacionada por report, e a
+-- regra de "sem atualização há mais de N dias" ficava comentada porque
+-- repetiria a subconsulta.
+--
+-- Report.ultimaAtualizacao guarda esse máximo, mantido por trigger de
+-- comando a cada inserção em HistoricoAtualizacao, na mesma transação. A
+-- consulta passa a não ler HistoricoAtualizacao. Arquivar partições antigas
+-- do histórico (migração 007) não altera a coluna.
+--
+-- recalcular_ultima_atualizacao() refaz a coluna em uma única passada
+-- agregada sobre o histórico (cargas com triggers desligados).
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 8) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 008 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+-- Sem DEFAULT: só altera o catálogo, sem reescrever Report
+ALTER TABLE Report ADD COLUMN IF NOT EXISTS ultimaAtualizacao TIMESTAMPTZ;
+
+COMMENT ON COLUMN Report.ultimaAtualizacao IS 'MAX(HistoricoAtualizacao.dataHoraAtualizacao) do report, mantido por trigger';
+
+-- ===============================================
+-- HISTORICOATUALIZACAO -> Report.ultimaAtualizacao
+-- ===============================================
+-- Só avança: uma inserção com data retroativa não apaga uma mais recente.
+
+CREATE OR REPLACE FUNCTION trg_ultima_atualizacao() RETURNS trigger AS $$
+BEGIN
+    UPDATE Report R
+    SET ultimaAtualizacao = d.ultima
+    FROM (SELECT idReport, MAX(dataHoraAtualizacao) AS ultima
+          FROM novas
+          GROUP BY idReport) d
+    WHERE R.idReport = d.idReport
+      AND (R.ultimaAtualizacao IS NULL OR R.ultimaAtualizacao < d.ultima);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ultima_atualizacao
+    AFTER INSERT ON HistoricoAtualizacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_ultima_atualizacao();
+
+-- ===============================================
+-- RECONSTRUÇÃO
+-- ===============================================
+
+-- Reconstrói a coluna com uma única passada agregada sobre o histórico.
+-- Reports com todo o histórico arquivado mantêm o valor. Retorna as linhas
+-- alteradas.
+CREATE OR REPLACE FUNCTION recalcular_ultima_atualizacao() RETURNS integer AS $$
+DECLARE
+    corrigidos integer;
+BEGIN
+    LOCK TABLE HistoricoAtualizacao IN SHARE MODE;
+
+    UPDATE Report R
+    SET ultimaAtualizacao = d.ultima
+    FROM (SELECT idReport, MAX(dataHoraAtualizacao) AS ultima
+          FROM HistoricoAtualizacao
+          GROUP BY idReport) d
+    WHERE R.idReport = d.idReport
+      AND R.ultimaAtualizacao IS DISTINCT FROM d.ultima;
+    GET DIAGNOSTICS corrigidos = ROW_COUNT;
+    RETURN corrigidos;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$ BEGIN PERFORM recalcular_ultima_atualizacao(); END $$;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (8, 'Última atualização de funcionário desnormalizada em Report');
+
+COMMIT;
+
+ANALYZE Report;
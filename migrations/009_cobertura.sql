@@ -0,0 +1,154 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 009: Cobertura funcionário × categoria
+-- ===============================================
+-- A consulta 4 (funcionários que atualizaram reports de todas as
+-- categorias) fazia a divisão relacional com NOT EXISTS (... EXCEPT ...),
+-- juntando HistoricoAtualizacao a Report uma vez por funcionário.
+--
+-- CoberturaFuncionarioCategoria guarda, por funcionário e categoria, quantas
+-- atualizações ele fez em reports daquela categoria (só pares com ao menos
+-- uma). A divisão vira contagem: categorias cobertas pelo funcionário
+-- comparadas ao total de categorias, sobre uma tabela de no máximo
+-- funcionários × categorias linhas, qualquer que seja o tamanho do
+-- histórico. Mantida por triggers:
+--   - inserção em HistoricoAtualizacao: soma na categoria atual do report;
+--   - mudança de categoria de um report: move as atualizações de cada
+--     funcionário (ResumoFuncionarioReport, migração 003) para a nova.
+-- Os reports envolvidos são travados FOR NO KEY UPDATE, na ordem do id,
+-- para que uma mudança de categoria não corra junto com uma inserção no
+-- histórico do mesmo report.
+--
+-- Como os demais resumos, continua contando partições arquivadas (migração
+-- 007); recalcular_cobertura() reconstrói a partir do histórico presente.
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 9) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 009 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+CREATE TABLE CoberturaFuncionarioCategoria (
+    cpfFuncionario VARCHAR(14) NOT NULL,
+    idCategoriaReport INTEGER NOT NULL,
+    totalAtualizacoes INTEGER NOT NULL,
+
+    PRIMARY KEY (cpfFuncionario, idCategoriaReport),
+
+    CHECK (totalAtualizacoes > 0),
+
+    FOREIGN KEY (cpfFuncionario) REFERENCES Funcionario (cpf)
+        ON DELETE CASCADE,
+    FOREIGN KEY (idCategoriaReport) REFERENCES CategoriaReport (idCategoriaReport)
+        ON DELETE CASCADE
+);
+
+COMMENT ON TABLE CoberturaFuncionarioCategoria IS 'Atualizações de cada funcionário por categoria de report (consulta 4)';
+
+-- ===============================================
+-- HISTORICOATUALIZACAO -> CoberturaFuncionarioCategoria
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_cobertura_historico() RETURNS trigger AS $$
+BEGIN
+    PERFORM 1 FROM Report
+    WHERE idReport IN (SELECT idReport FROM novas)
+    ORDER BY idReport FOR NO KEY UPDATE;
+
+    INSERT INTO CoberturaFuncionarioCategoria AS c (cpfFuncionario, idCategoriaReport, totalAtualizacoes)
+    SELECT n.cpfFuncionario, R.idCategoriaReport, COUNT(*)
+    FROM novas n
+    JOIN Report R ON R.idReport = n.idReport
+    GROUP BY n.cpfFuncionario, R.idCategoriaReport
+    ORDER BY n.cpfFuncionario, R.idCategoriaReport
+    ON CONFLICT (cpfFuncionario, idCategoriaReport) DO UPDATE
+        SET totalAtualizacoes = c.totalAtualizacoes + EXCLUDED.totalAtualizacoes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER cobertura_historico
+    AFTER INSERT ON HistoricoAtualizacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_cobertura_historico();
+
+-- ===============================================
+-- REPORT (categoria) -> CoberturaFuncionarioCategoria
+-- ===============================================
+-- O UPDATE já detém o lock da linha do report, então as contagens por
+-- funcionário lidas de ResumoFuncionarioReport não mudam no meio.
+
+CREATE OR REPLACE FUNCTION trg_cobertura_report_categoria() RETURNS trigger AS $$
+BEGIN
+    WITH movidas AS (
+        SELECT cpfFuncionario, totalAtualizacoes
+        FROM ResumoFuncionarioReport
+        WHERE idReport = NEW.idReport AND totalAtualizacoes > 0
+    ), saida AS (
+        UPDATE CoberturaFuncionarioCategoria c
+        SET totalAtualizacoes = c.totalAtualizacoes - m.totalAtualizacoes
+        FROM movidas m
+        WHERE c.cpfFuncionario = m.cpfFuncionario
+          AND c.idCategoriaReport = OLD.idCategoriaReport
+          AND c.totalAtualizacoes > m.totalAtualizacoes
+    ), esvaziadas AS (
+        DELETE FROM CoberturaFuncionarioCategoria c
+        USING movidas m
+        WHERE c.cpfFuncionario = m.cpfFuncionario
+          AND c.idCategoriaReport = OLD.idCategoriaReport
+          AND c.totalAtualizacoes <= m.totalAtualizacoes
+    )
+    INSERT INTO CoberturaFuncionarioCategoria AS c (cpfFuncionario, idCategoriaReport, totalAtualizacoes)
+    SELECT cpfFuncionario, NEW.idCategoriaReport, totalAtualizacoes
+    FROM movidas
+    ORDER BY cpfFuncionario
+    ON CONFLICT (cpfFuncionario, idCategoriaReport) DO UPDATE
+        SET totalAtualizacoes = c.totalAtualizacoes + EXCLUDED.totalAtualizacoes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER cobertura_report_categoria
+    AFTER UPDATE OF idCategoriaReport ON Report
+    FOR EACH ROW
+    WHEN (OLD.idCategoriaReport IS DISTINCT FROM NEW.idCategoriaReport)
+    EXECUTE FUNCTION trg_cobertura_report_categoria();
+
+-- ===============================================
+-- RECONSTRUÇÃO
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION recalcular_cobertura() RETURNS void AS $$
+BEGIN
+    LOCK TABLE Report, HistoricoAtualizacao IN SHARE MODE;
+
+    TRUNCATE CoberturaFuncionarioCategoria;
+
+    INSERT INTO CoberturaFuncionarioCategoria (cpfFuncionario, idCategoriaReport, totalAtualizacoes)
+    SELECT HA.cpfFuncionario, R.idCategoriaReport, COUNT(*)
+    FROM HistoricoAtualizacao HA
+    JOIN Report R ON R.idReport = HA.idReport
+    GROUP BY HA.cpfFuncionario, R.idCategoriaReport;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$ BEGIN PERFORM recalcular_cobertura(); END $$;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (9, 'Cobertura funcionário × categoria para a divisão relacional');
+
+COMMIT;
+
+ANALYZE CoberturaFuncionarioCategoria;
@@ -0,0 +1,186 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 010: Eventos de alteração (outbox) com LISTEN/NOTIFY
+-- ===============================================
+-- Quem precisa reagir a novos reports, interações, atualizações de
+-- funcionários e mudanças de status (caches, resumos fora do banco,
+-- notificações) tinha de varrer as tabelas periodicamente.
+--
+-- Evento é uma fila de saída (outbox) alimentada por triggers de comando,
+-- na mesma transação da escrita: um evento existe se e somente se a escrita
+-- foi confirmada. Cada linha é compacta (tabela, operação, idReport e um
+-- jsonb com os poucos campos úteis). Ao final de cada comando que gerou
+-- eventos, pg_notify('eventos', <tabela>) acorda os consumidores em LISTEN;
+-- a notificação é só um aviso, os dados ficam na tabela.
+--
+-- Ordem de leitura: (xid, idEvento). O idEvento sozinho não serve de
+-- checkpoint, porque uma transação que pegou ids menores pode confirmar
+-- depois de outra com ids maiores. Consumidores só leem eventos com
+-- xid < pg_snapshot_xmin(pg_current_snapshot()), isto é, de transações
+-- já encerradas, e nenhuma transação ainda aberta pode gerar um evento
+-- anterior ao checkpoint. Uma transação longa (com xid) atrasa a entrega
+-- até terminar.
+--
+-- ConsumidorEvento guarda o checkpoint de cada consumidor (consumidor_eventos.py).
+-- limpar_eventos() apaga os eventos que todos os consumidores já passaram.
+-- Cargas com session_replication_role = replica (benchmark.py) não geram eventos.
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 10) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 010 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+CREATE TYPE evento_operacao AS ENUM ('insert', 'status');
+
+CREATE TABLE Evento (
+    idEvento BIGINT GENERATED ALWAYS AS IDENTITY,
+    xid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    criadoEm TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    tabela VARCHAR(30) NOT NULL,
+    operacao evento_operacao NOT NULL,
+    idReport INTEGER NOT NULL,
+    dados JSONB NOT NULL,
+
+    PRIMARY KEY (xid, idEvento)
+);
+
+COMMENT ON TABLE Evento IS 'Outbox de eventos de Report, Interacao e HistoricoAtualizacao, lida em ordem (xid, idEvento)';
+
+CREATE TABLE ConsumidorEvento (
+    nome VARCHAR(100) PRIMARY KEY,
+    ultimoXid XID8 NOT NULL DEFAULT '0',
+    ultimoEvento BIGINT NOT NULL DEFAULT 0,
+    entregues BIGINT NOT NULL DEFAULT 0,
+    atualizadoEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE ConsumidorEvento IS 'Checkpoint (último xid, idEvento processado) de cada consumidor de Evento';
+
+-- ===============================================
+-- REPORT -> Evento
+-- ===============================================
+-- Tabelas de transição não podem ser combinadas com UPDATE OF <coluna>,
+-- então o trigger de atualização dispara em todo UPDATE e guarda só as
+-- mudanças de status.
+
+CREATE OR REPLACE FUNCTION trg_evento_report() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO Evento (tabela, operacao, idReport, dados)
+        SELECT 'Report', 'insert', n.idReport,
+               jsonb_build_object('categoria', n.idCategoriaReport, 'status', n.status,
+                                  'cpf', n.cpfCidadao)
+        FROM novas n
+        ORDER BY n.idReport;
+    ELSE
+        INSERT INTO Evento (tabela, operacao, idReport, dados)
+        SELECT 'Report', 'status', n.idReport,
+               jsonb_build_object('de', a.status, 'para', n.status)
+        FROM novas n
+        JOIN antigas a ON a.idReport = n.idReport
+        WHERE a.status IS DISTINCT FROM n.status
+        ORDER BY n.idReport;
+    END IF;
+    IF FOUND THEN
+        PERFORM pg_notify('eventos', 'Report');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER evento_report_ins
+    AFTER INSERT ON Report
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_evento_report();
+
+CREATE TRIGGER evento_report_upd
+    AFTER UPDATE ON Report
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_evento_report();
+
+-- ===============================================
+-- INTERACAO / HISTORICOATUALIZACAO -> Evento
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION trg_evento_interacao() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO Evento (tabela, operacao, idReport, dados)
+    SELECT 'Interacao', 'insert', n.idReport,
+           jsonb_build_object('id', n.idInteracao, 'tipo', n.tipo, 'cpf', n.cpfCidadao)
+    FROM novas n
+    ORDER BY n.idInteracao;
+    IF FOUND THEN
+        PERFORM pg_notify('eventos', 'Interacao');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER evento_interacao
+    AFTER INSERT ON Interacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_evento_interacao();
+
+CREATE OR REPLACE FUNCTION trg_evento_historico() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO Evento (tabela, operacao, idReport, dados)
+    SELECT 'HistoricoAtualizacao', 'insert', n.idReport,
+           jsonb_build_object('cpf', n.cpfFuncionario, 'atributo', n.atributoAtualizado)
+    FROM novas n
+    ORDER BY n.dataHoraAtualizacao;
+    IF FOUND THEN
+        PERFORM pg_notify('eventos', 'HistoricoAtualizacao');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER evento_historico
+    AFTER INSERT ON HistoricoAtualizacao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_evento_historico();
+
+-- ===============================================
+-- RETENÇÃO
+-- ===============================================
+
+-- Apaga os eventos que todos os consumidores registrados já passaram no
+-- checkpoint e, com `manter`, também os mais antigos que `manter`,
+-- independente dos consumidores (um consumidor tão atrasado os perde).
+-- Retorna as linhas apagadas.
+CREATE OR REPLACE FUNCTION limpar_eventos(manter INTERVAL DEFAULT NULL) RETURNS bigint AS $$
+DECLARE
+    apagados bigint;
+    xid_min xid8;
+    evento_min bigint;
+BEGIN
+    SELECT ultimoXid, ultimoEvento INTO xid_min, evento_min
+    FROM ConsumidorEvento
+    ORDER BY ultimoXid, ultimoEvento
+    LIMIT 1;
+
+    DELETE FROM Evento
+    WHERE (xid_min IS NOT NULL AND (xid, idEvento) <= (xid_min, evento_min))
+       OR criadoEm < NOW() - manter;
+    GET DIAGNOSTICS apagados = ROW_COUNT;
+    RETURN apagados;
+END;
+$$ LANGUAGE plpgsql;
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (10, 'Outbox de eventos (Report, Interacao, HistoricoAtualizacao) com LISTEN/NOTIFY');
+
+COMMIT;
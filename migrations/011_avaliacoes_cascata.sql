@@ -0,0 +1,117 @@
+-- ===============================================
+-- Projeto: Apontaí - Zeladoria Urbana Colaborativa
+-- Migração 011: Resumo de avaliações nas exclusões em cascata
+-- ===============================================
+-- O trigger de exclusão de Avaliacao (migração 003) acha o report de cada
+-- nota juntando as linhas apagadas a Interacao. Quando a Avaliacao sai em
+-- cascata de Interacao (trigger interacao_cascata, migração 007) ou de
+-- Report, a linha pai já foi apagada: a junção não acha nada e
+-- ResumoAvaliacaoCategoria continuava contando as notas apagadas na
+-- consulta 3.
+--
+-- Agora cada caminho desconta onde o report ainda é conhecido:
+--   - exclusão direta em Avaliacao: como antes, pelo trigger da 003;
+--   - exclusão em Interacao: interacao_cascata desconta as notas, com o
+--     idReport da tabela de transição, antes de apagar as avaliações;
+--   - exclusão de Report: um trigger BEFORE DELETE desconta da categoria o
+--     resumo do report (ResumoAvaliacaoReport some junto, em cascata), e
+--     aplicar_delta_avaliacao() passa a ignorar reports que não existem
+--     mais, para a cascata até Avaliacao não descontar de novo.
+--
+-- Resumos que já divergiram não são corrigidos aqui: recalcular_resumos()
+-- recontaria só as partições presentes e perderia as notas arquivadas
+-- (arquivar_particoes.py). Sem partições arquivadas, rode-a depois.
+--
+-- Aplicar: make migrate-versions
+
+SET client_min_messages = warning;
+
+CREATE TABLE IF NOT EXISTS VersaoEsquema (
+    versao INTEGER PRIMARY KEY,
+    descricao VARCHAR(200) NOT NULL,
+    aplicadaEm TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+SELECT EXISTS (SELECT 1 FROM VersaoEsquema WHERE versao = 11) AS ja_aplicada \gset
+\if :ja_aplicada
+\echo 'Migração 011 já aplicada.'
+\quit
+\endif
+
+BEGIN;
+
+-- Como na 003, com os deltas restritos aos reports que ainda existem
+CREATE OR REPLACE FUNCTION aplicar_delta_avaliacao(
+    p_reports INTEGER[], p_somas BIGINT[], p_qtds INTEGER[]
+) RETURNS void AS $$
+BEGIN
+    PERFORM 1 FROM Report
+    WHERE idReport = ANY (p_reports)
+    ORDER BY idReport FOR SHARE;
+
+    INSERT INTO ResumoAvaliacaoReport AS r (idReport, somaNotas, qtdAvaliacoes)
+    SELECT d.idReport, d.soma, d.qtd
+    FROM unnest(p_reports, p_somas, p_qtds) AS d(idReport, soma, qtd)
+    JOIN Report R ON R.idReport = d.idReport
+    ORDER BY d.idReport
+    ON CONFLICT (idReport) DO UPDATE
+        SET somaNotas = r.somaNotas + EXCLUDED.somaNotas,
+            qtdAvaliacoes = r.qtdAvaliacoes + EXCLUDED.qtdAvaliacoes;
+
+    INSERT INTO ResumoAvaliacaoCategoria AS c (idCategoriaReport, somaNotas, qtdAvaliacoes)
+    SELECT R.idCategoriaReport, SUM(d.soma), SUM(d.qtd)
+    FROM unnest(p_reports, p_somas, p_qtds) AS d(idReport, soma, qtd)
+    JOIN Report R ON R.idReport = d.idReport
+    WHERE R.status = 'Resolvido'
+    GROUP BY R.idCategoriaReport
+    ORDER BY R.idCategoriaReport
+    ON CONFLICT (idCategoriaReport) DO UPDATE
+        SET somaNotas = c.somaNotas + EXCLUDED.somaNotas,
+            qtdAvaliacoes = c.qtdAvaliacoes + EXCLUDED.qtdAvaliacoes;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Como na 007, descontando antes as notas das avaliações em cascata. Depois
+-- do DELETE, o trigger de Avaliacao não acha mais as interações e não as
+-- desconta de novo.
+CREATE OR REPLACE FUNCTION trg_interacao_cascata() RETURNS trigger AS $$
+BEGIN
+    PERFORM aplicar_delta_avaliacao(array_agg(idReport), array_agg(-soma), array_agg(-qtd))
+    FROM (
+        SELECT I.idReport, SUM(A.nota)::bigint AS soma, COUNT(*)::integer AS qtd
+        FROM antigas I JOIN Avaliacao A ON A.idInteracao = I.idInteracao
+        WHERE I.tipo = 'Avaliacao'
+        GROUP BY I.idReport
+    ) d;
+
+    DELETE FROM Comentario WHERE idInteracao IN (SELECT idInteracao FROM antigas);
+    DELETE FROM Upvote WHERE idInteracao IN (SELECT idInteracao FROM antigas);
+    DELETE FROM Avaliacao WHERE idInteracao IN (SELECT idInteracao FROM antigas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Report resolvido apagado: tira da categoria as notas do report enquanto
+-- ResumoAvaliacaoReport ainda as tem
+CREATE OR REPLACE FUNCTION trg_resumo_report_del() RETURNS trigger AS $$
+BEGIN
+    UPDATE ResumoAvaliacaoCategoria C
+    SET somaNotas = C.somaNotas - RA.somaNotas, qtdAvaliacoes = C.qtdAvaliacoes - RA.qtdAvaliacoes
+    FROM ResumoAvaliacaoReport RA
+    WHERE RA.idReport = OLD.idReport
+      AND C.idCategoriaReport = OLD.idCategoriaReport;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS resumo_report_del ON Report;
+CREATE TRIGGER resumo_report_del
+    BEFORE DELETE ON Report
+    FOR EACH ROW
+    WHEN (OLD.status = 'Resolvido')
+    EXECUTE FUNCTION trg_resumo_report_del();
+
+INSERT INTO VersaoEsquema (versao, descricao)
+VALUES (11, 'Resumo de avaliações descontado nas exclusões em cascata');
+
+COMMIT;
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+stress_pontos.py
+Teste de carga do extrato de pontos (migração 006): muitas threads
+resgatam benefícios ao mesmo tempo, concentradas em poucos cidadãos, e ao
+final o script confere que nenhum ponto foi gasto duas vezes.
+
+Preparação: cria (ou reaproveita) os cidadãos 999.999.NNN-NN e o benefício
+'Stress de resgates', e lança um ajuste para que cada cidadão comece com
+exatamente --saldo pontos. Como o extrato é só de inserção, esses
+registros permanecem no banco; use um banco de desenvolvimento/benchmark.
+
+Conferências, por cidadão:
+  - resgates confirmados == saldo // custo (nem a mais, nem a menos, desde
+    que as tentativas excedam o saldo);
+  - saldo final == saldo inicial - resgates * custo, e nunca negativo;
+  - Cidadao.pontos == soma do extrato; linhas de CidadaoBeneficio == resgates.
+
+Uso:
+  python3 stress_pontos.py --threads 16 --cidadaos 4 --saldo 1000 --custo 7
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import psycopg2
+
+import trabalho
+
+BENEFICIO = 'Stress de resgates'
+
+PREPARAR_SQL = """
+INSERT INTO Usuario (cpf, nome, email, dataNascimento, role)
+SELECT cpf, 'Stress ' || i, 'stress' || i || '@stress.apontai.org', DATE '1990-01-01', 'Cidadao'
+FROM (SELECT i, '999.999.' || lpad((i / 100)::text, 3, '0') || '-' || lpad((i %% 100)::text, 2, '0') AS cpf
+      FROM generate_series(1, %(cidadaos)s) i) s
+ON CONFLICT (cpf) DO NOTHING;
+INSERT INTO Cidadao (cpf, pontos)
+SELECT cpf, 0 FROM Usuario WHERE email LIKE 'stress%%@stress.apontai.org'
+ON CONFLICT (cpf) DO NOTHING;
+INSERT INTO Beneficio (nomeBeneficio, custo, descricao)
+VALUES (%(beneficio)s, %(custo)s, 'Benefício usado por stress_pontos.py')
+ON CONFLICT (nomeBeneficio) DO UPDATE SET custo = EXCLUDED.custo;
+"""
+
+CIDADAOS_SQL = """
+SELECT C.cpf, COALESCE(C.pontos, 0)
+FROM Cidadao C JOIN Usuario U ON U.cpf = C.cpf
+WHERE U.email LIKE 'stress%%@stress.apontai.org'
+ORDER BY C.cpf
+LIMIT %s
+"""
+
+CONFERIR_SQL = """
+SELECT C.cpf, COALESCE(C.pontos, 0),
+       (SELECT SUM(delta) FROM MovimentoPontos M WHERE M.cpfCidadao = C.cpf),
+       (SELECT COUNT(*) FROM CidadaoBeneficio B
+        WHERE B.cpfCidadao = C.cpf AND B.nomeBeneficio = %s AND B.dataHoraResgate >= %s)
+FROM Cidadao C
+WHERE C.cpf = ANY(%s)
+ORDER BY C.cpf
+"""
+
+
+def preparar(cidadaos: int, saldo: int, custo: int) -> list:
+    """Creates the fixtures and sets every stress citizen's balance to `saldo`. Returns their CPFs."""
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(PREPARAR_SQL, {'cidadaos': cidadaos, 'beneficio': BENEFICIO, 'custo': custo})
+            cur.execute(CIDADAOS_SQL, (cidadaos,))
+            atuais = cur.fetchall()
+    for cpf, pontos in atuais:
+        if pontos != saldo:
+            trabalho.creditar_pontos(cpf, saldo - pontos)
+    return [cpf for cpf, _ in atuais]
+
+
+def executar(cpfs: list, threads: int, tentativas: int) -> tuple:
+    """Runs `tentativas` redemptions spread over `threads` threads. Returns (Counter per cpf, outcomes, seconds, latencies)."""
+    confirmados = Counter()
+    resultados = Counter()
+    latencias = []
+    lock = threading.Lock()
+    restantes = iter(range(tentativas))
+    inicio_barreira = threading.Barrier(threads)
+
+    def trabalhador(semente):
+        rnd = random.Random(semente)
+        locais = Counter()
+        saidas = Counter()
+        tempos = []
+        inicio_barreira.wait()
+        while True:
+            with lock:
+                if next(restantes, None) is None:
+                    break
+            cpf = rnd.choice(cpfs)
+            t = time.perf_counter()
+            try:
+                trabalho.resgatar_beneficio(cpf, BENEFICIO)
+                locais[cpf] += 1
+                saidas['confirmado'] += 1
+            except trabalho.SaldoInsuficiente:
+                saidas['saldo_insuficiente'] += 1
+            except psycopg2.Error as e:
+                saidas[f'erro:{type(e).__name__}'] += 1
+            tempos.append(time.perf_counter() - t)
+        with lock:
+            confirmados.update(locais)
+            resultados.update(saidas)
+            latencias.extend(tempos)
+
+    workers = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    inicio = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return confirmados, resultados, time.perf_counter() - inicio, latencias
+
+
+def conferir(cpfs: list, confirmados: Counter, saldo: int, custo: int, desde) -> list:
+    """Returns a list of violated invariants (empty when the ledger held)."""
+    falhas = []
+    with trabalho.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(CONFERIR_SQL, (BENEFICIO, desde, cpfs))
+            for cpf, pontos, extrato, resgates in cur.fetchall():
+                n = confirmados[cpf]
+                if pontos < 0:
+                    falhas.append(f"{cpf}: saldo negativo ({pontos})")
+                if pontos != saldo - n * custo:
+                    falhas.append(f"{cpf}: saldo {pontos} != {saldo} - {n} x {custo}")
+                if pontos != extrato:
+                    falhas.append(f"{cpf}: saldo {pontos} != soma do extrato {extrato}")
+                if resgates != n:
+                    falhas.append(f"{cpf}: {resgates} linhas em CidadaoBeneficio para {n} resgates confirmados")
+                if n > saldo // custo:
+                    falhas.append(f"{cpf}: gasto em dobro, {n} resgates com saldo para {saldo // custo}")
+    return falhas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Resgates concorrentes de benefícios: vazão e ausência de gasto duplo.")
+    parser.add_argument('--threads', type=int, default=16, help="Threads concorrentes (padrão 16)")
+    parser.add_argument('--cidadaos', type=int, default=4, help="Cidadãos disputados (padrão 4)")
+    parser.add_argument('--saldo', type=int, default=1000, help="Saldo inicial de cada cidadão (padrão 1000)")
+    parser.add_argument('--custo', type=int, default=7, help="Custo do benefício (padrão 7)")
+    parser.add_argument('--tentativas', type=int,
+                        help="Total de resgates tentados (padrão: 1,5 x o que os saldos cobrem)")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+    if min(args.threads, args.cidadaos, args.saldo, args.custo) < 1:
+        parser.error("--threads, --cidadaos, --saldo e --custo devem ser positivos")
+    if args.cidadaos > 99999:
+        parser.error("--cidadaos deve ser no máximo 99999")
+    tentativas = args.tentativas or int(1.5 * args.cidadaos * (args.saldo // args.custo)) or args.threads
+
+    trabalho.POOL_CONFIG['maxconn'] = max(trabalho.POOL_CONFIG['maxconn'], args.threads + 1)
+    trabalho.PROFILE_CONFIG['enabled'] = False
+    try:
+        cpfs = preparar(args.cidadaos, args.saldo, args.custo)
+        with trabalho.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT clock_timestamp()")
+                desde, = cur.fetchone()
+        print(f"{tentativas} resgates em {args.threads} threads sobre {len(cpfs)} cidadãos "
+              f"(saldo {args.saldo}, custo {args.custo})")
+        confirmados, resultados, segundos, latencias = executar(cpfs, args.threads, tentativas)
+        falhas = conferir(cpfs, confirmados, args.saldo, args.custo, desde)
+    finally:
+        trabalho.close_pool()
+
+    resumo = trabalho.Histogram()
+    for t in latencias:
+        resumo.add(t * 1000)
+    for saida, n in sorted(resultados.items()):
+        print(f"  {saida:<24} {n:>8}")
+    print(f"  {'transações/s':<24} {len(latencias) / segundos:>8.0f}")
+    print(f"  {'resgates confirmados/s':<24} {resultados['confirmado'] / segundos:>8.0f}")
+    print(f"  latência ms p50 {resumo.percentile(50):.2f}  p95 {resumo.percentile(95):.2f}  "
+          f"p99 {resumo.percentile(99):.2f}")
+    if falhas:
+        print("❌ Invariantes violados:")
+        for f in falhas:
+            print(f"  {f}")
+        return 1
+    print("✓ Nenhum gasto duplo: saldos, extrato e resgates conferem")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
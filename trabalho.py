@@ -6,12 +6,35 @@ Sistema de relatos cívicos e pontos de benefícios.
 """
 
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import argparse
+import concurrent.futures
+import copy
+import csv
 import datetime
+import decimal
+import functools
+import itertools
+import json
+import logging
 import os
-from dataclasses import dataclass
-from typing import Optional, List
-
-# PostgreSQL connection configuration (Docker container)
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager, nullcontext
+from collections import OrderedDict
+from typing import NamedTuple, Optional, List
+
+# Defaults of the *_CONFIG dicts below; a JSON file, TRABALHO_* environment
+# variables and --set on the command line override them when an entry point
+# calls carregar_config() (importing this module only sets the defaults)
+
+# PostgreSQL connection configuration (Docker container); any libpq keyword
 DB_CONFIG = {
     'dbname': 'trabalho_db',
     'user': 'trabalho_user',
@@ -20,91 +43,1288 @@ DB_CONFIG = {
     'port': 5435
 }
 
-@dataclass
-class Usuario:
+# Settings of every database session, sent at connect time (see parametros_conexao());
+# any server setting is accepted, None leaves the server default
+SESSAO_CONFIG = {
+    'application_name': 'apontai',
+    'statement_timeout': None,      # e.g. '30s'; per report: CONSULTAS_CONFIG
+    'lock_timeout': None,
+    'idle_in_transaction_session_timeout': None,
+}
+
+# Connection pool sizing; tune with the numbers shown by pool_stats()
+POOL_CONFIG = {
+    'minconn': 1,               # connections kept open even when idle
+    'maxconn': 10,              # hard cap on open connections
+    'max_idle': 300,            # seconds before an idle connection is evicted
+    'checkout_timeout': 30,     # seconds to wait for a free connection
+    'health_check_after': 5,    # ping connections idle for longer than this
+    'connect_retries': 3,       # attempts per new connection on OperationalError
+}
+
+# Read replicas for the reports and user listings (see get_connection(leitura=True))
+REPLICA_CONFIG = {
+    'replicas': [],             # DB_CONFIG overrides per replica, e.g. [{'port': 5436}]; empty = primary only
+    'max_lag': 5.0,             # seconds of replay lag above which a replica is skipped
+    'lag_check_interval': 0.5,  # seconds a replica's lag/WAL position measurement is reused
+    'read_your_writes': True,   # skip replicas that have not replayed this process's last commit
+    'retry_after': 10.0,        # seconds an unreachable replica is left out
+}
+
+# In-process result cache for the consultar_* reports
+CACHE_CONFIG = {
+    'ttl': 60,             # seconds a cached report stays valid
+    'max_entries': 128,    # LRU bound on cached (report, params) results
+    'max_rows': 10000,     # larger results are streamed but not cached
+}
+
+# Per-report tuning (see config_consulta()): 'itersize' (rows per fetch when
+# streamed), 'ttl' (cache seconds) and server settings applied with SET LOCAL
+# to the report's transaction only. 'padrao' applies to every report.
+CONSULTAS_CONFIG = {
+    'padrao': {},
+    # Enough to sort the whole result in memory instead of spilling to temp files
+    'total_interacoes': {'work_mem': '64MB'},
+    'reports_criticos': {'work_mem': '16MB'},
+}
+
+# Query timing instrumentation (see query_profile())
+PROFILE_CONFIG = {
+    'enabled': True,
+    'sample_size': 1024,      # latency samples kept per statement for percentiles
+    'slow_query_ms': None,    # log statements slower than this (None = off)
+    'slow_query_log': None,   # file for the slow-query log (None = stderr)
+}
+
+# Geocoding of Report.localizacao at insert time (see geocodificar_report())
+GEO_CONFIG = {
+    'geocoder': None,   # callable(localizacao) -> (lat, lon) or None; None = coordenadas_no_texto
+}
+
+# Full-text search over reports and comments (see buscar())
+BUSCA_CONFIG = {
+    'max_candidatos': 2000,   # most recent matches ranked per table; bounds very common terms
+    'headline': 'MaxWords=30, MinWords=12, MaxFragments=2, FragmentDelimiter=" … ", StartSel=«, StopSel=»',
+}
+
+# Server-side prepared statements for the SQL declared with declarar()
+PREPARED_CONFIG = {
+    'enabled': True,
+}
+
+# Dashboard: every report at once, each on its own pooled connection (see executar_painel())
+PAINEL_CONFIG = {
+    'max_workers': None,   # concurrent reports (None = one per report, capped at POOL_CONFIG['maxconn'])
+    'max_linhas': 1000,    # rows kept per report; larger results are cut (None = all)
+}
+
+# Server-side (streaming) cursors, see stream_query()
+STREAM_CONFIG = {
+    'itersize': 2000,   # rows fetched per round trip; per report: CONSULTAS_CONFIG
+}
+# Rows shown per screen in interactive listings
+PAGE_SIZE = 20
+
+# Row records: one NamedTuple per table, fields in the column order of
+# migrations/esquema.sql (columns added by numbered migrations come last and
+# are left out), so a `SELECT <those columns>` row converts with Tipo._make.
+# Tuples carry no per-instance __dict__; `python3 trabalho.py records`
+# regenerates these definitions from the live catalog or checks them.
+class Usuario(NamedTuple):
     cpf: str
-    nome: str
-    email: str
-    dataNasc: datetime.date
+    nome: Optional[str]
+    email: Optional[str]
+    dataNascimento: datetime.date
     role: str
 
-@dataclass
-class Funcionario:
-    CPF: str
-    setor: str
-    cidade: str
+class Cidadao(NamedTuple):
+    cpf: str
+    pontos: Optional[int]
 
-@dataclass
-class Cidadao:
-    CPF: str
-    pontos: int
+class Funcionario(NamedTuple):
+    cpf: str
+    setor: Optional[str]
+    cidade: Optional[str]
 
-@dataclass
-class Beneficios:
-    nome_benficio: str
+class CategoriaReport(NamedTuple):
+    idCategoriaReport: int
+    nome: str
     pontos: int
-    descricao: str
 
-@dataclass
-class Interacao:
-    idInteracao: str
-    CPF: str
+class Report(NamedTuple):
+    idReport: int
+    titulo: str
+    localizacao: str
+    descricao: Optional[str]
+    dataCriacao: Optional[datetime.datetime]
+    status: Optional[str]
+    idCategoriaReport: int
+    cpfCidadao: str
+
+class Midia(NamedTuple):
+    idMidia: int
+    link: str
+    idReport: int
+    dataUpload: Optional[datetime.datetime]
+
+class Interacao(NamedTuple):
+    idInteracao: int
+    cpfCidadao: str
+    idReport: int
+    dataHora: datetime.datetime
     tipo: str
-    data: datetime.date
-    idReport: str
 
-@dataclass
-class Comentario:
-    idInteracao: str
+class Comentario(NamedTuple):
+    idInteracao: int
     texto: str
-    data: datetime.date
-
-@dataclass
-class Avaliacao:
-    idInteracao: str
-    data: datetime.date
-    nota: str
-    cometario: str
-
-@dataclass
-class Report:
-    idReport: str
-    titulo: str
-    localizacao: str
-    data: datetime.date
-    status: str
-    idCategoriaReport: str
-    descricao: str
 
+class Upvote(NamedTuple):
+    idInteracao: int
 
-@dataclass
-class Midia:
-    link: str
-    idReport: str
-    dataUpload: datetime.date
+class Avaliacao(NamedTuple):
+    idInteracao: int
+    nota: int
+    comentario: Optional[str]
 
-@dataclass
-class CategoriaReport:
-    idCategoriaReport: str
-    nome: str
-    pontos: int
+class Beneficio(NamedTuple):
+    nomeBeneficio: str
+    custo: int
+    descricao: Optional[str]
+
+class CidadaoBeneficio(NamedTuple):
+    cpfCidadao: str
+    nomeBeneficio: str
+    dataHoraResgate: datetime.datetime
+    pontosResgatados: int
 
-@dataclass
-class HistoricoAtualizado:
-    funcionario: str
-    idReport: str
-    dataUpload: datetime.date
+class HistoricoAtualizacao(NamedTuple):
+    idReport: int
+    cpfFuncionario: str
+    dataHoraAtualizacao: datetime.datetime
     atributoAtualizado: str
 
+class MovimentoPontos(NamedTuple):
+    idMovimento: int
+    cpfCidadao: str
+    delta: int
+    motivo: str                 # saldo_inicial, report, resgate ou ajuste
+    idReport: Optional[int]
+    nomeBeneficio: Optional[str]
+    dataHora: datetime.datetime
+
+# table -> record, for the catalog check in conferir_registros()
+REGISTROS = {
+    'Usuario': Usuario, 'Cidadao': Cidadao, 'Funcionario': Funcionario,
+    'CategoriaReport': CategoriaReport, 'Report': Report, 'Midia': Midia,
+    'Interacao': Interacao, 'Comentario': Comentario, 'Upvote': Upvote,
+    'Avaliacao': Avaliacao, 'Beneficio': Beneficio, 'CidadaoBeneficio': CidadaoBeneficio,
+    'HistoricoAtualizacao': HistoricoAtualizacao, 'MovimentoPontos': MovimentoPontos,
+}
 
-@dataclass
-class CidadaoBeneficio:
-    cpf: str
-    nomeBeneficio: str
-    data: datetime.date
+class ResultadoBusca(NamedTuple):
+    tipo: str                   # 'report' ou 'comentario'
+    idReport: int
+    idInteracao: Optional[int]
+    titulo: str
+    trecho: str
+    rank: decimal.Decimal
+    data: datetime.datetime
+
+def registros(tipo, rows) -> list:
+    """Rows (from fetchall() or a cursor) as `tipo` records; tuple-level construction, no per-row __init__."""
+    return list(map(tipo._make, rows))
+
+class Histogram:
+    """Latency distribution in ms: exact count/sum/max plus a reservoir sample for percentiles."""
+
+    __slots__ = ('size', 'samples', 'count', 'total', 'max')
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            j = random.randrange(self.count)
+            if j < self.size:
+                self.samples[j] = value
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class QueryStats:
+    """Per-statement counters: total/execute/fetch latency histograms and rows."""
+
+    __slots__ = ('total', 'execute', 'fetch', 'rows')
+
+    def __init__(self, sample_size):
+        self.total = Histogram(sample_size)
+        self.execute = Histogram(sample_size)
+        self.fetch = Histogram(sample_size)
+        self.rows = 0
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql) -> str:
+    """Normalizes a statement so executions differing only in literals group together."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = re.sub(r'--[^\n]*', ' ', str(sql))
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%\(\w+\)s|%s|\$\d+', '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return ' '.join(sql.split()).rstrip(';')
+
+
+class QueryProfiler:
+    """Thread-safe registry of QueryStats keyed by statement fingerprint."""
+
+    CONNECT = '<connect>'
+
+    def __init__(self, sample_size=1024):
+        self.sample_size = sample_size
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._slow_logger = None
+        self._slow_handler = None  # the handler slow_logger() added, if any
+
+    def _get(self, key) -> QueryStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = QueryStats(self.sample_size)
+        return stats
+
+    def record(self, sql, execute_s: float, fetch_s: float, rows: int):
+        key = fingerprint(sql)
+        execute_ms = execute_s * 1000
+        fetch_ms = fetch_s * 1000
+        total_ms = execute_ms + fetch_ms
+        with self._lock:
+            stats = self._get(key)
+            stats.total.add(total_ms)
+            stats.execute.add(execute_ms)
+            stats.fetch.add(fetch_ms)
+            stats.rows += rows
+        threshold = PROFILE_CONFIG['slow_query_ms']
+        if threshold is not None and total_ms >= threshold:
+            self.slow_logger().warning("%.1f ms (execute %.1f, fetch %.1f, %d rows): %s",
+                                       total_ms, execute_ms, fetch_ms, rows, key)
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self._get(self.CONNECT).total.add(seconds * 1000)
+
+    def slow_logger(self) -> logging.Logger:
+        if self._slow_logger is None:
+            logger = logging.getLogger('trabalho.slow_query')
+            if not logger.handlers:
+                path = PROFILE_CONFIG['slow_query_log']
+                handler = logging.FileHandler(path) if path else logging.StreamHandler()
+                handler.setFormatter(logging.Formatter('%(asctime)s slow query %(message)s'))
+                logger.addHandler(handler)
+                logger.propagate = False
+                self._slow_handler = handler
+            self._slow_logger = logger
+        return self._slow_logger
+
+    def configurar(self, sample_size: int):
+        """Applies PROFILE_CONFIG changes: new sample size (stats are cleared), slow-query log reopened on next use."""
+        with self._lock:
+            self.sample_size = sample_size
+            self._stats.clear()
+            logger, handler = self._slow_logger, self._slow_handler
+            self._slow_logger = self._slow_handler = None
+        if handler is not None:
+            logger.removeHandler(handler)
+            handler.close()
+
+    def snapshot(self) -> list:
+        """[(fingerprint, QueryStats)] sorted by total time spent, descending."""
+        with self._lock:
+            items = list(self._stats.items())
+        return sorted(items, key=lambda kv: kv[1].total.total, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+_profiler = QueryProfiler(PROFILE_CONFIG['sample_size'])
+
+
+# Command tags and SQL keywords of statements that may write
+_TAGS_ESCRITA = ('INSERT', 'UPDATE', 'DELETE', 'MERGE', 'COPY')
+_ESCRITA_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b', re.IGNORECASE)
+
+
+class WriteTrackingCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that sets its connection's `wrote` flag after a statement that
+    may have written: a DML command tag, or DML keywords in the SQL text
+    (data-modifying CTEs). Writes done inside functions called from a
+    SELECT are not seen. Prepared statements are flagged by executar().
+    """
+
+    def _marcar(self, query):
+        if getattr(self.connection, 'wrote', True):
+            return
+        texto = query if isinstance(query, str) else ''
+        if (self.statusmessage or '').startswith(_TAGS_ESCRITA) or (
+                not texto.lstrip().upper().startswith('PREPARE') and _ESCRITA_RE.search(texto)):
+            self.connection.wrote = True
+
+    def execute(self, query, vars=None):
+        resultado = super().execute(query, vars)
+        self._marcar(query)
+        return resultado
+
+    def executemany(self, query, vars_list):
+        resultado = super().executemany(query, vars_list)
+        self._marcar(query)
+        return resultado
+
+    def copy_expert(self, sql, file, size=8192):
+        self.connection.wrote = True
+        return super().copy_expert(sql, file, size)
+
+
+class InstrumentedCursor(WriteTrackingCursor):
+    """
+    Cursor that times execute and fetch separately and reports each
+    statement to the profiler once the next statement runs or the cursor
+    closes. Works for named (server-side) cursors too, where the real work
+    happens while fetching.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = None  # [sql, execute_s, fetch_s, rows]
+
+    def _flush_profile(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, execute_s, fetch_s, rows = pending
+            if rows == 0 and self.rowcount > 0:
+                rows = self.rowcount
+            _profiler.record(sql, execute_s, fetch_s, rows)
+
+    def _timed_fetch(self, start: float, fetched: int):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+            self._pending[3] += fetched
+
+    def execute(self, query, vars=None):
+        self._flush_profile()
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._pending = [query, time.perf_counter() - start, 0.0, 0]
+
+    def copy_expert(self, sql, file, size=8192):
+        self._flush_profile()
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._pending = [sql, time.perf_counter() - start, 0.0, 0]
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._timed_fetch(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        self._timed_fetch(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._timed_fetch(start, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._timed_fetch(start, 0)
+            raise
+        self._timed_fetch(start, 1)
+        return row
+
+    def close(self):
+        self._flush_profile()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._flush_profile()
+        except Exception:
+            pass
+
+
+def query_profile() -> list:
+    """
+    Latency summary per statement fingerprint, most expensive first:
+    dicts with calls, p50/p95/p99/max total ms, mean execute/fetch ms and rows.
+    """
+    resumo = []
+    for key, stats in _profiler.snapshot():
+        resumo.append({
+            'statement': key,
+            'calls': stats.total.count,
+            'p50_ms': stats.total.percentile(50),
+            'p95_ms': stats.total.percentile(95),
+            'p99_ms': stats.total.percentile(99),
+            'max_ms': stats.total.max,
+            'total_ms': stats.total.total,
+            'execute_ms': stats.execute.mean,
+            'fetch_ms': stats.fetch.mean,
+            'rows': stats.rows,
+        })
+    return resumo
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No pooled connection became available within checkout_timeout."""
+
+
+class SaldoInsuficiente(ValueError):
+    """The citizen's points balance does not cover a debit."""
+
+
+class TransicaoInvalida(ValueError):
+    """A report's current status does not allow the requested status (see TRANSICOES_STATUS)."""
+
+
+class ConfigDesconhecida(ValueError):
+    """A configuration section or key not in SECOES_CONFIG."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection carrying the bookkeeping used by ConnectionPool."""
 
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared = {}  # statement name -> EXECUTE template, None if it can't be prepared
+        self.wrote = False  # a statement may have written since checkout (WriteTrackingCursor)
+        self.cursor_factory = InstrumentedCursor if PROFILE_CONFIG['enabled'] else WriteTrackingCursor
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of long-lived PostgreSQL connections.
+
+    minconn connections are opened when the pool is created. Idle
+    connections are reused LIFO so the hot ones stay warm; connections
+    idle for longer than max_idle are closed (never below minconn), and a
+    connection idle for longer than health_check_after is pinged before it
+    is handed out. Broken connections are discarded and replaced.
+    """
+
+    def __init__(self, db_config, minconn=1, maxconn=10, max_idle=300,
+                 checkout_timeout=30, health_check_after=5, connect_retries=3):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool inválido: exige 0 <= minconn <= maxconn e maxconn >= 1")
+        self.db_config = dict(db_config)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.connect_retries = connect_retries
+
+        self._idle = []  # stack of idle connections, most recently used last
+        self._size = 0   # open connections, idle + checked out
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,          # total successful checkouts
+            'hits': 0,               # checkouts served by an idle connection
+            'misses': 0,             # checkouts that had to open a connection
+            'waits': 0,              # checkouts that blocked on a full pool
+            'wait_time_total': 0.0,  # seconds spent blocked
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'connect_time_total': 0.0,
+            'evicted_idle': 0,
+            'discarded_broken': 0,
+            'reconnects': 0,         # failed health checks replaced by a new connection
+            'connect_errors': 0,
+        }
+        self._open_minconn()
+
+    # -- connection lifecycle -------------------------------------------------
+
+    def _open_minconn(self):
+        """Opens minconn connections up front so the first checkouts do not pay the connect cost."""
+        try:
+            while self._size < self.minconn:
+                self._idle.append(self._connect())
+                self._size += 1
+        except BaseException:
+            self.closeall()
+            raise
+
+    def _connect(self) -> PooledConnection:
+        delay = 0.1
+        for attempt in range(1, self.connect_retries + 1):
+            start = time.perf_counter()
+            try:
+                conn = psycopg2.connect(connection_factory=PooledConnection, **self.db_config)
+            except psycopg2.OperationalError:
+                with self._cond:
+                    self._stats['connect_errors'] += 1
+                if attempt == self.connect_retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+            else:
+                elapsed = time.perf_counter() - start
+                with self._cond:
+                    self._stats['connect_time_total'] += elapsed
+                if PROFILE_CONFIG['enabled']:
+                    _profiler.record_connect(elapsed)
+                return conn
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _evict_idle_locked(self) -> list:
+        """Remove expired idle connections; returns them so they are closed outside the lock."""
+        now = time.monotonic()
+        expired = []
+        keep = []
+        # Oldest connections sit at the bottom of the stack
+        for conn in self._idle:
+            if now - conn.last_used > self.max_idle and self._size - len(expired) > self.minconn:
+                expired.append(conn)
+            else:
+                keep.append(conn)
+        if expired:
+            self._idle = keep
+            self._size -= len(expired)
+            self._stats['evicted_idle'] += len(expired)
+        return expired
+
+    # -- public API -----------------------------------------------------------
+
+    def getconn(self) -> PooledConnection:
+        """Check out a connection, waiting up to checkout_timeout for a free slot."""
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        wait_start = time.perf_counter()
+        while True:
+            conn = None
+            with self._cond:
+                expired = self._evict_idle_locked()
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Nenhuma conexão livre no pool após {self.checkout_timeout}s "
+                            f"(maxconn={self.maxconn})")
+                    if not waited:
+                        waited = True
+                        self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                if waited:
+                    elapsed = time.perf_counter() - wait_start
+                    self._stats['wait_time_total'] += elapsed
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], elapsed)
+                    waited = False
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+            for old in expired:
+                self._close_quietly(old)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['checkouts'] += 1
+                    self._stats['misses'] += 1
+                return conn
+
+            if self._is_healthy(conn):
+                with self._cond:
+                    self._stats['checkouts'] += 1
+                    self._stats['hits'] += 1
+                return conn
+
+            # Stale connection (server restart, network drop): replace it
+            self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self._stats['reconnects'] += 1
+                self._cond.notify()
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool; broken or discarded connections are closed."""
+        if not conn.closed and not discard:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if conn.closed or discard:
+            self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self._stats['discarded_broken'] += 1
+                self._cond.notify()
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            data = dict(self._stats)
+            data['size'] = self._size
+            data['idle'] = len(self._idle)
+            data['in_use'] = self._size - len(self._idle)
+            data['maxconn'] = self.maxconn
+        checkouts = data['checkouts']
+        data['hit_ratio'] = data['hits'] / checkouts if checkouts else 0.0
+        data['avg_wait_ms'] = data['wait_time_total'] * 1000 / data['waits'] if data['waits'] else 0.0
+        return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_stream_ids = itertools.count(1)
+
+
+def _opcao_libpq(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace(' ', '\\ ')
+
+
+def parametros_conexao(sobrescritas: Optional[dict] = None) -> dict:
+    """
+    libpq keyword arguments of a new session: DB_CONFIG updated with
+    `sobrescritas`, plus SESSAO_CONFIG as application_name and `-c` options,
+    so the settings cost nothing on checkout.
+    """
+    params = dict(DB_CONFIG, **(sobrescritas or {}))
+    ajustes = {k: v for k, v in SESSAO_CONFIG.items() if v is not None}
+    nome = ajustes.pop('application_name', None)
+    if nome and 'application_name' not in params:
+        params['application_name'] = nome
+    opcoes = ' '.join(f"-c {k}={_opcao_libpq(v)}" for k, v in ajustes.items())
+    if opcoes:
+        params['options'] = f"{params['options']} {opcoes}" if params.get('options') else opcoes
+    return params
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(parametros_conexao(), **POOL_CONFIG)
+    return _pool
+
+
+def close_pool():
+    global _pool, _router
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        if _router is not None:
+            _router.closeall()
+            _router = None
+
+
+@contextmanager
+def get_connection(leitura: bool = False):
+    """
+    Borrow a pooled connection for the duration of the with-block.
+
+    Commits when the block succeeds and rolls back when it raises, like
+    psycopg2's own connection context manager. A connection that raised
+    OperationalError is dropped so the next checkout reconnects.
+
+    With leitura=True the block only reads, and may run on a read replica
+    (see ReplicaRouter); otherwise it runs on the primary and, when replicas
+    are configured and the block wrote (PooledConnection.wrote), its commit
+    is remembered for read_your_writes.
+    """
+    router = get_router() if REPLICA_CONFIG['replicas'] else None
+    if leitura and router:
+        pool, conn = router.checkout()
+    else:
+        pool = get_pool()
+        conn = pool.getconn()
+    conn.wrote = False
+    discard = False
+    try:
+        yield conn
+        conn.commit()
+        if router and not leitura and router.read_your_writes and conn.wrote:
+            router.record_write(conn)
+    except psycopg2.OperationalError:
+        discard = True
+        raise
+    except BaseException:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard = True
+        raise
+    finally:
+        pool.putconn(conn, discard=discard)
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+# -------------------------
+# Réplicas de leitura
+# -------------------------
+# Replay lag in seconds and the replayed WAL position as a number. Lag is 0
+# when everything received was replayed and the WAL receiver is streaming
+# and heard from the primary within wal_sender_timeout (the primary sends a
+# keepalive at least every half of it); past that, the time since the last
+# message. NULL (unknown, treated as lagging) when the receiver is not
+# streaming, or not visible: reading pg_stat_wal_receiver needs
+# pg_read_all_stats.
+ESTADO_REPLICA_SQL = """
+    SELECT pg_is_in_recovery(),
+           CASE WHEN W.status IS DISTINCT FROM 'streaming' THEN NULL
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN
+                     CASE WHEN current_setting('wal_sender_timeout')::interval = '0'
+                               OR W.last_msg_receipt_time >= clock_timestamp() - current_setting('wal_sender_timeout')::interval
+                          THEN 0
+                          ELSE EXTRACT(EPOCH FROM clock_timestamp() - W.last_msg_receipt_time)::float8
+                     END
+                ELSE EXTRACT(EPOCH FROM clock_timestamp() - pg_last_xact_replay_timestamp())::float8
+           END,
+           pg_last_wal_replay_lsn() - '0/0'::pg_lsn
+    FROM (SELECT 1) AS uma_linha
+    LEFT JOIN pg_stat_wal_receiver W ON true
+"""
+
+POSICAO_WAL_SQL = "SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"
+
+
+class Replica:
+    """One read replica: its pool and the last lag/WAL position measured on it."""
+
+    def __init__(self, db_config: dict):
+        self.db_config = db_config
+        self.pool = None
+        self.em_recuperacao = None
+        self.lag = None           # seconds; None = unknown
+        self.lsn = 0              # replayed WAL position
+        self.medido_em = None     # time.monotonic() of the measurement
+        self.indisponivel_ate = 0.0
+        self.leituras = 0
+        self.erro = None
+
+    @property
+    def endereco(self) -> str:
+        return f"{self.db_config.get('host', 'localhost')}:{self.db_config.get('port', 5432)}"
+
+
+class ReplicaRouter:
+    """
+    Routes read-only work to the replicas of REPLICA_CONFIG, falling back to
+    the primary pool.
+
+    A replica is used while it is in recovery, its replay lag is at most
+    max_lag (a disconnected WAL receiver counts as lagging; see
+    ESTADO_REPLICA_SQL) and, with read_your_writes, it has replayed the WAL position of
+    this process's last commit on the primary (record_write()), so a report
+    run right after an insert sees it. Measurements are reused for
+    lag_check_interval seconds and taken on the connection about to be used;
+    a replica that cannot be reached is left out for retry_after seconds.
+    Eligible replicas take turns.
+    """
+
+    def __init__(self, replicas, max_lag=5.0, lag_check_interval=0.5,
+                 read_your_writes=True, retry_after=10.0):
+        self.replicas = [Replica(parametros_conexao(r)) for r in replicas]
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.read_your_writes = read_your_writes
+        self.retry_after = retry_after
+        self.ultima_escrita = 0   # WAL position after this process's last commit on the primary
+        self._vez = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {
+            'leituras_replica': 0,
+            'leituras_primario': 0,   # reads that found no eligible replica
+            'por_lag': 0,             # replica skipped: lag above max_lag (or unknown)
+            'por_escrita': 0,         # replica skipped: this process's last commit not replayed yet
+            'por_indisponivel': 0,    # replica skipped: unreachable or not in recovery
+        }
+
+    def _pool(self, replica: Replica) -> ConnectionPool:
+        if replica.pool is None:
+            # Connects minconn times: outside the lock, which stats() and checkout() share
+            pool = ConnectionPool(replica.db_config, **POOL_CONFIG)
+            with self._lock:
+                if replica.pool is None:
+                    replica.pool, pool = pool, None
+            if pool is not None:
+                pool.closeall()
+        return replica.pool
+
+    def _medir(self, replica: Replica, conn):
+        with conn.cursor() as cur:
+            cur.execute(ESTADO_REPLICA_SQL)
+            em_recuperacao, lag, lsn = cur.fetchone()
+        with self._lock:
+            replica.em_recuperacao = em_recuperacao
+            replica.lag = lag
+            replica.lsn = int(lsn) if lsn is not None else 0
+            replica.medido_em = time.monotonic()
+
+    def _motivo_recusa(self, replica: Replica) -> Optional[str]:
+        """Why `replica` cannot serve a read now, from its last measurement; None if it can."""
+        if not replica.em_recuperacao:
+            return 'por_indisponivel'
+        if replica.lag is None or replica.lag > self.max_lag:
+            return 'por_lag'
+        if self.read_your_writes and replica.lsn < self.ultima_escrita:
+            return 'por_escrita'
+        return None
+
+    def _recusar(self, motivo: str):
+        with self._lock:
+            self._stats[motivo] += 1
+
+    def _conectar(self, replica: Replica, medir: bool):
+        """A connection from `replica`'s pool (measured first if `medir`), or None if it cannot be reached."""
+        pool = conn = None
+        try:
+            # Creating the pool already connects (minconn)
+            pool = self._pool(replica)
+            conn = pool.getconn()
+            if medir:
+                self._medir(replica, conn)
+            return conn
+        except PoolTimeout:
+            return None
+        except psycopg2.OperationalError as e:
+            if conn is not None:
+                pool.putconn(conn, discard=True)
+            with self._lock:
+                replica.indisponivel_ate = time.monotonic() + self.retry_after
+                replica.erro = str(e).strip().splitlines()[0]
+            logging.getLogger(__name__).warning(
+                "Réplica %s indisponível por %ss: %s", replica.endereco, self.retry_after, replica.erro)
+            return None
+
+    def checkout(self) -> tuple:
+        """(pool, connection) for a read: an eligible replica's, else the primary's."""
+        if self.replicas:
+            inicio = next(self._vez)
+            for i in range(len(self.replicas)):
+                replica = self.replicas[(inicio + i) % len(self.replicas)]
+                agora = time.monotonic()
+                if replica.indisponivel_ate > agora:
+                    self._recusar('por_indisponivel')
+                    continue
+                recente = replica.medido_em is not None and agora - replica.medido_em < self.lag_check_interval
+                motivo = self._motivo_recusa(replica) if recente else None
+                if motivo == 'por_escrita':
+                    # It may well have replayed that commit since: measure again
+                    recente, motivo = False, None
+                if motivo:
+                    self._recusar(motivo)
+                    continue
+                conn = self._conectar(replica, medir=not recente)
+                if conn is None:
+                    self._recusar('por_indisponivel')
+                    continue
+                motivo = self._motivo_recusa(replica)
+                if motivo:
+                    replica.pool.putconn(conn)
+                    self._recusar(motivo)
+                    continue
+                with self._lock:
+                    replica.leituras += 1
+                    replica.erro = None
+                    self._stats['leituras_replica'] += 1
+                return replica.pool, conn
+        with self._lock:
+            self._stats['leituras_primario'] += 1
+        pool = get_pool()
+        return pool, pool.getconn()
+
+    def refresh(self):
+        """Measures every replica now, retrying unreachable ones (for status displays)."""
+        for replica in self.replicas:
+            replica.indisponivel_ate = 0.0
+            conn = self._conectar(replica, medir=True)
+            if conn is not None:
+                replica.pool.putconn(conn)
+
+    def record_write(self, conn):
+        """Notes the primary's WAL position after a commit on `conn`, for read_your_writes."""
+        # Autocommit so the position query does not leave a transaction for putconn to roll back
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(POSICAO_WAL_SQL)
+                lsn = int(cur.fetchone()[0])
+        finally:
+            conn.autocommit = False
+        with self._lock:
+            self.ultima_escrita = max(self.ultima_escrita, lsn)
+
+    def closeall(self):
+        for replica in self.replicas:
+            if replica.pool is not None:
+                replica.pool.closeall()
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data['replicas'] = [{
+                'endereco': r.endereco,
+                'em_recuperacao': r.em_recuperacao,
+                'lag': r.lag,
+                'atraso_bytes': max(0, self.ultima_escrita - r.lsn) if r.medido_em is not None else None,
+                'leituras': r.leituras,
+                'indisponivel': r.indisponivel_ate > time.monotonic(),
+                'erro': r.erro,
+            } for r in self.replicas]
+        return data
+
+
+_router = None
+
+
+def get_router() -> ReplicaRouter:
+    """Return the process-wide replica router, creating it from REPLICA_CONFIG on first use."""
+    global _router
+    if _router is None:
+        with _pool_lock:
+            if _router is None:
+                _router = ReplicaRouter(**REPLICA_CONFIG)
+    return _router
+
+
+def replica_stats() -> dict:
+    return get_router().stats()
+
+
+class StatementRegistry:
+    """
+    Hot statements declared once and PREPAREd on each pooled connection the
+    first time they run there; later executions send only
+    EXECUTE name(params), skipping parse/analysis and reusing cached plans.
+
+    SQL keeps psycopg2's %s / %(name)s placeholders. Parameter types come
+    from the server after PREPARE and are written as casts into the EXECUTE
+    template. A statement the server cannot prepare (e.g. an untyped
+    parameter) falls back to plain execution on that connection. A new
+    connection starts empty, so statements are re-prepared after a
+    reconnect; a statement invalidated by a schema change is re-prepared
+    and retried when no transaction was open.
+    """
+
+    _PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s|%%')
+
+    def __init__(self):
+        self._by_sql = {}   # sql -> name
+        self._by_name = {}  # name -> (sql, PREPARE text, param names or count)
+        self._escritas = set()  # names whose SQL may write (see WriteTrackingCursor)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def declare(self, name: str, sql: str) -> str:
+        """Registers `sql` under `name` (idempotent) and returns `sql` unchanged."""
+        name = 'ps_' + re.sub(r'\W', '_', name).lower()
+        if len(name) > 63:
+            raise ValueError(f"Nome de statement longo demais: {name}")
+        with self._lock:
+            if sql in self._by_sql:
+                return sql
+            if name in self._by_name:
+                raise ValueError(f"Statement preparado já declarado com outro SQL: {name}")
+            nomes = []
+            posicionais = 0
+
+            def numerar(m):
+                nonlocal posicionais
+                if m.group(0) == '%%':
+                    return '%'
+                if m.group(1) is None:
+                    posicionais += 1
+                    return f'${posicionais}'
+                if m.group(1) not in nomes:
+                    nomes.append(m.group(1))
+                return f'${nomes.index(m.group(1)) + 1}'
+
+            corpo = self._PLACEHOLDER.sub(numerar, sql)
+            if nomes and posicionais:
+                raise ValueError(f"{name}: não misture %s e %(nome)s")
+            self._by_sql[sql] = name
+            self._by_name[name] = (sql, f"PREPARE {name} AS {corpo}", nomes or posicionais)
+            if _ESCRITA_RE.search(sql):
+                self._escritas.add(name)
+            self._stats[name] = {'prepares': 0, 'execucoes': 0, 'texto': 0, 'reprepares': 0,
+                                 'prepare_s': 0.0}
+        return sql
+
+    def __contains__(self, sql) -> bool:
+        return sql in self._by_sql
+
+    def _count(self, name: str, key: str, value=1):
+        with self._lock:
+            self._stats[name][key] += value
+
+    def _prepare(self, cur, name: str) -> Optional[str]:
+        """PREPAREs `name` on the cursor's connection; returns the EXECUTE template or None."""
+        conn = cur.connection
+        _sql, prepare_sql, params = self._by_name[name]
+        em_transacao = conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if em_transacao:
+            cur.execute("SAVEPOINT preparar")
+        inicio = time.perf_counter()
+        try:
+            cur.execute(prepare_sql)
+        except psycopg2.Error:
+            # Not preparable as written: run it as plain SQL on this connection
+            if em_transacao:
+                cur.execute("ROLLBACK TO SAVEPOINT preparar")
+            else:
+                conn.rollback()
+            conn.prepared[name] = None
+            return None
+        self._count(name, 'prepare_s', time.perf_counter() - inicio)
+        self._count(name, 'prepares')
+        cur.execute("SELECT parameter_types::text[] FROM pg_prepared_statements WHERE name = %s", (name,))
+        tipos = cur.fetchone()[0] or []
+        if em_transacao:
+            cur.execute("RELEASE SAVEPOINT preparar")
+        if isinstance(params, list):
+            args = [f"%({p})s::{t}" for p, t in zip(params, tipos)]
+        else:
+            args = [f"%s::{t}" for t in tipos]
+        template = f"EXECUTE {name} ({', '.join(args)})" if args else f"EXECUTE {name}"
+        conn.prepared[name] = template
+        return template
+
+    def execute(self, cur, sql: str, params=None):
+        """cur.execute(sql, params), through the connection's prepared statement when `sql` is declared."""
+        name = self._by_sql.get(sql)
+        conn = cur.connection
+        if name is None or not PREPARED_CONFIG['enabled'] or not hasattr(conn, 'prepared'):
+            return cur.execute(sql, params)
+        if name in self._escritas:
+            conn.wrote = True
+        if name in conn.prepared:
+            template = conn.prepared[name]
+        else:
+            template = self._prepare(cur, name)
+        if template is None:
+            self._count(name, 'texto')
+            return cur.execute(sql, params)
+        ocioso = conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        try:
+            cur.execute(template, params)
+        except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported):
+            # Deallocated (DISCARD ALL) or "cached plan must not change result type"
+            # after a schema change: prepare again and retry if nothing else ran
+            conn.prepared.pop(name, None)
+            if not ocioso:
+                raise
+            conn.rollback()
+            cur.execute("SELECT EXISTS (SELECT 1 FROM pg_prepared_statements WHERE name = %s)", (name,))
+            if cur.fetchone()[0]:
+                cur.execute(f"DEALLOCATE {name}")
+            self._count(name, 'reprepares')
+            template = self._prepare(cur, name)
+            cur.execute(template or sql, params)
+        self._count(name, 'execucoes')
+
+    def stats(self) -> list:
+        """
+        Per statement: prepares, executions by name, plain-text fallbacks,
+        re-preparations and the parse/analysis time saved, estimated as the
+        mean PREPARE time times the executions that did not need one.
+        """
+        with self._lock:
+            itens = [(n, dict(s)) for n, s in self._stats.items()]
+        resumo = []
+        for name, s in itens:
+            medio_ms = s['prepare_s'] * 1000 / s['prepares'] if s['prepares'] else 0.0
+            s['prepare_ms'] = medio_ms
+            s['economia_ms'] = max(0, s['execucoes'] - s['prepares']) * medio_ms
+            resumo.append(dict(s, statement=name))
+        return sorted(resumo, key=lambda s: -s['economia_ms'])
+
+
+_statements = StatementRegistry()
+
+def declarar(nome: str, sql: str) -> str:
+    """Declares `sql` as a prepared statement; returns it so constants can be wrapped in place."""
+    return _statements.declare(nome, sql)
+
+def executar(cur, sql: str, params=None):
+    """Runs `sql` on `cur`, by name when it was declared (see StatementRegistry)."""
+    return _statements.execute(cur, sql, params)
+
+def prepared_stats() -> list:
+    return _statements.stats()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results with a TTL.
+
+    Every entry records the tables it was computed from. A write to one of
+    those tables (invalidate()) drops the entry, and bumps a per-table
+    version so a result computed concurrently with the write is not stored.
+    """
+
+    def __init__(self, ttl=60, max_entries=128, max_rows=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()  # key -> (expires_at, rows, tables)
+        self._versions = {}            # table -> write counter
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0,
+                       'expirations': 0, 'invalidations': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def versions(self, tables) -> tuple:
+        """Snapshot of the write counters of `tables`; pass it back to put()."""
+        with self._lock:
+            return tuple(self._versions.get(t.lower(), 0) for t in tables)
+
+    def put(self, key, rows, tables, versions, ttl=None):
+        """Stores `rows` for `ttl` seconds (default: self.ttl) unless `tables` changed since versions()."""
+        with self._lock:
+            current = tuple(self._versions.get(t.lower(), 0) for t in tables)
+            if current != versions:
+                return  # a write landed while the query ran; result may be stale
+            expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires_at, rows, tuple(t.lower() for t in tables))
+            self._entries.move_to_end(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, table: str) -> int:
+        """Drop every entry that depends on `table`; returns how many were dropped."""
+        table = table.lower()
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [k for k, e in self._entries.items() if table in e[2]]
+            for k in stale:
+                del self._entries[k]
+            self._stats['invalidations'] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data['entries'] = len(self._entries)
+            data['max_entries'] = self.max_entries
+        lookups = data['hits'] + data['misses']
+        data['hit_ratio'] = data['hits'] / lookups if lookups else 0.0
+        return data
+
+
+_cache = ResultCache(**CACHE_CONFIG)
+
+
+def invalidar_cache(*tabelas: str):
+    """Invalida os relatórios em cache que leem alguma das tabelas informadas."""
+    for tabela in tabelas:
+        _cache.invalidate(tabela)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
 
 def init_db():
     """
@@ -170,213 +1390,896 @@ def check_db_ready():
 # -------------------------
 # Adicionando dados(é o Fábio escrevendo nao o gepeto)
 # -------------------------
-def inserir_usuario() -> int:
+# (table, allowed columns, generated key returned by the insert or None)
+TABELAS_INSERCAO = {
+    'usuario': ('Usuario', ('cpf', 'nome', 'email', 'dataNascimento', 'role'), None),
+    'funcionario': ('Funcionario', ('cpf', 'setor', 'cidade'), None),
+    'cidadao': ('Cidadao', ('cpf', 'pontos'), None),
+    'beneficio': ('Beneficio', ('nomeBeneficio', 'custo', 'descricao'), None),
+    'interacao': ('Interacao', ('cpfCidadao', 'idReport', 'tipo', 'dataHora'), 'idInteracao'),
+    'comentario': ('Comentario', ('idInteracao', 'texto'), None),
+    'avaliacao': ('Avaliacao', ('idInteracao', 'nota', 'comentario'), None),
+    'report': ('Report', ('titulo', 'localizacao', 'descricao', 'status',
+                          'idCategoriaReport', 'cpfCidadao', 'dataCriacao',
+                          'latitude', 'longitude'), 'idReport'),
+    'midia': ('Midia', ('link', 'idReport', 'dataUpload'), 'idMidia'),
+    'categoria': ('CategoriaReport', ('nome', 'pontos'), 'idCategoriaReport'),
+    'historico': ('HistoricoAtualizacao', ('cpfFuncionario', 'idReport',
+                                           'dataHoraAtualizacao', 'atributoAtualizado'), None),
+    # CidadaoBeneficio is only written by resgatar_beneficio(), which debits the points
+}
+
+# -------------------------
+# Geocodificação (migração 004)
+# -------------------------
+_COORDENADAS_RE = re.compile(r'(-?\d{1,2}\.\d{3,})\s*[,;]\s*(-?\d{1,3}\.\d{3,})')
+
+def coordenadas_no_texto(localizacao: str) -> Optional[tuple]:
+    """Default geocoder: picks up coordinates typed into the address, e.g. 'Rua A, 100 (-23.5614, -46.6559)'."""
+    m = _COORDENADAS_RE.search(localizacao or '')
+    if m:
+        lat, lon = float(m.group(1)), float(m.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            return lat, lon
+    return None
+
+def geocodificador():
+    """The configured geocoder (GEO_CONFIG['geocoder']) and the name stored as its source."""
+    geocoder = GEO_CONFIG['geocoder'] or coordenadas_no_texto
+    return geocoder, getattr(geocoder, '__name__', type(geocoder).__name__)[:50]
+
+# Report whose normalized address was never sent to the geocoder
+GEOCODIFICACAO_PENDENTE_SQL = declarar('geocodificacao_pendente', """
+SELECT R.localizacao, R.localizacaoNormalizada
+FROM Report R
+WHERE R.idReport = %s
+  AND R.latitude IS NULL
+  AND NOT EXISTS (SELECT 1 FROM Geocodificacao G WHERE G.endereco = R.localizacaoNormalizada)
+""")
+
+# Active reports without coordinates, one sample address per normalized
+# address, in keyset order; cached misses only when retrying them
+GEOCODIFICACOES_PENDENTES_SQL = """
+SELECT R.localizacaoNormalizada, MIN(R.localizacao)
+FROM Report R
+WHERE R.status IN ('Aberto', 'Em Análise')
+  AND R.latitude IS NULL
+  AND R.localizacaoNormalizada > %(depois_de)s
+  AND NOT EXISTS (SELECT 1 FROM Geocodificacao G
+                  WHERE G.endereco = R.localizacaoNormalizada
+                    AND (G.latitude IS NOT NULL OR NOT %(repetir_falhas)s))
+GROUP BY R.localizacaoNormalizada
+ORDER BY R.localizacaoNormalizada
+LIMIT %(lote)s
+"""
+
+# Caches a batch of geocoder results (misses too) and sets the coordinates
+# of the reports at those addresses still without them, in one statement
+GRAVAR_GEOCODIFICACOES_SQL = declarar('gravar_geocodificacoes', """
+WITH gravadas AS (
+    INSERT INTO Geocodificacao (endereco, latitude, longitude, fonte)
+    SELECT G.endereco, G.latitude, G.longitude, %(fonte)s
+    FROM unnest(%(enderecos)s::text[], %(latitudes)s::float8[], %(longitudes)s::float8[])
+         AS G(endereco, latitude, longitude)
+    ON CONFLICT (endereco) DO UPDATE
+        SET latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude,
+            fonte = EXCLUDED.fonte, consultadoEm = NOW()
+    RETURNING endereco, latitude, longitude
+)
+UPDATE Report R
+SET latitude = G.latitude, longitude = G.longitude
+FROM gravadas G
+WHERE G.endereco = R.localizacaoNormalizada
+  AND G.latitude IS NOT NULL
+  AND R.latitude IS NULL
+""")
+
+def geocodificar(pendentes: list) -> dict:
+    """
+    Runs the geocoder over (normalized address, sample address) pairs and
+    returns the GRAVAR_GEOCODIFICACOES_SQL params. Call it with no
+    transaction open: a slow geocoder must not hold locks or a connection.
+    """
+    geocoder, fonte = geocodificador()
+    params = {'fonte': fonte, 'enderecos': [], 'latitudes': [], 'longitudes': []}
+    for endereco, localizacao in pendentes:
+        lat, lon = geocoder(localizacao) or (None, None)
+        params['enderecos'].append(endereco)
+        params['latitudes'].append(lat)
+        params['longitudes'].append(lon)
+    return params
+
+def geocodificar_report(id_report: int) -> bool:
+    """
+    Geocodes a committed report when its normalized address is not in the
+    Geocodificacao cache (cached addresses are resolved by the insert
+    trigger). Reads and writes run in separate short transactions with the
+    geocoder called between them. Misses are cached too, so each address
+    reaches the geocoder once. Returns whether coordinates were set.
+    """
     with get_connection() as conn:
-        clear_console()
-        print("Inserindo Usuario")
-        cpf = input("CPF: ").strip()
-        nome = input("Nome: ").strip()
-        email = input("Email: ").strip()
-        data_nasc = input("Data de Nascimento (AAAA-MM-DD): ").strip()
-        role = input("Role (Cidadao/Funcionario): ").strip()
-        
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Usuario (cpf, nome, email, dataNascimento, role) 
-            VALUES (%s, %s, %s, %s, %s)
-        """, (cpf, nome, email, data_nasc, role))
-        conn.commit()
-        return cur.rowcount
+        with conn.cursor() as cur:
+            executar(cur, GEOCODIFICACAO_PENDENTE_SQL, (id_report,))
+            pendente = cur.fetchone()
+    if pendente is None:
+        return False
+    localizacao, endereco = pendente
+    params = geocodificar([(endereco, localizacao)])
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            executar(cur, GRAVAR_GEOCODIFICACOES_SQL, params)
+            atualizados = cur.rowcount
+    if atualizados:
+        invalidar_cache('Report')
+    return atualizados > 0
 
-def inserir_funcionario() -> int:
+def geocodificar_pendentes(lote: int = 100, repetir_falhas: bool = False) -> tuple:
+    """
+    Geocodes the addresses of active reports left without coordinates (bulk
+    loads, inserts made outside this module and inserts whose geocoding
+    failed skip the geocoder), `lote` addresses at a time: the geocoder runs
+    with no transaction open and each batch is written in one statement.
+    Addresses the geocoder already failed on are skipped unless
+    `repetir_falhas`. Returns (addresses resolved, reports updated).
+    """
+    enderecos = reports = 0
+    params = {'depois_de': '', 'repetir_falhas': repetir_falhas, 'lote': lote}
+    while True:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(GEOCODIFICACOES_PENDENTES_SQL, params)
+                pendentes = cur.fetchall()
+        if not pendentes:
+            break
+        params['depois_de'] = pendentes[-1][0]
+        gravar = geocodificar(pendentes)
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                executar(cur, GRAVAR_GEOCODIFICACOES_SQL, gravar)
+                reports += cur.rowcount
+        enderecos += sum(lat is not None for lat in gravar['latitudes'])
+    if reports:
+        invalidar_cache('Report')
+    return enderecos, reports
+
+# Run after an insert commits, each in its own transactions: tipo -> callable(generated key).
+# A failure leaves the row as inserted (geocodificar_pendentes() catches up on reports).
+POS_INSERCAO = {
+    'report': geocodificar_report,
+}
+
+def sql_insercao(tipo: str, dados: dict) -> tuple:
+    """(tabela, sql, valores, chave) of the INSERT of `dados` into TABELAS_INSERCAO[tipo]."""
+    tabela, colunas, chave = TABELAS_INSERCAO[tipo]
+    desconhecidas = set(dados) - set(colunas)
+    if desconhecidas:
+        raise ValueError(f"Colunas inválidas para {tabela}: {', '.join(sorted(desconhecidas))}")
+    cols = [c for c in colunas if c in dados]
+    sql = f"INSERT INTO {tabela} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+    if chave:
+        sql += f" RETURNING {chave}"
+    # One prepared statement per table and column subset
+    variante = zlib.crc32(' '.join(cols).encode())
+    return tabela, declarar(f"insercao_{tipo}_{variante:08x}", sql), [dados[c] for c in cols], chave
+
+def inserir_registro(tipo: str, dados: dict) -> int:
+    """
+    Inserts one row into the TABELAS_INSERCAO[tipo] table with the columns of
+    `dados` (omitted columns take the database DEFAULT). Returns the generated
+    key when the table has one, otherwise the number of rows inserted.
+    """
+    tabela, sql, valores, chave = sql_insercao(tipo, dados)
     with get_connection() as conn:
-        clear_console()
-        print("Inserindo Funcionario")
-        cpf = input("CPF: ").strip()
-        setor = input("Setor: ").strip()
-        cidade = input("Cidade: ").strip()
-        
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Funcionario (cpf, setor, cidade) VALUES (%s, %s, %s)",
-                    (cpf, setor, cidade))
-        conn.commit()
-        return cur.rowcount
+        with conn.cursor() as cur:
+            executar(cur, sql, valores)
+            resultado = cur.fetchone()[0] if chave else cur.rowcount
+    invalidar_cache(tabela)
+    if tipo in POS_INSERCAO:
+        try:
+            POS_INSERCAO[tipo](resultado)
+        except Exception as e:
+            logging.getLogger(__name__).warning(
+                "Pós-inserção de %s %s falhou (a linha foi inserida): %s", tipo, resultado, e)
+    return resultado
 
-def inserir_cidadao() -> int:
+# -------------------------
+# Interações: escrita em um comando e group commit
+# -------------------------
+TIPOS_INTERACAO = ('Comentario', 'Upvote', 'Avaliacao')
+
+# Writes Interacao plus its specialization for a batch of interactions
+# given as parallel arrays, in one statement. Ids are drawn up front so the
+# subtype rows can join on `dados`; returns (ordem, idInteracao) per input.
+REGISTRAR_INTERACOES_SQL = declarar('registrar_interacoes', """
+WITH dados AS MATERIALIZED (
+    SELECT nextval(pg_get_serial_sequence('interacao', 'idinteracao'))::integer AS idInteracao, d.*
+    FROM unnest(%(cpfs)s::varchar[], %(reports)s::integer[], %(tipos)s::interacao_type[],
+                %(datas)s::timestamptz[], %(textos)s::text[], %(notas)s::integer[],
+                %(comentarios)s::text[])
+         WITH ORDINALITY AS d(cpfCidadao, idReport, tipo, dataHora, texto, nota, comentario, ordem)
+),
+interacao AS (
+    INSERT INTO Interacao (idInteracao, cpfCidadao, idReport, tipo, dataHora)
+    SELECT idInteracao, cpfCidadao, idReport, tipo, COALESCE(dataHora, NOW()) FROM dados
+),
+comentario AS (
+    INSERT INTO Comentario (idInteracao, texto)
+    SELECT idInteracao, texto FROM dados WHERE tipo = 'Comentario'
+),
+upvote AS (
+    INSERT INTO Upvote (idInteracao)
+    SELECT idInteracao FROM dados WHERE tipo = 'Upvote'
+),
+avaliacao AS (
+    INSERT INTO Avaliacao (idInteracao, nota, comentario)
+    SELECT idInteracao, nota, comentario FROM dados WHERE tipo = 'Avaliacao'
+)
+SELECT ordem, idInteracao FROM dados ORDER BY ordem
+""")
+
+# Batch-level counterparts of the tables written by REGISTRAR_INTERACOES_SQL
+TABELAS_INTERACAO = ('Interacao', 'Comentario', 'Upvote', 'Avaliacao')
+
+GROUP_COMMIT_CONFIG = {
+    'max_lote': 200,        # interactions per transaction
+    'max_espera_ms': 5,     # how long a batch waits for more writers before committing
+}
+
+def interacao(cpf: str, id_report: int, tipo: str, texto: Optional[str] = None,
+              nota: Optional[int] = None, comentario: Optional[str] = None,
+              data_hora: Optional[datetime.datetime] = None) -> dict:
+    """Validated interaction, as accepted by registrar_interacoes() and GroupCommitWriter.submit()."""
+    if tipo not in TIPOS_INTERACAO:
+        raise ValueError(f"Tipo de interação inválido: {tipo} (use {', '.join(TIPOS_INTERACAO)})")
+    if tipo == 'Comentario' and not (texto and texto.strip()):
+        raise ValueError("Comentário sem texto")
+    if tipo == 'Avaliacao' and nota is None:
+        raise ValueError("Avaliação sem nota")
+    if tipo != 'Comentario' and texto:
+        raise ValueError("texto só se aplica a Comentario")
+    if tipo != 'Avaliacao' and (nota is not None or comentario):
+        raise ValueError("nota/comentario só se aplicam a Avaliacao")
+    return {'cpfCidadao': cpf, 'idReport': id_report, 'tipo': tipo, 'dataHora': data_hora,
+            'texto': texto, 'nota': nota, 'comentario': comentario}
+
+def _params_interacoes(itens: list) -> dict:
+    return {
+        'cpfs': [i['cpfCidadao'] for i in itens],
+        'reports': [i['idReport'] for i in itens],
+        'tipos': [i['tipo'] for i in itens],
+        'datas': [i['dataHora'] for i in itens],
+        'textos': [i['texto'] for i in itens],
+        'notas': [i['nota'] for i in itens],
+        'comentarios': [i['comentario'] for i in itens],
+    }
+
+def _gravar_interacoes(cur, itens: list) -> List[int]:
+    executar(cur, REGISTRAR_INTERACOES_SQL, _params_interacoes(itens))
+    return [id_interacao for _ordem, id_interacao in cur.fetchall()]
+
+def registrar_interacoes(itens: list) -> List[int]:
+    """
+    Writes a list of interacao(...) dicts (Interacao plus its Comentario,
+    Upvote or Avaliacao row) in one statement and one transaction; all or
+    nothing. Returns the new idInteracao of each item, in order.
+    """
+    if not itens:
+        return []
     with get_connection() as conn:
-        clear_console()
-        print("Inserindo Cidadao")
-        cpf = input("CPF: ").strip()
-        pontos = input("Pontos: ").strip()
-        
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Cidadao (cpf, pontos) VALUES (%s, %s)",
-                    (cpf, pontos))
+        with conn.cursor() as cur:
+            ids = _gravar_interacoes(cur, itens)
         conn.commit()
-        return cur.rowcount
+    invalidar_cache(*TABELAS_INTERACAO)
+    return ids
 
-def inserir_beneficio() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo Beneficio")
-        nome = input("Nome: ").strip()
-        custo = input("Custo (Pontos): ").strip()
-        descricao = input("Descricao: ").strip()
+def registrar_interacao(cpf: str, id_report: int, tipo: str, texto: Optional[str] = None,
+                        nota: Optional[int] = None, comentario: Optional[str] = None,
+                        data_hora: Optional[datetime.datetime] = None) -> int:
+    """Writes one interaction with its specialization in one round trip; returns the idInteracao."""
+    return registrar_interacoes([interacao(cpf, id_report, tipo, texto, nota, comentario, data_hora)])[0]
 
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Beneficio (nomeBeneficio, custo, descricao) VALUES (%s, %s, %s)",
-                    (nome, custo, descricao))
-        conn.commit()
-        return cur.rowcount
 
-def inserir_interacao() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo Interacao")
-        cpf = input("CPF do Cidadão: ").strip()
-        id_report = input("ID do Report: ").strip()
-        tipo = input("Tipo (Comentario/Upvote/Avaliacao): ").strip()
-        data = datetime.datetime.now()
+class GroupCommitWriter:
+    """
+    Background writer that coalesces interactions submitted by many threads
+    into few transactions.
+
+    submit() queues an interacao(...) dict and returns a Future with its
+    idInteracao. The writer thread takes whatever is queued (up to
+    max_lote), waits at most max_espera_ms for more, and writes the batch
+    with one statement and one commit. If the batch fails, it is retried
+    item by item under savepoints in a single transaction, so only the
+    offending interactions fail their futures.
+    """
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Interacao (cpfCidadao, idReport, tipo, dataHora) 
-            VALUES (%s, %s, %s, %s) RETURNING idInteracao
-        """, (cpf, id_report, tipo, data))
-        
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"ID Gerado: {new_id}")
-        return new_id
+    def __init__(self, max_lote: Optional[int] = None, max_espera_ms: Optional[float] = None):
+        self.max_lote = max_lote or GROUP_COMMIT_CONFIG['max_lote']
+        espera = GROUP_COMMIT_CONFIG['max_espera_ms'] if max_espera_ms is None else max_espera_ms
+        self.max_espera = espera / 1000
+        self._fila = queue.Queue()
+        self._fechado = False
+        self._lock = threading.Lock()
+        self._stats = {'lotes': 0, 'itens': 0, 'erros': 0, 'lotes_reprocessados': 0,
+                       'maior_lote': 0, 'tempo_commit': 0.0}
+        self._latencias = Histogram(PROFILE_CONFIG['sample_size'])
+        self._inicio = time.monotonic()
+        self._thread = threading.Thread(target=self._executar, name='group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, item: dict) -> concurrent.futures.Future:
+        futuro = concurrent.futures.Future()
+        with self._lock:
+            if self._fechado:
+                raise RuntimeError("GroupCommitWriter já foi fechado")
+            self._fila.put((item, futuro, time.perf_counter()))
+        return futuro
+
+    def registrar(self, *args, **kwargs) -> int:
+        """Blocking convenience: submit(interacao(...)) and wait for its idInteracao."""
+        return self.submit(interacao(*args, **kwargs)).result()
+
+    def close(self, timeout: Optional[float] = None):
+        """Stops accepting work, flushes what is queued and stops the writer thread."""
+        with self._lock:
+            if self._fechado:
+                return
+            self._fechado = True
+            self._fila.put(None)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _proximo_lote(self) -> tuple:
+        """Blocks for the first item, then gathers more for up to max_espera. Returns (lote, parar)."""
+        primeiro = self._fila.get()
+        if primeiro is None:
+            return [], True
+        lote = [primeiro]
+        prazo = time.monotonic() + self.max_espera
+        while len(lote) < self.max_lote:
+            try:
+                restante = prazo - time.monotonic()
+                item = self._fila.get_nowait() if restante <= 0 else self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                return lote, True
+            lote.append(item)
+        return lote, False
+
+    def _executar(self):
+        parar = False
+        while not parar:
+            lote, parar = self._proximo_lote()
+            if lote:
+                self._gravar(lote)
+
+    def _gravar(self, lote: list):
+        inicio = time.perf_counter()
+        resultados = [None] * len(lote)
+        reprocessado = False
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    # Deferred UNIQUE checks (schemas before migração 007) would otherwise fail the whole commit
+                    cur.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                    try:
+                        resultados = _gravar_interacoes(cur, [item for item, _f, _t in lote])
+                    except psycopg2.OperationalError:
+                        raise
+                    except psycopg2.Error:
+                        conn.rollback()
+                        reprocessado = True
+                        cur.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                        for n, (item, _f, _t) in enumerate(lote):
+                            cur.execute("SAVEPOINT item")
+                            try:
+                                resultados[n] = _gravar_interacoes(cur, [item])[0]
+                                cur.execute("RELEASE SAVEPOINT item")
+                            except psycopg2.Error as e:
+                                cur.execute("ROLLBACK TO SAVEPOINT item")
+                                resultados[n] = e
+                conn.commit()
+        except Exception as e:  # connection lost or commit failed: nothing was written
+            resultados = [e] * len(lote)
+        fim = time.perf_counter()
+        if any(not isinstance(r, Exception) for r in resultados):
+            invalidar_cache(*TABELAS_INTERACAO)
+
+        erros = 0
+        for (_item, futuro, enfileirado), resultado in zip(lote, resultados):
+            if isinstance(resultado, Exception):
+                erros += 1
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+            self._latencias.add((fim - enfileirado) * 1000)
+        with self._lock:
+            self._stats['lotes'] += 1
+            self._stats['itens'] += len(lote)
+            self._stats['erros'] += erros
+            self._stats['lotes_reprocessados'] += reprocessado
+            self._stats['maior_lote'] = max(self._stats['maior_lote'], len(lote))
+            self._stats['tempo_commit'] += fim - inicio
+
+    def stats(self) -> dict:
+        """Batches and items written, average/max batch size, commit and item rates, latency percentiles."""
+        with self._lock:
+            data = dict(self._stats)
+            latencias = self._latencias
+            data['latencia_p50_ms'] = latencias.percentile(50)
+            data['latencia_p99_ms'] = latencias.percentile(99)
+        decorrido = time.monotonic() - self._inicio
+        data['media_lote'] = data['itens'] / data['lotes'] if data['lotes'] else 0.0
+        data['commits_por_s'] = data['lotes'] / decorrido if decorrido else 0.0
+        data['itens_por_s'] = data['itens'] / decorrido if decorrido else 0.0
+        data['fila'] = self._fila.qsize()
+        return data
 
-def inserir_comentario() -> int:
+# -------------------------
+# Pontos (migração 006)
+# -------------------------
+# Locks the citizen row, then debits the benefit cost and records the
+# redemption only if the balance (re-read after any concurrent redemption
+# commits) covers it; the ledger trigger updates Cidadao.pontos.
+RESGATE_SQL = declarar('resgate', """
+WITH saldo AS (
+    SELECT C.cpf, COALESCE(C.pontos, 0) AS pontos, B.nomeBeneficio, B.custo
+    FROM Cidadao C
+    JOIN Beneficio B ON B.nomeBeneficio = %(beneficio)s
+    WHERE C.cpf = %(cpf)s
+    FOR UPDATE OF C
+),
+movimento AS (
+    INSERT INTO MovimentoPontos (cpfCidadao, delta, motivo, nomeBeneficio)
+    SELECT cpf, -custo, 'resgate', nomeBeneficio FROM saldo WHERE pontos >= custo
+    RETURNING idMovimento, cpfCidadao, nomeBeneficio, -delta AS custo, dataHora
+),
+resgate AS (
+    INSERT INTO CidadaoBeneficio (cpfCidadao, nomeBeneficio, pontosResgatados, dataHoraResgate)
+    SELECT cpfCidadao, nomeBeneficio, custo, dataHora FROM movimento
+)
+SELECT S.pontos, S.custo, M.idMovimento
+FROM saldo S LEFT JOIN movimento M ON TRUE
+""")
+
+# Locks the balance first, like RESGATE_SQL: the saldo_pontos trigger only
+# updates Cidadao after the statement, so a snapshot read could miss a
+# movement committed concurrently
+CREDITO_SQL = declarar('credito', """
+WITH saldo AS (
+    SELECT C.cpf, COALESCE(C.pontos, 0) AS pontos
+    FROM Cidadao C
+    WHERE C.cpf = %(cpf)s
+    FOR UPDATE OF C
+),
+movimento AS (
+    INSERT INTO MovimentoPontos (cpfCidadao, delta, motivo)
+    SELECT cpf, %(pontos)s, %(motivo)s FROM saldo
+    RETURNING delta
+)
+SELECT S.pontos + M.delta FROM saldo S, movimento M
+""")
+
+EXTRATO_SQL = declarar('extrato', """
+SELECT idMovimento, cpfCidadao, delta, motivo, idReport, nomeBeneficio, dataHora
+FROM MovimentoPontos
+WHERE cpfCidadao = %s
+ORDER BY idMovimento DESC
+LIMIT %s
+""")
+
+# Citizens whose cached balance differs from the sum of their ledger
+DIVERGENCIAS_PONTOS_SQL = """
+SELECT C.cpf, COALESCE(C.pontos, 0) AS saldo, COALESCE(L.soma, 0) AS extrato
+FROM Cidadao C
+LEFT JOIN (SELECT cpfCidadao, SUM(delta) AS soma FROM MovimentoPontos GROUP BY cpfCidadao) L
+       ON L.cpfCidadao = C.cpf
+WHERE COALESCE(C.pontos, 0) <> COALESCE(L.soma, 0)
+ORDER BY C.cpf
+"""
+
+def resgatar_beneficio(cpf: str, nome_beneficio: str) -> int:
+    """
+    Redeems a benefit: debits Beneficio.custo from the citizen and records
+    the CidadaoBeneficio row in one transaction. Concurrent redemptions by
+    the same citizen are serialized on the Cidadao row, so the balance can
+    never be spent twice. Returns the remaining balance; raises
+    SaldoInsuficiente when it does not cover the cost.
+    """
     with get_connection() as conn:
-        clear_console()
-        print("Inserindo Comentario")
-        id_interacao = input("Id da Interação: ").strip()
-        texto = input("Texto: ").strip()
+        with conn.cursor() as cur:
+            executar(cur, RESGATE_SQL, {'cpf': cpf, 'beneficio': nome_beneficio})
+            row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"Cidadão {cpf} ou benefício '{nome_beneficio}' não encontrado")
+        pontos, custo, id_movimento = row
+        if id_movimento is None:
+            raise SaldoInsuficiente(f"Saldo insuficiente: {pontos} pontos, '{nome_beneficio}' custa {custo}")
+    invalidar_cache('MovimentoPontos', 'CidadaoBeneficio', 'Cidadao')
+    return pontos - custo
+
+def creditar_pontos(cpf: str, pontos: int, motivo: str = 'ajuste') -> int:
+    """
+    Records a manual credit (or, with negative `pontos`, debit) in the
+    ledger and returns the new balance. A debit larger than the balance
+    raises SaldoInsuficiente.
+    """
+    if not pontos:
+        raise ValueError("pontos deve ser diferente de zero")
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                executar(cur, CREDITO_SQL, {'cpf': cpf, 'pontos': pontos, 'motivo': motivo})
+            except psycopg2.errors.CheckViolation as e:
+                if e.diag.table_name == 'cidadao':
+                    raise SaldoInsuficiente(f"Saldo insuficiente para debitar {-pontos} pontos de {cpf}") from None
+                raise
+            row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"Cidadão {cpf} não encontrado")
+        saldo, = row
+    invalidar_cache('MovimentoPontos', 'Cidadao')
+    return saldo
+
+def extrato_pontos(cpf: str, limite: int = PAGE_SIZE) -> List[MovimentoPontos]:
+    """The citizen's `limite` most recent ledger entries, newest first."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            executar(cur, EXTRATO_SQL, (cpf, limite))
+            return registros(MovimentoPontos, cur.fetchall())
 
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Comentario (idInteracao, texto) VALUES (%s, %s)",
-                    (id_interacao, texto))
-        conn.commit()
-        return cur.rowcount
+def conferir_pontos() -> list:
+    """(cpf, cached balance, ledger sum) of every citizen whose balance drifted; empty when consistent."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(DIVERGENCIAS_PONTOS_SQL)
+            return cur.fetchall()
 
-def inserir_avaliacao() -> int:
+# -------------------------
+# Atualização de reports (status e campos, com histórico)
+# -------------------------
+# Status a report may move to from each status; setting the current status
+# again is not a transition and is always accepted
+TRANSICOES_STATUS = {
+    'Aberto': ('Em Análise', 'Resolvido', 'Fechado'),
+    'Em Análise': ('Aberto', 'Resolvido', 'Fechado'),
+    'Resolvido': ('Em Análise', 'Fechado'),
+    'Fechado': ('Aberto',),
+}
+
+# Report columns staff may change -> SQL type. The category is left out:
+# changing it moves the points and coverage summaries (migrations 006/009).
+CAMPOS_ATUALIZAVEIS = {
+    'status': 'status_type',
+    'titulo': 'varchar',
+    'descricao': 'text',
+    'localizacao': 'varchar',
+}
+
+# Report selection for batch updates; every filter given must match
+FILTROS_ATUALIZACAO = {
+    'ids': "R.idReport = ANY(%(ids)s::integer[])",
+    'status_atual': "COALESCE(R.status, 'Aberto') = ANY(%(status_atual)s::status_type[])",
+    # Whole words of the normalized address (migração 004): 'Centro' matches
+    # 'Rua A, 10 - Centro' but not 'Centro-Oeste Shopping'
+    'localizacao': ("' ' || R.localizacaoNormalizada || ' ' "
+                    "LIKE '%% ' || normalizar_localizacao(%(localizacao)s) || ' %%'"),
+    'categoria': "R.idCategoriaReport = %(categoria)s",
+}
+
+
+class ReportAtualizado(NamedTuple):
+    idReport: int
+    statusAnterior: str
+    atributos: tuple   # columns changed, in CAMPOS_ATUALIZAVEIS order; () if already as requested
+
+
+def sql_atualizacao_reports(alteracoes: dict, filtros: dict) -> tuple:
+    """
+    (sql, params) of one statement that locks the selected reports in
+    idReport order, updates the changed ones and writes one
+    HistoricoAtualizacao row per updated report (atributoAtualizado lists
+    the changed columns, e.g. 'status,titulo'). Report.ultimaAtualizacao
+    (migração 008) is set by the UPDATE itself, so its trigger has nothing
+    left to rewrite. Returns (idReport,
+    previous status, changed columns) per selected report, ordered by
+    idReport; changed columns are NULL when the status transition is not
+    allowed. Expects %(funcionario)s besides the returned params.
+    """
+    desconhecidos = set(alteracoes) - set(CAMPOS_ATUALIZAVEIS)
+    if desconhecidos:
+        raise ValueError(f"Campos não atualizáveis: {', '.join(sorted(desconhecidos))} "
+                         f"(use {', '.join(CAMPOS_ATUALIZAVEIS)})")
+    desconhecidos = set(filtros) - set(FILTROS_ATUALIZACAO)
+    if desconhecidos:
+        raise ValueError(f"Filtros inválidos: {', '.join(sorted(desconhecidos))}")
+    campos = [c for c in CAMPOS_ATUALIZAVEIS if c in alteracoes]
+    usados = [f for f in FILTROS_ATUALIZACAO if filtros.get(f) is not None]
+    if not campos:
+        raise ValueError("Nenhum campo a atualizar")
+    if not usados:
+        raise ValueError(f"Informe ao menos um filtro de reports ({', '.join(FILTROS_ATUALIZACAO)})")
+    if 'status' in campos and alteracoes['status'] not in TRANSICOES_STATUS:
+        raise ValueError(f"Status inválido: {alteracoes['status']} (use {', '.join(TRANSICOES_STATUS)})")
+    for campo in ('titulo', 'localizacao'):
+        if campo in campos and not (alteracoes[campo] and alteracoes[campo].strip()):
+            raise ValueError(f"{campo} não pode ficar vazio")
+
+    params = {f'novo_{c}': alteracoes[c] for c in campos}
+    params.update({f: filtros[f] for f in usados})
+    mudou = ',\n               '.join(
+        f"CASE WHEN A.{c} IS DISTINCT FROM %(novo_{c})s::{CAMPOS_ATUALIZAVEIS[c]} THEN '{c}' END"
+        for c in campos)
+    colunas = ['R.idReport', 'R.status'] + [f'R.{c}' for c in campos if c != 'status']
+    permitido = "TRUE"
+    if 'status' in campos:
+        novo = alteracoes['status']
+        params['status_permitido'] = [novo] + [s for s, destinos in TRANSICOES_STATUS.items() if novo in destinos]
+        permitido = "COALESCE(A.status, 'Aberto') = ANY(%(status_permitido)s::status_type[])"
+
+    sql = f"""
+WITH alvo AS (
+    SELECT {', '.join(colunas)}
+    FROM Report R
+    WHERE {' AND '.join(FILTROS_ATUALIZACAO[f] for f in usados)}
+    ORDER BY R.idReport
+    FOR NO KEY UPDATE
+),
+mudancas AS (
+    SELECT A.idReport, clock_timestamp() AS quando,
+           array_remove(ARRAY[
+               {mudou}
+           ], NULL)::text[] AS atributos
+    FROM alvo A
+    WHERE {permitido}
+),
+atualizados AS (
+    UPDATE Report R
+    SET {', '.join(f'{c} = %(novo_{c})s::{CAMPOS_ATUALIZAVEIS[c]}' for c in campos)},
+        ultimaAtualizacao = GREATEST(R.ultimaAtualizacao, M.quando)
+    FROM mudancas M
+    WHERE R.idReport = M.idReport AND cardinality(M.atributos) > 0
+    RETURNING R.idReport
+),
+historico AS (
+    INSERT INTO HistoricoAtualizacao (idReport, cpfFuncionario, dataHoraAtualizacao, atributoAtualizado)
+    SELECT M.idReport, %(funcionario)s, M.quando, array_to_string(M.atributos, ',')
+    FROM mudancas M
+    JOIN atualizados U ON U.idReport = M.idReport
+    ORDER BY M.idReport
+)
+SELECT A.idReport, A.status, M.atributos
+FROM alvo A
+LEFT JOIN mudancas M ON M.idReport = A.idReport
+ORDER BY A.idReport
+"""
+    # One prepared statement per combination of fields and filters
+    variante = zlib.crc32(' '.join(campos + ['|'] + usados).encode())
+    return declarar(f"atualizacao_reports_{variante:08x}", sql), params
+
+def sql_bloqueio_categorias(alteracoes: dict, filtros: dict) -> Optional[tuple]:
+    """
+    (sql, params) locking, in category order, the ResumoAvaliacaoCategoria
+    rows of the reports sql_atualizacao_reports() will select, or None when
+    the batch does not change the status. Run it first in the same
+    transaction: the per-row trigger of migração 003 updates those rows in
+    report order, so two concurrent batches could otherwise deadlock on them.
+    """
+    if 'status' not in alteracoes:
+        return None
+    usados = [f for f in FILTROS_ATUALIZACAO if filtros.get(f) is not None]
+    sql = f"""
+SELECT C.idCategoriaReport
+FROM ResumoAvaliacaoCategoria C
+WHERE C.idCategoriaReport IN (SELECT R.idCategoriaReport
+                              FROM Report R
+                              WHERE {' AND '.join(FILTROS_ATUALIZACAO[f] for f in usados)})
+ORDER BY C.idCategoriaReport
+FOR NO KEY UPDATE
+"""
+    variante = zlib.crc32(' '.join(usados).encode())
+    return declarar(f"bloqueio_categorias_{variante:08x}", sql), {f: filtros[f] for f in usados}
+
+def _filtros_atualizacao(ids, status_atual, localizacao, categoria) -> dict:
+    if isinstance(status_atual, str):
+        status_atual = [status_atual]
+    return {'ids': list(ids) if ids is not None else None, 'status_atual': status_atual,
+            'localizacao': localizacao, 'categoria': categoria}
+
+def _reports_atualizados(alteracoes: dict, rows) -> List[ReportAtualizado]:
+    """Rows of sql_atualizacao_reports() as ReportAtualizado; TransicaoInvalida if any was refused."""
+    recusados = [(id_report, status) for id_report, status, atributos in rows if atributos is None]
+    if recusados:
+        exemplos = ', '.join(f"{i} ({s})" for i, s in recusados[:10])
+        raise TransicaoInvalida(
+            f"{len(recusados)} report(s) não podem passar para '{alteracoes['status']}': {exemplos}"
+            + (" ..." if len(recusados) > 10 else ""))
+    return [ReportAtualizado(id_report, status, tuple(atributos)) for id_report, status, atributos in rows]
+
+def atualizar_reports(cpf_funcionario: str, alteracoes: dict, ids=None, status_atual=None,
+                      localizacao: Optional[str] = None, categoria: Optional[int] = None) -> List[ReportAtualizado]:
+    """
+    Applies `alteracoes` (column -> value, see CAMPOS_ATUALIZAVEIS) to every
+    report matching all the filters given, recording the employee's
+    HistoricoAtualizacao rows, in one statement and one transaction. All or
+    nothing: if any selected report cannot move to the requested status,
+    nothing is written and TransicaoInvalida is raised.
+
+        atualizar_reports(cpf, {'status': 'Fechado'}, status_atual=['Resolvido'], localizacao='Centro')
+    """
+    filtros = _filtros_atualizacao(ids, status_atual, localizacao, categoria)
+    sql, params = sql_atualizacao_reports(alteracoes, filtros)
+    params['funcionario'] = cpf_funcionario
+    bloqueio = sql_bloqueio_categorias(alteracoes, filtros)
     with get_connection() as conn:
-        clear_console()
-        print("Inserindo Avaliacao")
-        id_interacao = input("Id da Interação: ").strip()
+        with conn.cursor() as cur:
+            if bloqueio:
+                executar(cur, *bloqueio)
+            try:
+                executar(cur, sql, params)
+            except psycopg2.errors.ForeignKeyViolation as e:
+                if 'funcionario' in (e.diag.constraint_name or '').lower():
+                    raise ValueError(f"Funcionário {cpf_funcionario} não encontrado") from None
+                raise
+            # Raising rolls the whole batch back
+            resultado = _reports_atualizados(alteracoes, cur.fetchall())
+    if any(r.atributos for r in resultado):
+        invalidar_cache('Report', 'HistoricoAtualizacao')
+    return resultado
+
+def atualizar_report(cpf_funcionario: str, id_report: int, **alteracoes) -> tuple:
+    """Updates one report (e.g. status='Resolvido'); returns the columns that changed."""
+    resultado = atualizar_reports(cpf_funcionario, alteracoes, ids=[id_report])
+    if not resultado:
+        raise ValueError(f"Report {id_report} não encontrado")
+    return resultado[0].atributos
+
+def inserir_usuario() -> int:
+    clear_console()
+    print("Inserindo Usuario")
+    cpf = input("CPF: ").strip()
+    nome = input("Nome: ").strip()
+    email = input("Email: ").strip()
+    data_nasc = input("Data de Nascimento (AAAA-MM-DD): ").strip()
+    role = input("Role (Cidadao/Funcionario): ").strip()
+
+    return inserir_registro('usuario', {'cpf': cpf, 'nome': nome, 'email': email,
+                                        'dataNascimento': data_nasc, 'role': role})
+
+def inserir_funcionario() -> int:
+    clear_console()
+    print("Inserindo Funcionario")
+    cpf = input("CPF: ").strip()
+    setor = input("Setor: ").strip()
+    cidade = input("Cidade: ").strip()
+
+    return inserir_registro('funcionario', {'cpf': cpf, 'setor': setor, 'cidade': cidade})
+
+def inserir_cidadao() -> int:
+    clear_console()
+    print("Inserindo Cidadao")
+    cpf = input("CPF: ").strip()
+    pontos = input("Pontos: ").strip()
+
+    return inserir_registro('cidadao', {'cpf': cpf, 'pontos': pontos})
+
+def inserir_beneficio() -> int:
+    clear_console()
+    print("Inserindo Beneficio")
+    nome = input("Nome: ").strip()
+    custo = input("Custo (Pontos): ").strip()
+    descricao = input("Descricao: ").strip()
+
+    return inserir_registro('beneficio', {'nomeBeneficio': nome, 'custo': custo, 'descricao': descricao})
+
+def inserir_interacao() -> int:
+    clear_console()
+    print("Inserindo Interacao")
+    cpf = input("CPF do Cidadão: ").strip()
+    id_report = input("ID do Report: ").strip()
+    tipo = input("Tipo (Comentario/Upvote/Avaliacao): ").strip()
+    texto = nota = comentario = None
+    if tipo == 'Comentario':
+        texto = input("Texto: ").strip()
+    elif tipo == 'Avaliacao':
         nota = input("Nota (1-5): ").strip()
-        comentario = input("Comentario: ").strip()
+        comentario = input("Comentario: ").strip() or None
 
-        cur = conn.cursor()
-        cur.execute("INSERT INTO Avaliacao (idInteracao, nota, comentario) VALUES (%s, %s, %s)",
-                    (id_interacao, nota, comentario))
-        conn.commit()
-        return cur.rowcount
+    new_id = registrar_interacao(cpf, id_report, tipo, texto, nota, comentario)
+    print(f"ID Gerado: {new_id}")
+    return new_id
 
-def inserir_report() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo Report")
-        titulo = input("Titulo: ").strip()
-        localizacao = input("Localizacao: ").strip()
-        descricao = input("Descricao: ").strip()
-        status = input("Status (Aberto/Em Análise/Resolvido/Fechado): ").strip()
-        id_categoria = input("ID Categoria: ").strip()
-        cpf_cidadao = input("CPF Cidadão: ").strip()
-        data = datetime.datetime.now()
+def inserir_comentario() -> int:
+    clear_console()
+    print("Inserindo Comentario")
+    id_interacao = input("Id da Interação: ").strip()
+    texto = input("Texto: ").strip()
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Report (titulo, localizacao, descricao, status, idCategoriaReport, cpfCidadao, dataCriacao) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING idReport
-        """, (titulo, localizacao, descricao, status, id_categoria, cpf_cidadao, data))
-        
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"ID Gerado: {new_id}")
-        return new_id
+    return inserir_registro('comentario', {'idInteracao': id_interacao, 'texto': texto})
 
-def inserir_midia() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo Midia")
-        link = input("Link: ").strip()
-        id_report = input("ID Report: ").strip()
-        data = datetime.datetime.now()
+def inserir_avaliacao() -> int:
+    clear_console()
+    print("Inserindo Avaliacao")
+    id_interacao = input("Id da Interação: ").strip()
+    nota = input("Nota (1-5): ").strip()
+    comentario = input("Comentario: ").strip()
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Midia (link, idReport, dataUpload) 
-            VALUES (%s, %s, %s) RETURNING idMidia
-        """, (link, id_report, data))
-        
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"ID Gerado: {new_id}")
-        return new_id
+    return inserir_registro('avaliacao', {'idInteracao': id_interacao, 'nota': nota,
+                                          'comentario': comentario})
 
-def inserir_categoriaReport() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo CategoriaReport")
-        nome = input("Nome: ").strip()
-        pontos = input("Pontos: ").strip()
+def inserir_report() -> int:
+    clear_console()
+    print("Inserindo Report")
+    titulo = input("Titulo: ").strip()
+    localizacao = input("Localizacao: ").strip()
+    descricao = input("Descricao: ").strip()
+    status = input("Status (Aberto/Em Análise/Resolvido/Fechado): ").strip()
+    id_categoria = input("ID Categoria: ").strip()
+    cpf_cidadao = input("CPF Cidadão: ").strip()
+    data = datetime.datetime.now()
+
+    new_id = inserir_registro('report', {'titulo': titulo, 'localizacao': localizacao,
+                                         'descricao': descricao, 'status': status,
+                                         'idCategoriaReport': id_categoria,
+                                         'cpfCidadao': cpf_cidadao, 'dataCriacao': data})
+    print(f"ID Gerado: {new_id}")
+    return new_id
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO CategoriaReport (nome, pontos) 
-            VALUES (%s, %s) RETURNING idCategoriaReport
-        """, (nome, pontos))
-        
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"ID Gerado: {new_id}")
-        return new_id
-
-@dataclass
-class HistoricoAtualizado:
-    funcionario: str
-    idReport: str
-    dataUpload: datetime.date
-    atributoAtualizado: str
+def inserir_midia() -> int:
+    clear_console()
+    print("Inserindo Midia")
+    link = input("Link: ").strip()
+    id_report = input("ID Report: ").strip()
+    data = datetime.datetime.now()
 
-def inserir_historicoAtualizado() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo HistoricoAtualizado")
-        funcionario = input("CPF Funcionario: ").strip()
-        id_report = input("idReport: ").strip()
-        atributo = input("Atributo Atualizado: ").strip()
-        data = datetime.datetime.now()
+    new_id = inserir_registro('midia', {'link': link, 'idReport': id_report, 'dataUpload': data})
+    print(f"ID Gerado: {new_id}")
+    return new_id
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO HistoricoAtualizacao (cpfFuncionario, idReport, dataHoraAtualizacao, atributoAtualizado) 
-            VALUES (%s, %s, %s, %s)
-        """, (funcionario, id_report, data, atributo))
-        conn.commit()
-        return cur.rowcount
+def inserir_categoriaReport() -> int:
+    clear_console()
+    print("Inserindo CategoriaReport")
+    nome = input("Nome: ").strip()
+    pontos = input("Pontos: ").strip()
+
+    new_id = inserir_registro('categoria', {'nome': nome, 'pontos': pontos})
+    print(f"ID Gerado: {new_id}")
+    return new_id
+
+def editar_report() -> tuple:
+    clear_console()
+    print("Atualizando Report (registra o histórico)")
+    funcionario = input("CPF Funcionario: ").strip()
+    id_report = int(input("idReport: ").strip())
+    print("Deixe em branco o que não muda.")
+    alteracoes = {}
+    status = input(f"Novo status ({'/'.join(TRANSICOES_STATUS)}): ").strip()
+    if status:
+        alteracoes['status'] = status
+    for campo in ('titulo', 'descricao', 'localizacao'):
+        valor = input(f"Novo {campo}: ").strip()
+        if valor:
+            alteracoes[campo] = valor
+
+    atributos = atualizar_report(funcionario, id_report, **alteracoes)
+    print(f"Atualizado: {', '.join(atributos)}" if atributos else "Nada mudou.")
+    return atributos
 
 def inserir_cidadaoBeneficio() -> int:
-    with get_connection() as conn:
-        clear_console()
-        print("Inserindo CidadaoBeneficio")
-        cpf = input("CPF: ").strip()
-        nome_beneficio = input("Nome do beneficio: ").strip()
-        pontos = input("Pontos Resgatados: ").strip()
-        data = datetime.datetime.now()
+    clear_console()
+    print("Resgatando Beneficio")
+    cpf = input("CPF: ").strip()
+    nome_beneficio = input("Nome do beneficio: ").strip()
+
+    saldo = resgatar_beneficio(cpf, nome_beneficio)
+    print(f"Resgate registrado. Saldo restante: {saldo} pontos")
+    return saldo
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO CidadaoBeneficio (cpfCidadao, nomeBeneficio, pontosResgatados, dataHoraResgate) 
-            VALUES (%s, %s, %s, %s)
-        """, (cpf, nome_beneficio, pontos, data))
-        conn.commit()
-        return cur.rowcount
-        
 def select_usuario(item_id: int) -> Optional[Usuario]:
     with get_connection() as conn:
         cur = conn.cursor()
@@ -384,309 +2287,487 @@ def select_usuario(item_id: int) -> Optional[Usuario]:
         row = cur.fetchone()
         return user(*row) if row else None
 
+def stream_query(sql: str, params=None, itersize: Optional[int] = None, header: bool = False,
+                 leitura: bool = False, ajustes: Optional[dict] = None):
+    """
+    Generator over the rows of `sql` using a server-side (named) cursor.
+
+    Rows are fetched from the server in batches of `itersize`, so memory
+    stays flat and the first row is available before the query finishes
+    sending. With header=True the first item yielded is the tuple of column
+    names. The pooled connection is held until the generator is exhausted
+    or closed; leitura=True lets a read replica serve it (get_connection())
+    and `ajustes` are server settings for this query only (sql_ajustes()).
+    """
+    name = f"stream_{next(_stream_ids)}"
+    with get_connection(leitura) as conn:
+        if ajustes:
+            with conn.cursor() as cur:
+                cur.execute(*sql_ajustes(ajustes))
+        with conn.cursor(name=name) as cur:
+            cur.itersize = itersize or STREAM_CONFIG['itersize']
+            cur.execute(sql, params)
+            if header:
+                # Named cursors only fill in description after the first fetch
+                first = cur.fetchone()
+                yield tuple(col[0] for col in cur.description)
+                if first is None:
+                    return
+                yield first
+            yield from cur
+
+def print_rows(rows, format_row, empty_message: Optional[str] = None,
+               page_size: Optional[int] = PAGE_SIZE) -> int:
+    """
+    Print rows as they arrive, pausing every `page_size` rows.
+    Returns how many rows were printed.
+    """
+    count = 0
+    try:
+        for row in rows:
+            print(format_row(row))
+            count += 1
+            if page_size and count % page_size == 0:
+                resp = input(f"-- {count} linhas -- ENTER para continuar, 'q' para parar: ")
+                if resp.strip().lower() == 'q':
+                    break
+    finally:
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+    if count == 0 and empty_message:
+        print(empty_message)
+    return count
+
+def iter_usuarios(itersize: Optional[int] = None):
+    """Streams every Usuario ordered by nome without materializing the table."""
+    sql = "SELECT cpf, nome, email, dataNascimento, role FROM Usuario ORDER BY nome, cpf"
+    yield from map(Usuario._make, stream_query(sql, itersize=itersize, leitura=True))
+
 def list_usuarios() -> List[Usuario]:
+    return list(iter_usuarios())
+
+def sql_pagina_usuarios(depois_de: Optional[tuple] = None, limite: int = PAGE_SIZE) -> tuple:
+    """(sql, params) of one keyset page of Usuario; see pagina_usuarios()."""
+    sql = "SELECT cpf, nome, email, dataNascimento, role FROM Usuario"
+    params: tuple = ()
+    variante = 'pagina_usuarios'
+    if depois_de is not None:
+        nome, cpf = depois_de
+        if nome is None:
+            sql += " WHERE nome IS NULL AND cpf > %s"
+            params = (cpf,)
+            variante += '_sem_nome'
+        else:
+            sql += " WHERE ((nome, cpf) > (%s, %s) OR nome IS NULL)"
+            params = (nome, cpf)
+            variante += '_depois_de'
+    sql += " ORDER BY nome, cpf LIMIT %s"
+    return declarar(variante, sql), params + (limite,)
+
+def pagina_usuarios(depois_de: Optional[tuple] = None, limite: int = PAGE_SIZE) -> List[Usuario]:
+    """
+    Keyset pagination over Usuario ordered by (nome, cpf), NULL names last.
+    Pass the (nome, cpf) of the last row seen to get the next page.
+    """
+    sql, params = sql_pagina_usuarios(depois_de, limite)
+    with get_connection(leitura=True) as conn:
+        with conn.cursor() as cur:
+            executar(cur, sql, params)
+            return registros(Usuario, cur.fetchall())
+
+# -------------------------
+# Busca textual (migração 005)
+# -------------------------
+TIPOS_BUSCA = ('todos', 'report', 'comentario')
+
+# Each table contributes its `candidatos` most recent matches, ranked; only
+# the requested page is joined back and gets a ts_headline snippet.
+BUSCA_SQL = declarar('busca', """
+WITH reports AS (
+    SELECT R.idReport AS id,
+           ts_rank(R.buscaDocumento, websearch_to_tsquery('pt_sem_acento', %(termos)s)) AS rank
+    FROM Report R
+    WHERE %(tipo)s IN ('todos', 'report')
+      AND R.buscaDocumento @@ websearch_to_tsquery('pt_sem_acento', %(termos)s)
+    ORDER BY R.idReport DESC
+    LIMIT %(candidatos)s
+),
+comentarios AS (
+    SELECT C.idInteracao AS id,
+           ts_rank(C.buscaDocumento, websearch_to_tsquery('pt_sem_acento', %(termos)s)) AS rank
+    FROM Comentario C
+    WHERE %(tipo)s IN ('todos', 'comentario')
+      AND C.buscaDocumento @@ websearch_to_tsquery('pt_sem_acento', %(termos)s)
+    ORDER BY C.idInteracao DESC
+    LIMIT %(candidatos)s
+),
+pagina AS (
+    SELECT 'report' AS tipo, id, rank FROM reports
+    UNION ALL
+    SELECT 'comentario', id, rank FROM comentarios
+    ORDER BY rank DESC, id DESC, tipo
+    LIMIT %(limite)s OFFSET %(offset)s
+)
+SELECT
+    P.tipo,
+    R.idReport,
+    I.idInteracao,
+    R.titulo,
+    ts_headline('pt_sem_acento',
+                CASE WHEN P.tipo = 'report' THEN R.titulo || ' — ' || COALESCE(R.descricao, '')
+                     ELSE C.texto END,
+                websearch_to_tsquery('pt_sem_acento', %(termos)s),
+                %(headline)s) AS trecho,
+    ROUND(P.rank::numeric, 4) AS rank,
+    COALESCE(I.dataHora, R.dataCriacao) AS data
+FROM pagina P
+LEFT JOIN Comentario C ON P.tipo = 'comentario' AND C.idInteracao = P.id
+LEFT JOIN Interacao I ON I.idInteracao = C.idInteracao
+JOIN Report R ON R.idReport = COALESCE(I.idReport, P.id)
+ORDER BY P.rank DESC, P.id DESC, P.tipo;
+""")
+
+def sql_busca(termos: str, pagina: int = 1, por_pagina: int = PAGE_SIZE,
+              tipo: str = 'todos', extra: int = 0) -> tuple:
+    """(sql, params) of one page of buscar() results, plus `extra` rows past it."""
+    if not termos or not termos.strip():
+        raise ValueError("Informe os termos da busca")
+    if tipo not in TIPOS_BUSCA:
+        raise ValueError(f"Tipo de busca inválido: {tipo} (use {', '.join(TIPOS_BUSCA)})")
+    if pagina < 1 or por_pagina < 1:
+        raise ValueError("pagina e por_pagina devem ser positivos")
+    if extra < 0:
+        raise ValueError("extra não pode ser negativo")
+    return BUSCA_SQL, {
+        'termos': termos,
+        'tipo': tipo,
+        'candidatos': BUSCA_CONFIG['max_candidatos'],
+        'limite': por_pagina + extra,
+        'offset': (pagina - 1) * por_pagina,
+        'headline': BUSCA_CONFIG['headline'],
+    }
+
+def buscar(termos: str, pagina: int = 1, por_pagina: int = PAGE_SIZE,
+           tipo: str = 'todos', extra: int = 0) -> List[ResultadoBusca]:
+    """
+    Full-text search over report titles/descriptions and comment texts.
+
+    `termos` uses web search syntax ("frase exata", -excluir, or), accents
+    and case are ignored. Hits are ordered by ts_rank (titles weigh more
+    than descriptions) and paginated; `tipo` restricts to 'report' or
+    'comentario'. Terms matching more than BUSCA_CONFIG['max_candidatos']
+    rows in a table are ranked among its most recent matches. `extra` rows
+    past the page are also returned (extra=1 tells whether there is a next
+    page) without shifting the page offsets.
+    """
+    sql, params = sql_busca(termos, pagina, por_pagina, tipo, extra)
+    with get_connection(leitura=True) as conn:
+        with conn.cursor() as cur:
+            executar(cur, sql, params)
+            return registros(ResultadoBusca, cur.fetchall())
+
+# -------------------------
+# Registros x catálogo
+# -------------------------
+COLUNAS_CATALOGO_SQL = """
+SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull,
+       t.typtype, a.attgenerated <> ''
+FROM pg_attribute a
+JOIN pg_class c ON c.oid = a.attrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_type t ON t.oid = a.atttypid
+WHERE n.nspname = current_schema()
+  AND c.relname = ANY(%s)
+  AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum
+"""
+
+# PostgreSQL type (without modifiers) -> annotation of the record field
+TIPOS_PYTHON = {
+    'integer': 'int', 'bigint': 'int', 'smallint': 'int', 'boolean': 'bool',
+    'numeric': 'decimal.Decimal', 'double precision': 'float', 'real': 'float',
+    'date': 'datetime.date', 'timestamp with time zone': 'datetime.datetime',
+    'timestamp without time zone': 'datetime.datetime',
+}
+
+def colunas_catalogo(tabelas=None) -> dict:
+    """{Tabela: [(coluna, tipo, not null, enum, gerada)]} of the given tables (default: REGISTROS) as in the live schema."""
+    tabelas = list(tabelas or REGISTROS)
+    por_nome = {t.lower(): t for t in tabelas}
+    colunas = {t: [] for t in tabelas}
     with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM Usuario ORDER BY nome")
-        rows = cur.fetchall()
-        return [Usuario(*r) for r in rows]
+        with conn.cursor() as cur:
+            cur.execute(COLUNAS_CATALOGO_SQL, (list(por_nome),))
+            for tabela, coluna, tipo, not_null, typtype, gerada in cur.fetchall():
+                colunas[por_nome[tabela]].append((coluna, tipo, not_null, typtype == 'e', gerada))
+    return colunas
 
-def consultar_total_interacoes():
+def _anotacao(tipo: str, not_null: bool, enum: bool) -> str:
+    anotacao = 'str' if enum else TIPOS_PYTHON.get(re.sub(r'\(.*\)', '', tipo), 'str')
+    return anotacao if not_null else f'Optional[{anotacao}]'
+
+def gerar_registros(tabelas=None) -> str:
     """
-    Consulta 1: Total de interações por Report.
+    Python source of one NamedTuple per table, generated from the live
+    catalog (every stored, non-generated column, in table order). Column
+    names come back lowercased; known records keep their field spelling.
     """
-    sql = """
+    blocos = []
+    for tabela, colunas in colunas_catalogo(tabelas).items():
+        existentes = {f.lower(): f for f in REGISTROS[tabela]._fields} if tabela in REGISTROS else {}
+        linhas = [f"class {tabela}(NamedTuple):"]
+        for coluna, tipo, not_null, enum, gerada in colunas:
+            if not gerada:
+                linhas.append(f"    {existentes.get(coluna, coluna)}: {_anotacao(tipo, not_null, enum)}")
+        blocos.append('\n'.join(linhas))
+    return '\n\n'.join(blocos) + '\n'
+
+def conferir_registros() -> list:
+    """
+    Differences between each record in REGISTROS and its table: the record's
+    fields must be the table's first columns, in order (later columns come
+    from numbered migrations and are optional). Empty when they match.
+    """
+    problemas = []
+    for tabela, colunas in colunas_catalogo().items():
+        campos = REGISTROS[tabela]._fields
+        nomes = [c[0] for c in colunas]
+        if not nomes:
+            problemas.append(f"{tabela}: tabela não encontrada")
+        elif [f.lower() for f in campos] != nomes[:len(campos)]:
+            problemas.append(f"{tabela}: registro ({', '.join(campos)}) != colunas "
+                             f"({', '.join(nomes[:max(len(campos), 1)])})")
+    return problemas
+
+# -------------------------
+# Consultas (relatórios)
+# -------------------------
+CONSULTAS = {
+    # Consulta 1: Total de interações por Report.
+    # Lê ResumoInteracoesReport (migração 003), mantido por trigger.
+    'total_interacoes': """
     SELECT
         R.idReport,
         R.titulo,
         R.status,
         CR.nome AS Categoria,
-        COUNT(I.idInteracao) AS TotalInteracoes
+        COALESCE(RI.totalInteracoes, 0) AS TotalInteracoes
     FROM
         Report R
     INNER JOIN
         CategoriaReport CR ON R.idCategoriaReport = CR.idCategoriaReport
-    LEFT JOIN
-        Interacao I ON R.idReport = I.idReport
-    GROUP BY
-        R.idReport, R.titulo, R.status, CR.nome
+    LEFT JOIN -- Reports sem interação não têm linha no resumo
+        ResumoInteracoesReport RI ON R.idReport = RI.idReport
     ORDER BY
         TotalInteracoes DESC, R.idReport;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Total de Interações por Report ===")
-                print(f"{'ID':<5} | {'Título':<35} | {'Status':<12} | {'Categoria':<20} | {'Total':<5}")
-                print("-" * 90)
-                
-                for row in rows:
-                    titulo = (row[1][:32] + '..') if len(row[1]) > 32 else row[1]
-                    print(f"{row[0]:<5} | {titulo:<35} | {row[2]:<12} | {row[3]:<20} | {row[4]:<5}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
-
-def consultar_reports_por_funcionario():
-    """
-    Consulta 2: Total de Reports atualizados por Funcionário.
-    """
-    sql = """
+    """,
+
+    # Consulta 2: Total de Reports atualizados por Funcionário.
+    # Agrupa por (nome, setor), como a consulta original. Lê ResumoFuncionario
+    # (migração 003, reports distintos por funcionário); só grupos com mais de
+    # um funcionário (homônimos no mesmo setor) contam os reports distintos em
+    # ResumoFuncionarioReport, para não somar duas vezes um report comum.
+    'reports_por_funcionario': """
     SELECT
         U.nome AS NomeFuncionario,
         F.setor,
-        COUNT(DISTINCT HA.idReport) AS ReportsAtualizados
+        CASE WHEN COUNT(*) = 1 THEN COALESCE(MAX(RF.reportsAtualizados), 0)
+             ELSE (SELECT COUNT(DISTINCT RFR.idReport)
+                   FROM ResumoFuncionarioReport RFR
+                   WHERE RFR.cpfFuncionario = ANY (ARRAY_AGG(F.cpf))
+                     AND RFR.totalAtualizacoes > 0)
+        END AS ReportsAtualizados
     FROM
         Funcionario F
     INNER JOIN
         Usuario U ON F.cpf = U.cpf
     LEFT JOIN -- LEFT JOIN para incluir funcionários sem atualizações
-        HistoricoAtualizacao HA ON F.cpf = HA.cpfFuncionario
+        ResumoFuncionario RF ON F.cpf = RF.cpfFuncionario
     GROUP BY
-        U.nome, F.setor
+        F.setor, U.nome
     ORDER BY
         ReportsAtualizados DESC, U.nome;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Produtividade dos Funcionários ===")
-                print(f"{'Nome':<35} | {'Setor':<30} | {'Qtd Atualizada':<15}")
-                print("-" * 85)
-                
-                for row in rows:
-                    nome = (row[0][:32] + '..') if len(row[0]) > 32 else row[0]
-                    setor = (row[1][:27] + '..') if row[1] and len(row[1]) > 27 else (row[1] or "N/A")
-                    qtd = row[2]
-                    
-                    print(f"{nome:<35} | {setor:<30} | {qtd:<15}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
+    """,
 
-def consultar_media_avaliacoes():
-    """
-    Consulta 3: Média de avaliações por Categoria (apenas Resolvidos e Média > 4.0).
-    """
-    sql = """
+    # Consulta 3: Média de avaliações por Categoria (apenas Resolvidos e Média > 4.0).
+    # Lê ResumoAvaliacaoCategoria (migração 003): soma/quantidade de notas
+    # de reports 'Resolvido', ajustada também quando o status muda.
+    'media_avaliacoes': """
     SELECT
         CR.nome AS Categoria,
-        ROUND(AVG(A.nota), 2) AS NotaMedia
+        ROUND(RC.somaNotas::numeric / RC.qtdAvaliacoes, 2) AS NotaMedia
     FROM
-        CategoriaReport CR
+        ResumoAvaliacaoCategoria RC
     INNER JOIN
-        Report R ON CR.idCategoriaReport = R.idCategoriaReport
-    INNER JOIN
-        Interacao I ON R.idReport = I.idReport
-    INNER JOIN
-        Avaliacao A ON I.idInteracao = A.idInteracao
+        CategoriaReport CR ON RC.idCategoriaReport = CR.idCategoriaReport
     WHERE
-        R.status = 'Resolvido'
-    GROUP BY
-        CR.nome
-    HAVING
-        AVG(A.nota) > 4.0
+        RC.qtdAvaliacoes > 0
+        AND RC.somaNotas > 4.0 * RC.qtdAvaliacoes -- AVG(nota) > 4.0
     ORDER BY
         NotaMedia DESC;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Qualidade dos Serviços (Resolvidos > 4.0) ===")
-                print(f"{'Categoria':<35} | {'Nota Média':<10}")
-                print("-" * 50)
-                
-                if not rows:
-                    print("Nenhuma categoria atingiu os critérios (Resolvido & Média > 4.0).")
-                else:
-                    for row in rows:
-                        categoria = row[0]
-                        media = float(row[1]) 
-                        print(f"{categoria:<35} | {media:<10.2f}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
-
-def consultar_funcionarios_todos_categorias():
-    """
-    Consulta 4: Funcionários que atualizaram Reports de TODAS as Categorias (Divisão Relacional).
-    """
-    sql = """
+    """,
+
+    # Consulta 4: Funcionários que atualizaram Reports de TODAS as Categorias (Divisão Relacional).
+    # Divisão por contagem sobre CoberturaFuncionarioCategoria (migração
+    # 009): categorias cobertas por funcionário contra o total de
+    # categorias, sem ler o histórico. min_percentual < 100 inclui quem
+    # cobre ao menos essa fração das categorias.
+    'funcionarios_todos_categorias': """
+    WITH total AS (
+        SELECT COUNT(*) AS categorias FROM CategoriaReport
+    ), cobertura AS (
+        SELECT cpfFuncionario, COUNT(*) AS categorias
+        FROM CoberturaFuncionarioCategoria
+        GROUP BY cpfFuncionario
+    )
     SELECT
         U.cpf,
-        U.nome
+        U.nome,
+        COALESCE(C.categorias, 0) AS CategoriasCobertas,
+        T.categorias AS TotalCategorias,
+        COALESCE(ROUND(100.0 * COALESCE(C.categorias, 0) / NULLIF(T.categorias, 0), 1), 100) AS PercentualCobertura
     FROM
         Funcionario F
     INNER JOIN
         Usuario U ON F.cpf = U.cpf
+    CROSS JOIN
+        total T
+    LEFT JOIN
+        cobertura C ON C.cpfFuncionario = F.cpf
     WHERE
-        NOT EXISTS ( -- NÃO EXISTE
-            SELECT CR.idCategoriaReport -- UMA categoria
-            FROM CategoriaReport CR
-            EXCEPT -- QUE NÃO ESTEJA
-            SELECT R.idCategoriaReport
-            FROM HistoricoAtualizacao HA
-            INNER JOIN Report R ON HA.idReport = R.idReport
-            WHERE HA.cpfFuncionario = F.cpf -- Nas categorias que este funcionário já mexeu
-        )
+        100 * COALESCE(C.categorias, 0) >= %(min_percentual)s::numeric * T.categorias
     ORDER BY
-        U.nome;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Funcionários 'Expert' (Todas as Categorias) ===")
-                print(f"{'CPF':<15} | {'Nome':<35}")
-                print("-" * 55)
-                
-                if not rows:
-                    print("Nenhum funcionário atualizou reports de TODAS as categorias ainda.")
-                else:
-                    for row in rows:
-                        print(f"{row[0]:<15} | {row[1]:<35}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
-
-def consultar_reports_criticos():
-    """
-    Consulta 5: Reports Críticos (2+ interações e sem atualização há > 2 dias).
-    """    
-    sql = """
+        CategoriasCobertas DESC, U.nome;
+    """,
+
+    # Consulta 5: Reports Críticos (min_interacoes+ interações e sem
+    # atualização de funcionário há mais de `dias` dias; dias NULL desliga
+    # a regra). A contagem vem de ResumoInteracoesReport (migração 003) e a
+    # última atualização de Report.ultimaAtualizacao (migração 008): nenhuma
+    # leitura de Interacao ou HistoricoAtualizacao. Report nunca atualizado
+    # conta desde a criação.
+    'reports_criticos': """
     SELECT
         R.idReport,
         R.titulo,
         R.dataCriacao,
-        COUNT(I.idInteracao) AS TotalInteracoes,
-        (SELECT MAX(dataHoraAtualizacao) FROM HistoricoAtualizacao WHERE idReport = R.idReport) AS UltimaAtualizacaoFuncionario
+        RI.totalInteracoes AS TotalInteracoes,
+        R.ultimaAtualizacao AS UltimaAtualizacaoFuncionario
     FROM
         Report R
     INNER JOIN
-        Interacao I ON R.idReport = I.idReport
+        ResumoInteracoesReport RI ON R.idReport = RI.idReport
     WHERE
         R.status IN ('Aberto', 'Em Análise')
-    GROUP BY
-        R.idReport, R.titulo, R.dataCriacao
-    HAVING
-        COUNT(I.idInteracao) >= 2
-        -- Para teste imediato, vou comentar a regra de 2 dias para você ver o report aparecer pela contagem de interações
-        -- AND (NOW() - (SELECT MAX(dataHoraAtualizacao) FROM HistoricoAtualizacao WHERE idReport = R.idReport)) > INTERVAL '2 days'
+        AND RI.totalInteracoes >= %(min_interacoes)s
+        AND (%(dias)s::int IS NULL
+             OR COALESCE(R.ultimaAtualizacao, R.dataCriacao) < NOW() - make_interval(days => %(dias)s::int))
     ORDER BY
-        TotalInteracoes DESC;
-    """
-        
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Reports Críticos (Alta Interação) ===")
-                print(f"{'ID':<5} | {'Título':<35} | {'Interações':<10}")
-                print("-" * 60)
-                
-                if not rows:
-                    print("Nenhum report crítico encontrado no momento.")
-                else:
-                    for row in rows:
-                        titulo = (row[1][:32] + '..') if len(row[1]) > 32 else row[1]
-                        print(f"{row[0]:<5} | {titulo:<35} | {row[3]:<10}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
-
-def consultar_areas_problematicas():
-    """
-    Consulta 6: Áreas com maior concentração de problemas ativos (Hotspots).
-    Baseado na imagem enviada.
-    """
-    sql = """
+        TotalInteracoes DESC, R.idReport;
+    """,
+
+    # Consulta 6: Hotspots de reports ativos (migração 004).
+    # Soma os reports ativos por célula de 0,001° (ResumoHotspot, ou os
+    # reports da janela quando dias é informado) em células de ~raio_m
+    # metros, junta cada célula às 8 vizinhas e mantém só os picos locais.
+    # Reports ainda sem coordenadas são agrupados pelo endereço normalizado.
+    'areas_problematicas': """
+    WITH celulas AS (
+        SELECT celulaLat, celulaLon, total::bigint AS total,
+               somaLatitude, somaLongitude, somaCriacao
+        FROM ResumoHotspot
+        WHERE %(dias)s::int IS NULL
+        UNION ALL
+        SELECT celulaLat, celulaLon, COUNT(*), SUM(latitude), SUM(longitude),
+               SUM(EXTRACT(EPOCH FROM dataCriacao))::double precision
+        FROM Report
+        WHERE %(dias)s::int IS NOT NULL
+          AND status IN ('Aberto', 'Em Análise')
+          AND latitude IS NOT NULL
+          AND dataCriacao >= NOW() - make_interval(days => %(dias)s::int)
+        GROUP BY celulaLat, celulaLon
+    ),
+    grade AS (
+        SELECT
+            floor(C.celulaLat / P.k)::int AS gy,
+            floor(C.celulaLon / P.k)::int AS gx,
+            P.k,
+            SUM(C.total) AS total,
+            SUM(C.somaLatitude) AS somaLat,
+            SUM(C.somaLongitude) AS somaLon,
+            SUM(C.somaCriacao) AS somaCriacao
+        FROM
+            celulas C,
+            (SELECT GREATEST(1, round(%(raio_m)s / 111.32))::double precision AS k) P
+        GROUP BY 1, 2, 3
+    ),
+    vizinhos AS (
+        SELECT dy, dx FROM generate_series(-1, 1) dy, generate_series(-1, 1) dx
+    ),
+    agrupado AS (
+        SELECT
+            G.gy, G.gx, G.k,
+            SUM(N.total) AS total,
+            SUM(N.somaLat) / SUM(N.total) AS latitude,
+            SUM(N.somaLon) / SUM(N.total) AS longitude,
+            SUM(N.somaCriacao) / SUM(N.total) AS criacaoMedia
+        FROM grade G
+        CROSS JOIN vizinhos V
+        JOIN grade N ON N.gy = G.gy + V.dy AND N.gx = G.gx + V.dx
+        GROUP BY G.gy, G.gx, G.k
+    ),
+    picos AS (
+        SELECT A.*
+        FROM agrupado A
+        CROSS JOIN vizinhos V
+        JOIN agrupado B ON B.gy = A.gy + V.dy AND B.gx = A.gx + V.dx
+        GROUP BY A.gy, A.gx, A.k, A.total, A.latitude, A.longitude, A.criacaoMedia
+        HAVING A.total > 1 AND bool_and((B.total, B.gy, B.gx) <= (A.total, A.gy, A.gx))
+    ),
+    hotspots AS (
+        SELECT gy, gx, k, NULL AS localizacao, latitude, longitude, total, criacaoMedia
+        FROM picos
+        UNION ALL
+        SELECT NULL, NULL, NULL, MIN(R.localizacao), NULL, NULL, COUNT(*),
+               AVG(EXTRACT(EPOCH FROM R.dataCriacao))
+        FROM Report R
+        WHERE
+            R.status IN ('Aberto', 'Em Análise')
+            AND R.latitude IS NULL
+            AND (%(dias)s::int IS NULL OR R.dataCriacao >= NOW() - make_interval(days => %(dias)s::int))
+        GROUP BY R.localizacaoNormalizada
+        HAVING COUNT(*) > 1
+    ),
+    topo AS (
+        SELECT
+            H.*,
+            ROUND(((EXTRACT(EPOCH FROM NOW()) - H.criacaoMedia) / 3600)::numeric, 2) AS MediaHorasAberto
+        FROM hotspots H
+        ORDER BY H.total DESC, MediaHorasAberto DESC
+        LIMIT %(limite)s
+    )
     SELECT
-        R.localizacao,
-        COUNT(R.idReport) AS TotalReportsAtivos,
-        ROUND(AVG(EXTRACT(EPOCH FROM NOW() - R.dataCriacao) / 3600), 2) AS MediaHorasAberto
-    FROM
-        Report R
-    WHERE
-        R.status IN ('Aberto', 'Em Análise')
-    GROUP BY
-        R.localizacao
-    HAVING
-        COUNT(R.idReport) > 1
-    ORDER BY
-        TotalReportsAtivos DESC, MediaHorasAberto DESC
-    LIMIT 5;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Áreas com Concentração de Problemas (Hotspots) ===")
-                print(f"{'Localização':<40} | {'Qtd Ativos':<10} | {'Média Horas':<12}")
-                print("-" * 70)
-                
-                if not rows:
-                    print("Nenhuma localização com múltiplos problemas ativos encontrada.")
-                else:
-                    for row in rows:
-                        loc = (row[0][:37] + '..') if len(row[0]) > 37 else row[0]
-                        qtd = row[1]
-                        # O PostgreSQL retorna Decimal, convertemos para float
-                        horas = float(row[2])
-                        print(f"{loc:<40} | {qtd:<10} | {horas:<12.2f}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
-
-def consultar_comentarios_recentes():
-    """
-    Consulta 7: Lista os 10 comentários mais recentes em reports ativos.
-    CORRIGIDO: Trata usuários com nome NULL.
-    """
-    sql = """
+        -- Endereço mais frequente na célula central do pico
+        COALESCE(T.localizacao, (
+            SELECT MIN(R.localizacao)
+            FROM Report R
+            WHERE R.status IN ('Aberto', 'Em Análise')
+              AND R.celulaLat BETWEEN (T.gy * T.k)::int AND ((T.gy + 1) * T.k)::int - 1
+              AND R.celulaLon BETWEEN (T.gx * T.k)::int AND ((T.gx + 1) * T.k)::int - 1
+            GROUP BY R.localizacaoNormalizada
+            ORDER BY COUNT(*) DESC, R.localizacaoNormalizada
+            LIMIT 1)) AS localizacao,
+        ROUND(T.latitude::numeric, 5) AS latitude,
+        ROUND(T.longitude::numeric, 5) AS longitude,
+        T.total::bigint AS TotalReportsAtivos,
+        T.MediaHorasAberto
+    FROM topo T
+    ORDER BY TotalReportsAtivos DESC, MediaHorasAberto DESC;
+    """,
+
+    # Consulta 7: Os 10 comentários mais recentes em reports ativos.
+    'comentarios_recentes': """
     SELECT
         R.idReport,
         R.titulo AS TituloReport,
@@ -705,43 +2786,424 @@ def consultar_comentarios_recentes():
         R.status IN ('Aberto', 'Em Análise')
     ORDER BY
         I.dataHora DESC
-    LIMIT 10;
-    """
-    
-    with get_connection() as conn:
+    LIMIT %(limite)s;
+    """,
+}
+
+# Default parameters of the parameterized reports
+PARAMETROS_CONSULTAS = {
+    'funcionarios_todos_categorias': {'min_percentual': 100},
+    'reports_criticos': {'dias': 2, 'min_interacoes': 2},
+    'areas_problematicas': {'limite': 5, 'raio_m': 200, 'dias': None},
+    'comentarios_recentes': {'limite': 10},
+}
+
+def parametros_consulta(nome: str, params: Optional[dict] = None) -> Optional[dict]:
+    """Defaults of report `nome` overridden by `params`; None for reports without parameters."""
+    padrao = PARAMETROS_CONSULTAS.get(nome)
+    if padrao is None:
+        if params:
+            raise ValueError(f"A consulta {nome} não aceita parâmetros")
+        return None
+    desconhecidos = set(params or ()) - set(padrao)
+    if desconhecidos:
+        raise ValueError(f"Parâmetros inválidos para {nome}: {', '.join(sorted(desconhecidos))}")
+    return {**padrao, **(params or {})}
+
+# Tables read by each report (including the summary tables' sources);
+# a write to any of them invalidates the cached result.
+DEPENDENCIAS_CONSULTAS = {
+    'total_interacoes': ('Report', 'CategoriaReport', 'Interacao'),
+    'reports_por_funcionario': ('Funcionario', 'Usuario', 'HistoricoAtualizacao'),
+    'media_avaliacoes': ('CategoriaReport', 'Report', 'Interacao', 'Avaliacao'),
+    'funcionarios_todos_categorias': ('Funcionario', 'Usuario', 'CategoriaReport',
+                                      'HistoricoAtualizacao', 'Report'),
+    'reports_criticos': ('Report', 'Interacao', 'HistoricoAtualizacao'),
+    'areas_problematicas': ('Report',),
+    'comentarios_recentes': ('Interacao', 'Comentario', 'Report', 'Usuario'),
+}
+
+# Report titles, as in the interactive menu (handle_view)
+TITULOS_CONSULTAS = {
+    'total_interacoes': 'Total de Interações por Report',
+    'reports_por_funcionario': 'Reports por Funcionário',
+    'media_avaliacoes': 'Média de Avaliações (Alta Performance)',
+    'funcionarios_todos_categorias': 'Funcionários Expert (Todas Categorias)',
+    'reports_criticos': 'Reports Críticos (Alta Relevância)',
+    'areas_problematicas': 'Hotspots (Áreas com Problemas Recorrentes)',
+    'comentarios_recentes': 'Últimos Comentários',
+}
+
+# Reports with small results (one row per employee/category, or a LIMIT):
+# fetched at once through a prepared statement instead of a streaming
+# cursor, since DECLARE ... CURSOR cannot run a prepared statement
+CONSULTAS_PREPARADAS = {
+    nome: declarar(f'consulta_{nome}', CONSULTAS[nome])
+    for nome in ('reports_por_funcionario', 'media_avaliacoes', 'funcionarios_todos_categorias',
+                 'areas_problematicas', 'comentarios_recentes')
+}
+
+def linhas_preparadas(sql: str, params=None, header: bool = False, leitura: bool = False,
+                      ajustes: Optional[dict] = None):
+    """stream_query() counterpart for small results: one fetch, executed by name when `sql` is declared."""
+    with get_connection(leitura) as conn:
         with conn.cursor() as cur:
-            try:
-                cur.execute(sql)
-                rows = cur.fetchall()
-                
-                clear_console()
-                print("\n=== Relatório: Últimos Comentários (Reports Ativos) ===")
-                print(f"{'ID':<4} | {'Report':<25} | {'Cidadão':<20} | {'Comentário':<30}")
-                print("-" * 90)
-                
-                if not rows:
-                    print("Nenhum comentário recente encontrado em reports ativos.")
-                else:
-                    for row in rows:
-                        id_rep = row[0]
-                        
-                        # Tratamento seguro para strings (evita erro NoneType)
-                        titulo_raw = row[1] or "Sem Título"
-                        nome_raw = row[2] or "Anônimo" # <--- AQUI ESTAVA O ERRO
-                        texto_raw = row[3] or ""
-                        
-                        titulo = (titulo_raw[:22] + '..') if len(titulo_raw) > 22 else titulo_raw
-                        cidadao = (nome_raw[:17] + '..') if len(nome_raw) > 17 else nome_raw
-                        texto = (texto_raw[:27] + '..') if len(texto_raw) > 27 else texto_raw
-                        
-                        print(f"{id_rep:<4} | {titulo:<25} | {cidadao:<20} | {texto:<30}")
-                
-                input("\nPressione ENTER para voltar...")
-                
-            except Exception as e:
-                print(f"Erro ao executar consulta: {e}")
-                input("Pressione ENTER para continuar...")
-                
+            if ajustes:
+                cur.execute(*sql_ajustes(ajustes))
+            executar(cur, sql, params)
+            columns = tuple(col[0] for col in cur.description)
+            rows = cur.fetchall()
+    if header:
+        yield columns
+    yield from rows
+
+# CONSULTAS_CONFIG keys that are not server settings
+OPCOES_CONSULTA = ('itersize', 'ttl')
+
+def config_consulta(nome: str) -> dict:
+    """Tuning of report `nome`: its CONSULTAS_CONFIG entry over the 'padrao' one."""
+    return dict(CONSULTAS_CONFIG.get('padrao', {}), **CONSULTAS_CONFIG.get(nome, {}))
+
+def ajustes_consulta(nome: str) -> dict:
+    """Server settings (e.g. work_mem, statement_timeout) to SET LOCAL around report `nome`."""
+    return {k: v for k, v in config_consulta(nome).items() if k not in OPCOES_CONSULTA and v is not None}
+
+def sql_ajustes(ajustes: dict, restaurar=()) -> tuple:
+    """
+    (sql, params) applying `ajustes` to the current transaction only, like
+    SET LOCAL, in one statement; settings in `restaurar` go back to the
+    session's value.
+    """
+    chamadas = ["set_config(%s, %s, true)"] * len(ajustes)
+    chamadas += ["set_config(%s, (SELECT reset_val FROM pg_settings WHERE name = %s), true)"] * len(restaurar)
+    params = [x for k, v in ajustes.items() for x in (k, str(v))]
+    params += [x for k in restaurar for x in (k, k)]
+    return "SELECT " + ", ".join(chamadas), params
+
+def linhas_consulta(nome: str, params: Optional[dict] = None, itersize: Optional[int] = None,
+                    header: bool = False):
+    """
+    Uncached rows of report `nome` (params already defaulted), prepared or
+    streamed, replica first, with its CONSULTAS_CONFIG settings.
+    """
+    ajustes = ajustes_consulta(nome)
+    if nome in CONSULTAS_PREPARADAS:
+        return linhas_preparadas(CONSULTAS[nome], params, header, leitura=True, ajustes=ajustes)
+    itersize = itersize or config_consulta(nome).get('itersize')
+    return stream_query(CONSULTAS[nome], params, itersize, header, leitura=True, ajustes=ajustes)
+
+def chave_cache(nome: str, params: Optional[dict]) -> tuple:
+    """Result-cache key of report `nome` with the (already defaulted) `params`."""
+    return (nome, tuple(sorted(params.items())) if params else None)
+
+def consulta_rows(nome: str, params: Optional[dict] = None, itersize: Optional[int] = None,
+                  header: bool = False):
+    """
+    Rows of the report `nome`, served from the result cache when possible.
+
+    On a miss the query is streamed (stream_query) and, if it was read to
+    the end and fits in CACHE_CONFIG['max_rows'], stored for later calls.
+    With header=True the first item yielded is the tuple of column names.
+    """
+    params = parametros_consulta(nome, params)
+    key = chave_cache(nome, params)
+    cached = _cache.get(key)
+    if cached is not None:
+        yield from (cached if header else itertools.islice(cached, 1, None))
+        return
+    tabelas = DEPENDENCIAS_CONSULTAS[nome]
+    versions = _cache.versions(tabelas)
+    rows = linhas_consulta(nome, params, itersize, header=True)
+    columns = next(rows)
+    if header:
+        yield columns
+    buffer = [columns]
+    for row in rows:
+        if buffer is not None:
+            buffer.append(row)
+            if len(buffer) > _cache.max_rows:
+                buffer = None
+        yield row
+    if buffer is not None:
+        _cache.put(key, tuple(buffer), tabelas, versions, config_consulta(nome).get('ttl'))
+
+def consultar_total_interacoes():
+    """
+    Consulta 1: Total de interações por Report.
+    Sem LIMIT: as linhas são exibidas em páginas conforme chegam do servidor.
+    """
+    def fmt(row):
+        titulo = (row[1][:32] + '..') if len(row[1]) > 32 else row[1]
+        return f"{row[0]:<5} | {titulo:<35} | {row[2]:<12} | {row[3]:<20} | {row[4]:<5}"
+
+    try:
+        rows = consulta_rows('total_interacoes')
+        clear_console()
+        print("\n=== Relatório: Total de Interações por Report ===")
+        print(f"{'ID':<5} | {'Título':<35} | {'Status':<12} | {'Categoria':<20} | {'Total':<5}")
+        print("-" * 90)
+        print_rows(rows, fmt)
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+def consultar_reports_por_funcionario():
+    """
+    Consulta 2: Total de Reports atualizados por Funcionário.
+    """
+    def fmt(row):
+        nome = (row[0][:32] + '..') if len(row[0]) > 32 else row[0]
+        setor = (row[1][:27] + '..') if row[1] and len(row[1]) > 27 else (row[1] or "N/A")
+        qtd = row[2]
+        return f"{nome:<35} | {setor:<30} | {qtd:<15}"
+
+    try:
+        rows = consulta_rows('reports_por_funcionario')
+        clear_console()
+        print("\n=== Relatório: Produtividade dos Funcionários ===")
+        print(f"{'Nome':<35} | {'Setor':<30} | {'Qtd Atualizada':<15}")
+        print("-" * 85)
+        print_rows(rows, fmt)
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+def consultar_media_avaliacoes():
+    """
+    Consulta 3: Média de avaliações por Categoria (apenas Resolvidos e Média > 4.0).
+    """
+    def fmt(row):
+        categoria = row[0]
+        media = float(row[1])
+        return f"{categoria:<35} | {media:<10.2f}"
+
+    try:
+        rows = consulta_rows('media_avaliacoes')
+        clear_console()
+        print("\n=== Relatório: Qualidade dos Serviços (Resolvidos > 4.0) ===")
+        print(f"{'Categoria':<35} | {'Nota Média':<10}")
+        print("-" * 50)
+        print_rows(rows, fmt, "Nenhuma categoria atingiu os critérios (Resolvido & Média > 4.0).")
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+def consultar_funcionarios_todos_categorias():
+    """
+    Consulta 4: Funcionários que atualizaram Reports de TODAS as Categorias (Divisão Relacional).
+    """
+    try:
+        rows = consulta_rows('funcionarios_todos_categorias')
+        clear_console()
+        print("\n=== Relatório: Funcionários 'Expert' (Todas as Categorias) ===")
+        print(f"{'CPF':<15} | {'Nome':<35} | {'Categorias':<10}")
+        print("-" * 68)
+        print_rows(rows, lambda row: f"{row[0]:<15} | {row[1] or 'Sem nome':<35} | {row[2]}/{row[3]}",
+                   "Nenhum funcionário atualizou reports de TODAS as categorias ainda.")
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+def consultar_reports_criticos():
+    """
+    Consulta 5: Reports Críticos (2+ interações e sem atualização há > 2 dias).
+    Os limites vêm de PARAMETROS_CONSULTAS['reports_criticos'].
+    """
+    def fmt(row):
+        titulo = (row[1][:32] + '..') if len(row[1]) > 32 else row[1]
+        ultima = row[4].strftime('%d/%m/%Y %H:%M') if row[4] else "nunca"
+        return f"{row[0]:<5} | {titulo:<35} | {row[3]:<10} | {ultima:<16}"
+
+    try:
+        params = parametros_consulta('reports_criticos')
+        rows = consulta_rows('reports_criticos')
+        clear_console()
+        if params['dias'] is None:
+            print(f"\n=== Relatório: Reports Críticos ({params['min_interacoes']}+ interações, "
+                  f"regra de atualização desativada) ===")
+        else:
+            print(f"\n=== Relatório: Reports Críticos ({params['min_interacoes']}+ interações, "
+                  f"sem atualização há mais de {params['dias']} dias) ===")
+        print(f"{'ID':<5} | {'Título':<35} | {'Interações':<10} | {'Última atualiz.':<16}")
+        print("-" * 79)
+        print_rows(rows, fmt, "Nenhum report crítico encontrado no momento.")
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+def consultar_areas_problematicas():
+    """
+    Consulta 6: Áreas com maior concentração de problemas ativos (Hotspots).
+    Reports ativos a até ~raio_m metros uns dos outros formam um hotspot.
+    """
+    def fmt(row):
+        loc = (row[0][:37] + '..') if len(row[0]) > 37 else row[0]
+        coords = f"{row[1]:.5f}, {row[2]:.5f}" if row[1] is not None else "(sem coordenadas)"
+        qtd = row[3]
+        # O PostgreSQL retorna Decimal, convertemos para float
+        horas = float(row[4])
+        return f"{loc:<40} | {coords:<22} | {qtd:<10} | {horas:<12.2f}"
+
+    try:
+        rows = consulta_rows('areas_problematicas')
+        clear_console()
+        print("\n=== Relatório: Áreas com Concentração de Problemas (Hotspots) ===")
+        print(f"{'Localização':<40} | {'Centro':<22} | {'Qtd Ativos':<10} | {'Média Horas':<12}")
+        print("-" * 95)
+        print_rows(rows, fmt, "Nenhuma localização com múltiplos problemas ativos encontrada.")
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+def consultar_comentarios_recentes():
+    """
+    Consulta 7: Lista os 10 comentários mais recentes em reports ativos.
+    CORRIGIDO: Trata usuários com nome NULL.
+    """
+    def fmt(row):
+        id_rep = row[0]
+
+        # Tratamento seguro para strings (evita erro NoneType)
+        titulo_raw = row[1] or "Sem Título"
+        nome_raw = row[2] or "Anônimo"
+        texto_raw = row[3] or ""
+
+        titulo = (titulo_raw[:22] + '..') if len(titulo_raw) > 22 else titulo_raw
+        cidadao = (nome_raw[:17] + '..') if len(nome_raw) > 17 else nome_raw
+        texto = (texto_raw[:27] + '..') if len(texto_raw) > 27 else texto_raw
+
+        return f"{id_rep:<4} | {titulo:<25} | {cidadao:<20} | {texto:<30}"
+
+    try:
+        rows = consulta_rows('comentarios_recentes')
+        clear_console()
+        print("\n=== Relatório: Últimos Comentários (Reports Ativos) ===")
+        print(f"{'ID':<4} | {'Report':<25} | {'Cidadão':<20} | {'Comentário':<30}")
+        print("-" * 90)
+        print_rows(rows, fmt, "Nenhum comentário recente encontrado em reports ativos.")
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar consulta: {e}")
+        input("Pressione ENTER para continuar...")
+
+class RelatorioPainel(NamedTuple):
+    nome: str                   # chave em CONSULTAS
+    colunas: tuple
+    linhas: tuple
+    completo: bool              # False quando cortado em max_linhas
+    segundos: float
+    erro: Optional[str]         # mensagem do erro; as demais consultas seguem
+
+class Painel(NamedTuple):
+    inicio: datetime.datetime
+    segundos: float             # tempo de parede do painel inteiro
+    relatorios: dict            # nome -> RelatorioPainel, na ordem pedida
+
+def _relatorio_painel(nome: str, params: Optional[dict], max_linhas: Optional[int],
+                      usar_cache: bool) -> RelatorioPainel:
+    """Runs one dashboard report, keeping at most `max_linhas` rows; errors are returned, not raised."""
+    inicio = time.perf_counter()
+    try:
+        if usar_cache:
+            rows = consulta_rows(nome, params, header=True)
+        else:
+            rows = linhas_consulta(nome, parametros_consulta(nome, params), header=True)
+        try:
+            colunas = next(rows)
+            linhas = tuple(itertools.islice(rows, max_linhas))
+            # One more row tells whether the result was cut; a result read to
+            # the end is also stored in the cache
+            completo = max_linhas is None or next(rows, None) is None
+        finally:
+            rows.close()
+    except (psycopg2.Error, ValueError) as e:
+        return RelatorioPainel(nome, (), (), False, time.perf_counter() - inicio, str(e).strip())
+    return RelatorioPainel(nome, colunas, linhas, completo, time.perf_counter() - inicio, None)
+
+def executar_painel(nomes=None, params: Optional[dict] = None, max_linhas: Optional[int] = None,
+                    usar_cache: bool = True, max_workers: Optional[int] = None) -> Painel:
+    """
+    Runs the reports `nomes` (default: all of CONSULTAS) concurrently, each
+    on its own pooled connection, and gathers them into one Painel. The
+    wall-clock time approaches the slowest report instead of the sum.
+
+    `params` maps report name -> parameters (defaulted as in
+    consulta_rows()); `max_linhas` defaults to PAINEL_CONFIG['max_linhas']
+    (set it to None there to keep whole results).
+    Each report reads its own snapshot: a write landing mid-dashboard may
+    show in some reports and not in others.
+    """
+    nomes = list(nomes or CONSULTAS)
+    for nome in nomes:
+        if nome not in CONSULTAS:
+            raise ValueError(f"Relatório desconhecido: {nome}")
+    params = params or {}
+    if max_linhas is None:
+        max_linhas = PAINEL_CONFIG['max_linhas']
+    workers = max_workers or PAINEL_CONFIG['max_workers'] or len(nomes)
+    workers = max(1, min(workers, len(nomes), POOL_CONFIG['maxconn']))
+    inicio = datetime.datetime.now(datetime.timezone.utc)
+    t = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='painel') as executor:
+        futuros = {nome: executor.submit(_relatorio_painel, nome, params.get(nome), max_linhas, usar_cache)
+                   for nome in nomes}
+        relatorios = {nome: futuro.result() for nome, futuro in futuros.items()}
+    return Painel(inicio, time.perf_counter() - t, relatorios)
+
+def _valor_painel(valor, largura: int) -> str:
+    if valor is None:
+        texto = ''
+    elif isinstance(valor, datetime.datetime):
+        texto = valor.strftime('%d/%m/%Y %H:%M')
+    elif isinstance(valor, (float, decimal.Decimal)):
+        texto = f"{valor:.2f}"
+    else:
+        texto = str(valor)
+    return (texto[:largura - 2] + '..') if len(texto) > largura else texto
+
+def imprimir_painel(painel: Painel, linhas: int = PAGE_SIZE, largura: int = 30):
+    """Prints every report of `painel` as a table of its first `linhas` rows, with row count and time."""
+    for r in painel.relatorios.values():
+        print(f"\n=== {TITULOS_CONSULTAS.get(r.nome, r.nome)} ({r.segundos * 1000:.0f} ms) ===")
+        if r.erro:
+            print(f"Erro ao executar consulta: {r.erro}")
+            continue
+        if not r.linhas:
+            print("Nenhum resultado.")
+            continue
+        mostradas = r.linhas[:linhas]
+        larguras = [min(largura, max(len(str(c)), *(len(_valor_painel(row[i], largura)) for row in mostradas)))
+                    for i, c in enumerate(r.colunas)]
+        print(" | ".join(f"{str(c)[:w]:<{w}}" for c, w in zip(r.colunas, larguras)))
+        print("-" * (sum(larguras) + 3 * (len(larguras) - 1)))
+        for row in mostradas:
+            print(" | ".join(f"{_valor_painel(v, w):<{w}}" for v, w in zip(row, larguras)))
+        restantes = len(r.linhas) - len(mostradas)
+        if restantes or not r.completo:
+            print(f"... mais {restantes}{'+' if not r.completo else ''} linha(s)")
+    soma = sum(r.segundos for r in painel.relatorios.values())
+    print(f"\n{len(painel.relatorios)} relatórios em {painel.segundos:.2f} s "
+          f"(soma das consultas: {soma:.2f} s)")
+
+def consultar_painel():
+    """Executa todas as consultas em paralelo e mostra o painel completo."""
+    try:
+        print("Executando os relatórios em paralelo...")
+        painel = executar_painel()
+        clear_console()
+        print(f"\n=== Painel Completo ({painel.inicio.astimezone():%d/%m/%Y %H:%M}) ===")
+        imprimir_painel(painel)
+        input("\nPressione ENTER para voltar...")
+    except Exception as e:
+        print(f"Erro ao executar o painel: {e}")
+        input("Pressione ENTER para continuar...")
+
 def input_nonempty(prompt: str) -> str:
     while True:
         v = input(prompt).strip()
@@ -754,16 +3216,25 @@ def menu():
     print("1) Listar todos")
     print("2) Criar novo dado")
     print("3) Select")
+    print("4) Estatísticas de desempenho")
+    print("5) Perfil de consultas (p50/p95/p99)")
+    print("6) Buscar em reports e comentários")
     print("0) Sair")
 
 def handle_list():
-    users = list_usuarios()
+    users = pagina_usuarios()
     if not users:
         print("Nenhum item cadastrado.")
         return
-    print("\Lista de Usuários:")
-    for u in users:
-        print(f"Nome: {u.nome} | CPF: {u.cpf} | Role: {u.role}")
+    print("\nLista de Usuários:")
+    while users:
+        for u in users:
+            print(f"Nome: {u.nome} | CPF: {u.cpf} | Role: {u.role}")
+        if len(users) < PAGE_SIZE:
+            break
+        if input("-- ENTER para próxima página, 'q' para parar: ").strip().lower() == 'q':
+            break
+        users = pagina_usuarios((users[-1].nome, users[-1].cpf))
 
 def handle_create():
     print("Selecione em qual tabela você deseja adiocionar um dado: ")
@@ -777,8 +3248,8 @@ def handle_create():
     print("8- Report")
     print("9- Midia")
     print("10- CategoriaReport")
-    print("11- HistoricoAtualizado")
-    print("12- CidadaoBeneficio")
+    print("11- Atualizar Report (status/campos, com histórico)")
+    print("12- CidadaoBeneficio (resgate)")
     print("0- Sair")
     choice = input("Escolha: ").strip()
     if choice == "1":
@@ -802,7 +3273,7 @@ def handle_create():
     elif choice == "10":
         inserir_categoriaReport()
     elif choice == "11":
-        inserir_historicoAtualizado()
+        editar_report()
     elif choice == "12":
         inserir_cidadaoBeneficio()
     elif choice == "0":
@@ -820,6 +3291,7 @@ def handle_view():
         print("5) Reports Críticos (Alta Relevância)")
         print("6) Hotspots (Áreas com Problemas Recorrentes)")
         print("7) Últimos Comentários")                       
+        print("8) Painel Completo (todos em paralelo)")
         print("0) Voltar")
         
         choice = input("Escolha uma consulta: ").strip()
@@ -838,20 +3310,108 @@ def handle_view():
             consultar_areas_problematicas()    
         elif choice == "7":
             consultar_comentarios_recentes()   
+        elif choice == "8":
+            consultar_painel()
         elif choice == "0":
             break
         else:
             print("Opção inválida ou ainda não implementada.")
             input("Pressione ENTER...")
 
+def handle_stats():
+    clear_console()
+    stats = pool_stats()
+    print("\n=== Pool de Conexões ===")
+    print(f"Conexões abertas: {stats['size']} (em uso: {stats['in_use']}, ociosas: {stats['idle']}, máximo: {stats['maxconn']})")
+    print(f"Checkouts: {stats['checkouts']} | Reusos: {stats['hits']} | Novas conexões: {stats['misses']} | Taxa de reuso: {stats['hit_ratio']:.1%}")
+    print(f"Esperas: {stats['waits']} | Espera média: {stats['avg_wait_ms']:.1f} ms | Espera máxima: {stats['wait_time_max'] * 1000:.1f} ms | Timeouts: {stats['timeouts']}")
+    print(f"Ociosas removidas: {stats['evicted_idle']} | Descartadas: {stats['discarded_broken']} | Reconexões: {stats['reconnects']} | Falhas de conexão: {stats['connect_errors']}")
+    cache = cache_stats()
+    print("\n=== Cache de Relatórios ===")
+    print(f"Entradas: {cache['entries']}/{cache['max_entries']} | Acertos: {cache['hits']} | Faltas: {cache['misses']} | Taxa de acerto: {cache['hit_ratio']:.1%}")
+    print(f"Invalidações: {cache['invalidations']} | Expiradas: {cache['expirations']} | Removidas (LRU): {cache['evictions']}")
+    if REPLICA_CONFIG['replicas']:
+        print("\n=== Réplicas de Leitura ===")
+        print_replicas()
+    input("\nPressione ENTER para voltar...")
+
+def print_replicas():
+    stats = replica_stats()
+    print(f"Leituras em réplicas: {stats['leituras_replica']} | No primário: {stats['leituras_primario']} | "
+          f"Réplicas recusadas por lag: {stats['por_lag']}, por escrita recente: {stats['por_escrita']}, "
+          f"indisponíveis: {stats['por_indisponivel']}")
+    for r in stats['replicas']:
+        if r['indisponivel'] or r['erro']:
+            estado = f"indisponível ({r['erro']})"
+        elif r['em_recuperacao'] is None:
+            estado = "não medida"
+        elif not r['em_recuperacao']:
+            estado = "não está em recuperação (não é réplica)"
+        else:
+            lag = f"{r['lag']:.3f} s" if r['lag'] is not None else "desconhecido"
+            estado = f"lag {lag}, {r['atraso_bytes']} bytes atrás da última escrita"
+        print(f"  {r['endereco']:<22} {estado} | leituras: {r['leituras']}")
+
+def print_profile(limit: Optional[int] = None):
+    resumo = query_profile()
+    if not resumo:
+        print("Nenhuma consulta registrada ainda.")
+        return
+    print(f"{'Consulta':<50} | {'Chamadas':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'exec ms':>8} | {'fetch ms':>8} | {'Linhas':>8}")
+    print("-" * 130)
+    for q in resumo[:limit]:
+        stmt = (q['statement'][:47] + '..') if len(q['statement']) > 49 else q['statement']
+        print(f"{stmt:<50} | {q['calls']:>8} | {q['p50_ms']:>8.2f} | {q['p95_ms']:>8.2f} | {q['p99_ms']:>8.2f} | "
+              f"{q['execute_ms']:>8.2f} | {q['fetch_ms']:>8.2f} | {q['rows']:>8}")
+
+def print_prepared_stats():
+    resumo = [s for s in prepared_stats() if s['prepares'] or s['texto']]
+    if not resumo:
+        return
+    print(f"{'Statement preparado':<40} | {'Prepares':>8} | {'Execuções':>9} | {'Texto':>6} | "
+          f"{'Reprep.':>7} | {'Parse ms':>8} | {'Economia ms':>11}")
+    print("-" * 107)
+    for s in resumo:
+        print(f"{s['statement'][:40]:<40} | {s['prepares']:>8} | {s['execucoes']:>9} | {s['texto']:>6} | "
+              f"{s['reprepares']:>7} | {s['prepare_ms']:>8.2f} | {s['economia_ms']:>11.1f}")
+
+def handle_profile():
+    clear_console()
+    print("\n=== Perfil de Consultas (ordenado por tempo total) ===")
+    print_profile()
+    print()
+    print_prepared_stats()
+    input("\nPressione ENTER para voltar...")
+
+def handle_search():
+    clear_console()
+    termos = input("Buscar (\"frase exata\", -excluir): ").strip()
+    if not termos:
+        return
+    pagina = 1
+    try:
+        while True:
+            resultados = buscar(termos, pagina, PAGE_SIZE, extra=1)
+            if not resultados and pagina == 1:
+                print("Nenhum resultado encontrado.")
+                break
+            for r in resultados[:PAGE_SIZE]:
+                origem = f"Report {r.idReport}" if r.tipo == 'report' else f"Comentário em {r.idReport}"
+                print(f"\n[{origem}] {r.titulo} ({r.data:%d/%m/%Y}, rank {r.rank})")
+                print(f"  {r.trecho}")
+            if len(resultados) <= PAGE_SIZE:
+                break
+            if input(f"\n-- página {pagina} -- ENTER para a próxima, 'q' para parar: ").strip().lower() == 'q':
+                break
+            pagina += 1
+    except (psycopg2.Error, ValueError) as e:
+        print(f"Erro na busca: {e}")
+    input("\nPressione ENTER para voltar...")
+
 def clear_console():
-    """Clears the console screen."""
-    # For Windows
-    if os.name == 'nt':
-        os.system('cls')
-    # For macOS and Linux
-    else:
-        os.system('clear')
+    """Clears the console screen with an ANSI escape (no subprocess); no-op when not a terminal."""
+    if sys.stdout.isatty():
+        print("\033[2J\033[H", end="", flush=True)
 
 def main_loop():
     """Main application loop with database validation."""
@@ -876,11 +3436,552 @@ def main_loop():
             handle_create()
         elif choice == "3":
             handle_view()
+        elif choice == "4":
+            handle_stats()
+        elif choice == "5":
+            handle_profile()
+        elif choice == "6":
+            handle_search()
         elif choice == "0":
             print("Saindo...")
             break
         else:
             print("Opção inválida. Tente novamente.")
 
+# -------------------------
+# Configuração em camadas
+# -------------------------
+# Section name (in the file, TRABALHO_<SECAO>_<CHAVE> and --set secao.chave=valor) -> dict
+SECOES_CONFIG = {
+    'db': DB_CONFIG,
+    'sessao': SESSAO_CONFIG,
+    'pool': POOL_CONFIG,
+    'replica': REPLICA_CONFIG,
+    'cache': CACHE_CONFIG,
+    'consultas': CONSULTAS_CONFIG,
+    'painel': PAINEL_CONFIG,
+    'busca': BUSCA_CONFIG,
+    'stream': STREAM_CONFIG,
+    'prepared': PREPARED_CONFIG,
+    'profile': PROFILE_CONFIG,
+    'group_commit': GROUP_COMMIT_CONFIG,
+}
+# Sections whose keys are open: libpq keywords, server settings, report names
+SECOES_ABERTAS = ('db', 'sessao', 'consultas')
+# Environment variable naming the configuration file
+CONFIG_ENV = 'TRABALHO_CONFIG'
+
+_padroes_config = copy.deepcopy(SECOES_CONFIG)
+_origens_config = {}   # 'secao.chave' -> 'arquivo' | 'ambiente' | 'cli' (absent = padrão)
+
+def _converter_config(texto: str, padrao):
+    """Parses an environment/CLI string as the type of the default it replaces."""
+    if isinstance(padrao, bool):
+        valor = texto.strip().lower()
+        if valor in ('1', 'true', 'yes', 'on', 'sim'):
+            return True
+        if valor in ('0', 'false', 'no', 'off', 'nao', 'não'):
+            return False
+        raise ValueError(f"valor booleano inválido: {texto!r}")
+    if isinstance(padrao, int):
+        return int(texto)
+    if isinstance(padrao, float):
+        return float(texto)
+    if isinstance(padrao, str):
+        return texto
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        if padrao is None:
+            return texto
+        raise ValueError(f"JSON inválido: {texto!r}") from None
+
+def _definir_config(caminho: list, valor, origem: str, texto: bool = False):
+    """Sets secao.chave[.subchave] = valor, checking the section/key and the type against the default."""
+    nome = '.'.join(caminho)
+    secao = caminho[0]
+    if secao not in SECOES_CONFIG or len(caminho) < 2:
+        raise ConfigDesconhecida(f"Configuração desconhecida: {nome} (seções: {', '.join(SECOES_CONFIG)})")
+    if len(caminho) > (3 if secao == 'consultas' else 2):
+        raise ConfigDesconhecida(f"Configuração desconhecida: {nome}")
+    alvo = SECOES_CONFIG[secao]
+    padroes = _padroes_config[secao]
+    if secao == 'consultas':
+        if caminho[1] != 'padrao' and caminho[1] not in CONSULTAS:
+            raise ConfigDesconhecida(f"Relatório desconhecido em {nome}")
+        if len(caminho) == 2:
+            if not isinstance(valor, dict):
+                raise ValueError(f"{nome} deve ser um objeto")
+            for chave, v in valor.items():
+                _definir_config(caminho + [chave], v, origem, texto)
+            return
+        alvo = alvo.setdefault(caminho[1], {})
+        padroes = padroes.get(caminho[1], {})
+    elif caminho[1] not in padroes and secao not in SECOES_ABERTAS:
+        raise ConfigDesconhecida(f"Configuração desconhecida: {nome} (chaves: {', '.join(padroes)})")
+    chave = caminho[-1]
+    padrao = padroes.get(chave)
+    if texto:
+        try:
+            valor = _converter_config(valor, padrao)
+        except ValueError as e:
+            raise ValueError(f"{nome}: {e}") from None
+    elif padrao is not None and valor is not None and not (
+            isinstance(valor, type(padrao)) or (type(padrao) is float and type(valor) is int)):
+        raise ValueError(f"{nome}: esperado {type(padrao).__name__}, recebido {type(valor).__name__}")
+    alvo[chave] = valor
+    _origens_config[nome] = origem
+
+def _caminho_ambiente(variavel: str) -> list:
+    """TRABALHO_POOL_MAXCONN -> ['pool', 'maxconn'], matching known section/report names; [] when no section matches."""
+    resto = variavel[len('TRABALHO_'):].lower()
+    for secao in sorted(SECOES_CONFIG, key=len, reverse=True):
+        if not resto.startswith(secao + '_'):
+            continue
+        chave = resto[len(secao) + 1:]
+        if secao == 'consultas':
+            for nome in sorted(['padrao', *CONSULTAS], key=len, reverse=True):
+                if chave.startswith(nome + '_'):
+                    return [secao, nome, chave[len(nome) + 1:]]
+            return [secao, chave]
+        return [secao, chave]
+    return []
+
+def carregar_config(arquivo: Optional[str] = None, sobrescritas=(), ambiente=None):
+    """
+    Rebuilds every *_CONFIG dict of SECOES_CONFIG, in place, from its
+    defaults overridden in turn by:
+
+      1. the JSON file `arquivo` (default: the path in $TRABALHO_CONFIG), with
+         the sections as objects: {"pool": {"maxconn": 20}, ...};
+      2. TRABALHO_<SECAO>_<CHAVE> environment variables, e.g.
+         TRABALHO_DB_HOST, TRABALHO_CONSULTAS_TOTAL_INTERACOES_WORK_MEM=128MB;
+      3. `sobrescritas`, 'secao.chave=valor' strings (--set on the CLI).
+
+    Pools are closed so the next checkout reconnects with the new settings.
+    Raises ValueError on unknown sections/keys and badly typed values; other
+    TRABALHO_* variables (TRABALHO_DIR, ...) are skipped with a warning.
+    """
+    ambiente = os.environ if ambiente is None else ambiente
+    for secao, padroes in _padroes_config.items():
+        SECOES_CONFIG[secao].clear()
+        SECOES_CONFIG[secao].update(copy.deepcopy(padroes))
+    _origens_config.clear()
+
+    arquivo = arquivo or ambiente.get(CONFIG_ENV)
+    if arquivo:
+        try:
+            with open(arquivo, encoding='utf-8') as f:
+                dados = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Arquivo de configuração {arquivo}: {e}") from None
+        if not isinstance(dados, dict):
+            raise ValueError(f"Arquivo de configuração {arquivo}: esperado um objeto JSON")
+        for secao, valores in dados.items():
+            if not isinstance(valores, dict):
+                raise ValueError(f"Arquivo de configuração {arquivo}: a seção {secao} deve ser um objeto")
+            for chave, valor in valores.items():
+                _definir_config([secao, chave], valor, 'arquivo')
+    for variavel in sorted(ambiente):
+        if variavel.startswith('TRABALHO_') and variavel != CONFIG_ENV:
+            caminho = _caminho_ambiente(variavel)
+            try:
+                if not caminho:
+                    raise ConfigDesconhecida(f"nenhuma seção corresponde ({', '.join(SECOES_CONFIG)})")
+                _definir_config(caminho, ambiente[variavel], 'ambiente', texto=True)
+            except ConfigDesconhecida as e:
+                logging.getLogger(__name__).warning("Variável de ambiente %s ignorada: %s", variavel, e)
+    for item in sobrescritas:
+        chave, sep, valor = item.partition('=')
+        if not sep:
+            raise ValueError(f"--set espera secao.chave=valor, recebido {item!r}")
+        _definir_config(chave.strip().split('.'), valor, 'cli', texto=True)
+
+    _cache.ttl = CACHE_CONFIG['ttl']
+    _cache.max_entries = CACHE_CONFIG['max_entries']
+    _cache.max_rows = CACHE_CONFIG['max_rows']
+    _profiler.configurar(PROFILE_CONFIG['sample_size'])
+    close_pool()
+
+def config_efetiva(senha: bool = False) -> dict:
+    """
+    The current configuration as a config file ({secao: {chave: valor}}), so
+    a dump reloads as-is. The password is left out unless `senha`.
+    """
+    dados = {secao: copy.deepcopy(valores) for secao, valores in SECOES_CONFIG.items()}
+    if not senha:
+        dados['db'].pop('password', None)
+    return dados
+
+def origens_config() -> dict:
+    """'secao.chave' -> where its current value came from ('arquivo', 'ambiente', 'cli'), for values off their default."""
+    origens = {}
+    for nome, origem in _origens_config.items():
+        atual, padrao = SECOES_CONFIG, _padroes_config
+        for chave in nome.split('.'):
+            atual, padrao = atual.get(chave), (padrao or {}).get(chave)
+        if atual != padrao:
+            origens[nome] = origem
+    return origens
+
+# -------------------------
+# Linha de comando (não interativa)
+# -------------------------
+# CLI report names -> CONSULTAS keys
+RELATORIOS_CLI = {
+    'interactions': 'total_interacoes',
+    'employees': 'reports_por_funcionario',
+    'ratings': 'media_avaliacoes',
+    'experts': 'funcionarios_todos_categorias',
+    'critical': 'reports_criticos',
+    'hotspots': 'areas_problematicas',
+    'comments': 'comentarios_recentes',
+}
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def exportar_linhas(rows, out, formato: str = 'csv') -> int:
+    """
+    Writes a header-first row iterator (consulta_rows(..., header=True)) to
+    `out` as rows arrive, as csv, jsonl (one object per line) or json (an
+    array written incrementally). Returns the number of data rows written.
+    """
+    columns = next(rows)
+    count = 0
+    if formato == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif formato == 'jsonl':
+        for row in rows:
+            out.write(json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False))
+            out.write('\n')
+            count += 1
+    elif formato == 'json':
+        out.write('[')
+        for row in rows:
+            out.write(',\n' if count else '\n')
+            out.write(json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False))
+            count += 1
+        out.write('\n]\n')
+    else:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    return count
+
+def _open_output(path: Optional[str]):
+    if not path or path == '-':
+        return nullcontext(sys.stdout)
+    return open(path, 'w', newline='', encoding='utf-8')
+
+def exportar_painel(painel: Painel, out, formato: str = 'csv') -> int:
+    """
+    Writes every report of `painel` to `out`: json as one document with
+    each report's columns, rows and timing; jsonl as one object per row
+    tagged with "relatorio"; csv as one block per report (a "# nome" line,
+    the header and the rows, then a blank line). Returns the data rows written.
+    """
+    count = 0
+    if formato == 'json':
+        documento = {
+            'inicio': painel.inicio,
+            'segundos': painel.segundos,
+            'relatorios': {
+                r.nome: {'segundos': r.segundos, 'completo': r.completo, 'erro': r.erro,
+                         'linhas': [dict(zip(r.colunas, row)) for row in r.linhas]}
+                for r in painel.relatorios.values()
+            },
+        }
+        json.dump(documento, out, default=_json_default, ensure_ascii=False, indent=1)
+        out.write('\n')
+        return sum(len(r.linhas) for r in painel.relatorios.values())
+    if formato == 'jsonl':
+        for r in painel.relatorios.values():
+            for row in r.linhas:
+                out.write(json.dumps({'relatorio': r.nome, **dict(zip(r.colunas, row))},
+                                     default=_json_default, ensure_ascii=False))
+                out.write('\n')
+                count += 1
+        return count
+    if formato != 'csv':
+        raise ValueError(f"Formato desconhecido: {formato}")
+    for r in painel.relatorios.values():
+        out.write(f"# {r.nome}\n")
+        if r.colunas:
+            count += exportar_linhas(iter((r.colunas, *r.linhas)), out, 'csv')
+        out.write('\n')
+    return count
+
+def _params_cli(args, nome: str) -> dict:
+    """Parameters of report `nome` taken from the `report` options it accepts."""
+    aceitos = PARAMETROS_CONSULTAS.get(nome, {})
+    params = {}
+    for opcao, param in (('limit', 'limite'), ('raio', 'raio_m'), ('dias', 'dias'),
+                         ('min_interacoes', 'min_interacoes'), ('min_percentual', 'min_percentual')):
+        valor = getattr(args, opcao)
+        if valor is not None and param in aceitos:
+            params[param] = valor
+    return params
+
+def cli_painel(args) -> int:
+    params = {nome: _params_cli(args, nome) or None for nome in CONSULTAS}
+    painel = executar_painel(params=params, max_linhas=args.limit, usar_cache=not args.no_cache)
+    with _open_output(args.output) as out:
+        count = exportar_painel(painel, out, args.format)
+    for r in painel.relatorios.values():
+        cortado = '' if r.completo or r.erro else ' (cortado)'
+        situacao = f"erro: {r.erro}" if r.erro else f"{len(r.linhas)} linhas{cortado}"
+        print(f"  {r.nome:<32} {r.segundos * 1000:>9.1f} ms  {situacao}", file=sys.stderr)
+    soma = sum(r.segundos for r in painel.relatorios.values())
+    destino = f" para {args.output}" if args.output and args.output != '-' else ''
+    print(f"{count} linhas de {len(painel.relatorios)} relatórios exportadas{destino} em "
+          f"{painel.segundos:.2f} s (soma das consultas: {soma:.2f} s)", file=sys.stderr)
+    return 1 if any(r.erro for r in painel.relatorios.values()) else 0
+
+def cli_report(args) -> int:
+    if args.nome == 'all':
+        return cli_painel(args)
+    nome = RELATORIOS_CLI.get(args.nome, args.nome)
+    if nome not in CONSULTAS:
+        raise ValueError(f"Relatório desconhecido: {args.nome}")
+    params = _params_cli(args, nome)
+    if args.no_cache:
+        rows = linhas_consulta(nome, parametros_consulta(nome, params), header=True)
+    else:
+        rows = consulta_rows(nome, params or None, header=True)
+    if args.limit is not None and 'limite' not in params:
+        rows = itertools.islice(rows, args.limit + 1)  # + header
+    try:
+        with _open_output(args.output) as out:
+            count = exportar_linhas(rows, out, args.format)
+    finally:
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+    if args.output and args.output != '-':
+        print(f"{count} linhas exportadas para {args.output}", file=sys.stderr)
+    return 0
+
+def cli_insert(args) -> int:
+    try:
+        dados = json.loads(args.json)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"--json inválido: {e}") from None
+    if not isinstance(dados, dict):
+        raise ValueError("--json deve ser um objeto JSON")
+    print(inserir_registro(args.tabela, dados))
+    return 0
+
+def cli_search(args) -> int:
+    sql, params = sql_busca(' '.join(args.termos), args.pagina, args.por_pagina, args.tipo)
+    rows = stream_query(sql, params, header=True, leitura=True)
+    try:
+        with _open_output(args.output) as out:
+            exportar_linhas(rows, out, args.format)
+    finally:
+        rows.close()
+    return 0
+
+def cli_redeem(args) -> int:
+    print(resgatar_beneficio(args.cpf, args.beneficio))
+    return 0
+
+def cli_update(args) -> int:
+    alteracoes = {c: getattr(args, c) for c in CAMPOS_ATUALIZAVEIS if getattr(args, c) is not None}
+    resultado = atualizar_reports(args.funcionario, alteracoes, ids=args.ids, status_atual=args.de,
+                                  localizacao=args.em, categoria=args.categoria)
+    rows = [ReportAtualizado._fields] + [(r.idReport, r.statusAnterior, ','.join(r.atributos))
+                                         for r in resultado]
+    exportar_linhas(iter(rows), sys.stdout, args.format)
+    alterados = sum(1 for r in resultado if r.atributos)
+    print(f"{alterados} de {len(resultado)} reports atualizados", file=sys.stderr)
+    return 0
+
+def cli_points(args) -> int:
+    if args.credito:
+        creditar_pontos(args.cpf, args.credito)
+    rows = [MovimentoPontos._fields, *extrato_pontos(args.cpf, args.limit)]
+    exportar_linhas(iter(rows), sys.stdout, args.format)
+    return 0
+
+def cli_records(args) -> int:
+    if args.check:
+        problemas = conferir_registros()
+        for p in problemas:
+            print(p)
+        if not problemas:
+            print(f"{len(REGISTROS)} registros conferem com o esquema")
+        return 1 if problemas else 0
+    sys.stdout.write(gerar_registros(args.tabelas or None))
+    return 0
+
+def cli_geocode(args) -> int:
+    enderecos, reports = geocodificar_pendentes(args.lote, args.repetir_falhas)
+    print(f"{enderecos} endereços geocodificados, {reports} reports atualizados")
+    return 0
+
+def cli_profile(args) -> int:
+    nomes = [RELATORIOS_CLI.get(n, n) for n in args.reports] or list(CONSULTAS)
+    for nome in nomes:
+        if nome not in CONSULTAS:
+            raise ValueError(f"Relatório desconhecido: {nome}")
+    for _ in range(args.repeat):
+        for nome in nomes:
+            for _row in linhas_consulta(nome, parametros_consulta(nome)):
+                pass
+    print_profile()
+    print()
+    print_prepared_stats()
+    return 0
+
+def cli_replicas(args) -> int:
+    if not REPLICA_CONFIG['replicas']:
+        print("Nenhuma réplica configurada (REPLICA_CONFIG['replicas']).")
+        return 0
+    get_router().refresh()
+    print_replicas()
+    return 0
+
+def cli_config(args) -> int:
+    if args.origens:
+        for nome, origem in sorted(origens_config().items()):
+            secao, *caminho = nome.split('.')
+            valor = SECOES_CONFIG[secao]
+            for chave in caminho:
+                valor = valor[chave]
+            if nome == 'db.password' and not args.senha:
+                valor = '***'
+            print(f"{nome} = {json.dumps(valor, ensure_ascii=False)}  ({origem})")
+        return 0
+    with _open_output(args.output) as out:
+        json.dump(config_efetiva(args.senha), out, indent=2, ensure_ascii=False)
+        out.write('\n')
+    return 0
+
+def adicionar_argumentos_config(parser: argparse.ArgumentParser):
+    """--config/--set options of every command line tool; apply them with aplicar_argumentos_config()."""
+    parser.add_argument('--config', metavar='ARQUIVO',
+                        help=f"Configuração em JSON (padrão: ${CONFIG_ENV}); TRABALHO_<SECAO>_<CHAVE> a sobrescreve")
+    parser.add_argument('--set', action='append', default=[], metavar='SECAO.CHAVE=VALOR',
+                        help="Sobrescreve um valor, ex.: pool.maxconn=20, consultas.padrao.statement_timeout=30s")
+
+def aplicar_argumentos_config(args, parser: Optional[argparse.ArgumentParser] = None):
+    """Reloads the configuration with the --config/--set of `args`; errors go to parser.error() if given."""
+    try:
+        carregar_config(args.config, args.set)
+    except ValueError as e:
+        if parser is None:
+            raise
+        parser.error(str(e))
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Sistema de Relatos Cívicos. Sem argumentos, abre o menu interativo.")
+    adicionar_argumentos_config(parser)
+    sub = parser.add_subparsers(dest='command')
+
+    rep = sub.add_parser('report', help="Executa um relatório e exporta o resultado")
+    rep.add_argument('nome', help=f"Relatório: {', '.join(RELATORIOS_CLI)} (ou o nome em CONSULTAS); "
+                                  "all executa todos em paralelo")
+    rep.add_argument('--limit', type=int,
+                     help="Máximo de linhas (hotspots/comments: repassado à consulta; all: por relatório)")
+    rep.add_argument('--raio', type=float, help="hotspots: raio de agrupamento em metros")
+    rep.add_argument('--dias', type=int,
+                     help="hotspots: só reports criados nos últimos N dias; critical: sem atualização há mais de N dias")
+    rep.add_argument('--min-interacoes', type=int, help="critical: mínimo de interações (padrão 2)")
+    rep.add_argument('--min-percentual', type=float,
+                     help="experts: cobertura mínima de categorias em %% (padrão 100; 0 lista todos)")
+    rep.add_argument('--format', choices=('csv', 'json', 'jsonl'), default='csv')
+    rep.add_argument('--output', '-o', help="Arquivo de saída (padrão: stdout)")
+    rep.add_argument('--no-cache', action='store_true', help="Ignora o cache de resultados")
+    rep.set_defaults(func=cli_report)
+
+    ins = sub.add_parser('insert', help="Insere uma linha a partir de um objeto JSON")
+    ins.add_argument('tabela', choices=sorted(TABELAS_INSERCAO))
+    ins.add_argument('--json', required=True, help='Colunas e valores, ex.: \'{"nome": "Poda", "pontos": 20}\'')
+    ins.set_defaults(func=cli_insert)
+
+    busca = sub.add_parser('search', help="Busca textual em reports e comentários")
+    busca.add_argument('termos', nargs='+', help='Termos (sintaxe de busca web: "frase", -excluir, or)')
+    busca.add_argument('--tipo', choices=TIPOS_BUSCA, default='todos')
+    busca.add_argument('--pagina', type=int, default=1)
+    busca.add_argument('--por-pagina', type=int, default=PAGE_SIZE)
+    busca.add_argument('--format', choices=('csv', 'json', 'jsonl'), default='csv')
+    busca.add_argument('--output', '-o', help="Arquivo de saída (padrão: stdout)")
+    busca.set_defaults(func=cli_search)
+
+    res = sub.add_parser('redeem', help="Resgata um benefício, debitando seu custo dos pontos do cidadão")
+    res.add_argument('cpf')
+    res.add_argument('beneficio', help="nomeBeneficio")
+    res.set_defaults(func=cli_redeem)
+
+    upd = sub.add_parser('update', help="Atualiza status/campos de um ou vários reports, registrando o histórico")
+    upd.add_argument('--funcionario', required=True, help="CPF do funcionário responsável")
+    upd.add_argument('--ids', type=int, nargs='+', help="idReport dos reports")
+    upd.add_argument('--de', nargs='+', choices=list(TRANSICOES_STATUS), help="Só reports com estes status atuais")
+    upd.add_argument('--em', help="Só reports cujo endereço contém estas palavras (ex.: um bairro)")
+    upd.add_argument('--categoria', type=int, help="Só reports desta idCategoriaReport")
+    upd.add_argument('--status', choices=list(TRANSICOES_STATUS), help="Novo status")
+    upd.add_argument('--titulo', help="Novo título")
+    upd.add_argument('--descricao', help="Nova descrição")
+    upd.add_argument('--localizacao', help="Nova localização")
+    upd.add_argument('--format', choices=('csv', 'json', 'jsonl'), default='csv')
+    upd.set_defaults(func=cli_update)
+
+    pts = sub.add_parser('points', help="Extrato de pontos de um cidadão")
+    pts.add_argument('cpf')
+    pts.add_argument('--credito', type=int, help="Lança antes um ajuste (negativo para débito)")
+    pts.add_argument('--limit', type=int, default=PAGE_SIZE, help="Movimentos mais recentes a mostrar")
+    pts.add_argument('--format', choices=('csv', 'json', 'jsonl'), default='csv')
+    pts.set_defaults(func=cli_points)
+
+    reg = sub.add_parser('records', help="Gera os NamedTuple de linha a partir do catálogo (ou confere os atuais)")
+    reg.add_argument('tabelas', nargs='*', help="Tabelas (padrão: as de REGISTROS)")
+    reg.add_argument('--check', action='store_true', help="Só confere REGISTROS contra o esquema")
+    reg.set_defaults(func=cli_records)
+
+    geo = sub.add_parser('geocode', help="Geocodifica os reports ativos ainda sem coordenadas")
+    geo.add_argument('--lote', type=int, default=100, help="Endereços por transação (padrão 100)")
+    geo.add_argument('--repetir-falhas', action='store_true',
+                     help="Consulta de novo endereços que o geocodificador não encontrou")
+    geo.set_defaults(func=cli_geocode)
+
+    prof = sub.add_parser('profile', help="Executa os relatórios e imprime p50/p95/p99 por consulta")
+    prof.add_argument('reports', nargs='*', help="Relatórios a executar (padrão: todos)")
+    prof.add_argument('--repeat', type=int, default=5, help="Execuções por relatório (padrão 5)")
+    prof.set_defaults(func=cli_profile)
+
+    rpl = sub.add_parser('replicas', help="Mostra lag e estado das réplicas de leitura")
+    rpl.set_defaults(func=cli_replicas)
+
+    cfg = sub.add_parser('config', help="Imprime a configuração efetiva (padrões + arquivo + ambiente + --set)")
+    cfg.add_argument('--origens', action='store_true', help="Lista só os valores alterados e de onde vieram")
+    cfg.add_argument('--senha', action='store_true', help="Inclui db.password")
+    cfg.add_argument('--output', '-o', help="Arquivo de saída (padrão: stdout)")
+    cfg.set_defaults(func=cli_config)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        aplicar_argumentos_config(args)
+        if args.command is None:
+            main_loop()
+            return 0
+        return args.func(args)
+    except (psycopg2.Error, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        close_pool()
+
 if __name__ == "__main__":
-    main_loop()
+    sys.exit(main())
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+trabalho_async.py
+API assíncrona (asyncio) de acesso a dados, espelhando as operações do
+trabalho.py: inserção de report/interação/mídia, atualização de reports com
+histórico, listagem de usuários, busca textual e os sete relatórios de
+CONSULTAS.
+
+Usa psycopg 3 com um pool assíncrono (psycopg_pool.AsyncConnectionPool)
+dimensionado por trabalho.POOL_CONFIG. O SQL, a validação de parâmetros, o
+cache de resultados e o perfil de consultas são os mesmos do caminho
+síncrono, então os dois podem ser usados no mesmo processo.
+
+consultar_varias() distribui vários relatórios entre poucas conexões e, em
+cada uma, envia todas as consultas de uma vez em modo pipeline: as
+latências de ida e volta se sobrepõem em vez de se somarem.
+
+Executado como script, compara a vazão de relatórios do caminho síncrono
+com a do assíncrono:
+  python3 trabalho_async.py --requisicoes 200 --conexoes 4
+
+Dependência opcional: pip install "psycopg[binary]" psycopg_pool
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, List
+
+try:
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+    from psycopg.rows import args_row
+    from psycopg_pool import AsyncConnectionPool
+except ImportError as e:  # pragma: no cover - optional dependency
+    raise ImportError("trabalho_async requer psycopg 3: "
+                      "pip install \"psycopg[binary]\" psycopg_pool") from e
+
+import psycopg2
+
+import trabalho
+from trabalho import Usuario, ResultadoBusca
+
+_pool: Optional[AsyncConnectionPool] = None
+_pool_lock = asyncio.Lock()
+_stream_ids = itertools.count(1)
+
+
+async def get_pool() -> AsyncConnectionPool:
+    """
+    Process-wide async pool, opened on first use. It is bound to the running
+    event loop: call close_pool() before that loop ends.
+    """
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                cfg = trabalho.POOL_CONFIG
+                pool = AsyncConnectionPool(
+                    make_conninfo(**trabalho.parametros_conexao()),
+                    min_size=cfg['minconn'],
+                    max_size=cfg['maxconn'],
+                    timeout=cfg['checkout_timeout'],
+                    max_idle=cfg['max_idle'],
+                    reconnect_timeout=cfg['checkout_timeout'],
+                    name='trabalho_async',
+                    open=False,
+                )
+                await pool.open(wait=True, timeout=cfg['checkout_timeout'])
+                _pool = pool
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+@asynccontextmanager
+async def get_connection():
+    """
+    Async counterpart of trabalho.get_connection(): commits on success,
+    rolls back on error; broken connections are discarded by the pool.
+    """
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+def pool_stats() -> dict:
+    return _pool.get_stats() if _pool is not None else {}
+
+
+async def _executar(conn, sql: str, params=None):
+    """Runs one statement and returns (columns, rows), timed into the shared query profile."""
+    inicio = time.perf_counter()
+    async with conn.cursor() as cur:
+        await cur.execute(sql, params)
+        executado = time.perf_counter()
+        rows = await cur.fetchall() if cur.description else []
+        colunas = tuple(col.name for col in cur.description or ())
+    fim = time.perf_counter()
+    if trabalho.PROFILE_CONFIG['enabled']:
+        trabalho._profiler.record(sql, executado - inicio, fim - executado, len(rows))
+    return colunas, rows
+
+
+# -------------------------
+# Inserção
+# -------------------------
+async def geocodificar_report(id_report: int) -> bool:
+    """Async trabalho.geocodificar_report(); the geocoder runs in a worker thread, outside any transaction."""
+    async with get_connection() as conn:
+        _colunas, rows = await _executar(conn, trabalho.GEOCODIFICACAO_PENDENTE_SQL, (id_report,))
+    if not rows:
+        return False
+    localizacao, endereco = rows[0]
+    params = await asyncio.to_thread(trabalho.geocodificar, [(endereco, localizacao)])
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(trabalho.GRAVAR_GEOCODIFICACOES_SQL, params)
+            atualizados = cur.rowcount
+    if atualizados:
+        trabalho.invalidar_cache('Report')
+    return atualizados > 0
+
+
+# Async counterparts of trabalho.POS_INSERCAO, run after the insert commits
+POS_INSERCAO = {
+    'report': geocodificar_report,
+}
+
+
+async def inserir_registro(tipo: str, dados: dict) -> int:
+    """Async trabalho.inserir_registro(): same tables, columns and return value."""
+    tabela, sql, valores, chave = trabalho.sql_insercao(tipo, dados)
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, valores)
+            resultado = (await cur.fetchone())[0] if chave else cur.rowcount
+    trabalho.invalidar_cache(tabela)
+    if tipo in POS_INSERCAO:
+        try:
+            await POS_INSERCAO[tipo](resultado)
+        except Exception as e:
+            logging.getLogger(__name__).warning(
+                "Pós-inserção de %s %s falhou (a linha foi inserida): %s", tipo, resultado, e)
+    return resultado
+
+
+async def inserir_report(dados: dict) -> int:
+    """Insere um Report (colunas de TABELAS_INSERCAO['report']); retorna o idReport."""
+    return await inserir_registro('report', dados)
+
+
+async def inserir_interacao(dados: dict) -> int:
+    """Insere uma Interacao (colunas de TABELAS_INSERCAO['interacao']); retorna o idInteracao."""
+    return await inserir_registro('interacao', dados)
+
+
+async def inserir_midia(dados: dict) -> int:
+    """Insere uma Midia (colunas de TABELAS_INSERCAO['midia']); retorna o idMidia."""
+    return await inserir_registro('midia', dados)
+
+
+async def registrar_interacoes(itens: list) -> List[int]:
+    """Interacao plus specializations in one statement; see trabalho.registrar_interacoes()."""
+    if not itens:
+        return []
+    async with get_connection() as conn:
+        _colunas, rows = await _executar(conn, trabalho.REGISTRAR_INTERACOES_SQL,
+                                         trabalho._params_interacoes(itens))
+    trabalho.invalidar_cache(*trabalho.TABELAS_INTERACAO)
+    return [id_interacao for _ordem, id_interacao in rows]
+
+
+async def registrar_interacao(cpf: str, id_report: int, tipo: str, texto: Optional[str] = None,
+                              nota: Optional[int] = None, comentario: Optional[str] = None,
+                              data_hora=None) -> int:
+    return (await registrar_interacoes(
+        [trabalho.interacao(cpf, id_report, tipo, texto, nota, comentario, data_hora)]))[0]
+
+
+# -------------------------
+# Pontos
+# -------------------------
+async def resgatar_beneficio(cpf: str, nome_beneficio: str) -> int:
+    """Redeems a benefit, debiting its cost; see trabalho.resgatar_beneficio()."""
+    async with get_connection() as conn:
+        _colunas, rows = await _executar(conn, trabalho.RESGATE_SQL,
+                                         {'cpf': cpf, 'beneficio': nome_beneficio})
+    if not rows:
+        raise ValueError(f"Cidadão {cpf} ou benefício '{nome_beneficio}' não encontrado")
+    pontos, custo, id_movimento = rows[0]
+    if id_movimento is None:
+        raise trabalho.SaldoInsuficiente(f"Saldo insuficiente: {pontos} pontos, '{nome_beneficio}' custa {custo}")
+    trabalho.invalidar_cache('MovimentoPontos', 'CidadaoBeneficio', 'Cidadao')
+    return pontos - custo
+
+
+# -------------------------
+# Atualização de reports
+# -------------------------
+async def atualizar_reports(cpf_funcionario: str, alteracoes: dict, ids=None, status_atual=None,
+                            localizacao: Optional[str] = None,
+                            categoria: Optional[int] = None) -> List[trabalho.ReportAtualizado]:
+    """Status/field changes plus their HistoricoAtualizacao rows in one statement; see trabalho.atualizar_reports()."""
+    filtros = trabalho._filtros_atualizacao(ids, status_atual, localizacao, categoria)
+    sql, params = trabalho.sql_atualizacao_reports(alteracoes, filtros)
+    params['funcionario'] = cpf_funcionario
+    bloqueio = trabalho.sql_bloqueio_categorias(alteracoes, filtros)
+    async with get_connection() as conn:
+        if bloqueio:
+            await _executar(conn, *bloqueio)
+        try:
+            _colunas, rows = await _executar(conn, sql, params)
+        except psycopg.errors.ForeignKeyViolation as e:
+            if 'funcionario' in (e.diag.constraint_name or '').lower():
+                raise ValueError(f"Funcionário {cpf_funcionario} não encontrado") from None
+            raise
+        resultado = trabalho._reports_atualizados(alteracoes, rows)
+    if any(r.atributos for r in resultado):
+        trabalho.invalidar_cache('Report', 'HistoricoAtualizacao')
+    return resultado
+
+
+async def atualizar_report(cpf_funcionario: str, id_report: int, **alteracoes) -> tuple:
+    resultado = await atualizar_reports(cpf_funcionario, alteracoes, ids=[id_report])
+    if not resultado:
+        raise ValueError(f"Report {id_report} não encontrado")
+    return resultado[0].atributos
+
+
+# -------------------------
+# Usuários
+# -------------------------
+async def iter_usuarios(itersize: Optional[int] = None):
+    """Async generator over every Usuario ordered by nome, via a server-side cursor."""
+    sql = "SELECT cpf, nome, email, dataNascimento, role FROM Usuario ORDER BY nome, cpf"
+    async with get_connection() as conn:
+        async with conn.cursor(name=f"stream_async_{next(_stream_ids)}",
+                               row_factory=args_row(Usuario)) as cur:
+            cur.itersize = itersize or trabalho.STREAM_CONFIG['itersize']
+            await cur.execute(sql)
+            async for usuario in cur:
+                yield usuario
+
+
+async def list_usuarios() -> List[Usuario]:
+    return [u async for u in iter_usuarios()]
+
+
+async def pagina_usuarios(depois_de: Optional[tuple] = None,
+                          limite: int = trabalho.PAGE_SIZE) -> List[Usuario]:
+    """Keyset page of Usuario; see trabalho.pagina_usuarios()."""
+    sql, params = trabalho.sql_pagina_usuarios(depois_de, limite)
+    async with get_connection() as conn:
+        _colunas, rows = await _executar(conn, sql, params)
+    return trabalho.registros(Usuario, rows)
+
+
+# -------------------------
+# Busca textual
+# -------------------------
+async def buscar(termos: str, pagina: int = 1, por_pagina: int = trabalho.PAGE_SIZE,
+                 tipo: str = 'todos', extra: int = 0) -> List[ResultadoBusca]:
+    """Full-text search over reports and comments; see trabalho.buscar()."""
+    sql, params = trabalho.sql_busca(termos, pagina, por_pagina, tipo, extra)
+    async with get_connection() as conn:
+        _colunas, rows = await _executar(conn, sql, params)
+    return trabalho.registros(ResultadoBusca, rows)
+
+
+# -------------------------
+# Consultas (relatórios)
+# -------------------------
+async def _executar_pipeline(conn, itens) -> list:
+    """
+    Sends every (sql, params) of `itens` on `conn` in one pipeline and
+    returns their (columns, rows) in order. Each statement is profiled with
+    the time from the batch being sent to its result being available.
+    """
+    inicio = time.perf_counter()
+    cursores = []
+    resultados = []
+    try:
+        async with conn.pipeline():
+            for sql, params in itens:
+                cur = conn.cursor()
+                cursores.append(cur)
+                await cur.execute(sql, params)
+            for (sql, _params), cur in zip(itens, cursores):
+                rows = await cur.fetchall()
+                resultados.append((tuple(col.name for col in cur.description), rows))
+                if trabalho.PROFILE_CONFIG['enabled']:
+                    trabalho._profiler.record(sql, time.perf_counter() - inicio, 0.0, len(rows))
+    finally:
+        for cur in cursores:
+            await cur.close()
+    return resultados
+
+
+async def executar_consultas(itens, conexoes: Optional[int] = None) -> list:
+    """
+    Runs the reports `itens` ([(nome, params)], params already defaulted)
+    bypassing the cache, spread round-robin over `conexoes` pooled
+    connections (default: the pool size), each one pipelining its share.
+    Returns [(columns, rows)] in the order of `itens`.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+    conexoes = max(1, min(conexoes or trabalho.POOL_CONFIG['maxconn'], len(itens)))
+    partes = [list(range(i, len(itens), conexoes)) for i in range(conexoes)]
+
+    async def rodar(indices):
+        # The share runs in one transaction: each report's CONSULTAS_CONFIG
+        # settings go before it, undoing the ones of the previous report
+        lote, posicoes, anteriores = [], [], set()
+        for i in indices:
+            nome, params = itens[i]
+            ajustes = trabalho.ajustes_consulta(nome)
+            restaurar = sorted(anteriores - set(ajustes))
+            if ajustes or restaurar:
+                lote.append(trabalho.sql_ajustes(ajustes, restaurar))
+            anteriores = set(ajustes)
+            posicoes.append(len(lote))
+            lote.append((trabalho.CONSULTAS[nome], params))
+        async with get_connection() as conn:
+            resultados = await _executar_pipeline(conn, lote)
+        return [resultados[p] for p in posicoes]
+
+    resultados = [None] * len(itens)
+    for indices, parte in zip(partes, await asyncio.gather(*(rodar(p) for p in partes))):
+        for i, resultado in zip(indices, parte):
+            resultados[i] = resultado
+    return resultados
+
+
+async def consultar_varias(nomes=None, params: Optional[dict] = None,
+                           conexoes: Optional[int] = None, usar_cache: bool = True) -> dict:
+    """
+    Runs several reports concurrently; returns {nome: [header, *rows]}.
+
+    `nomes` defaults to every report in CONSULTAS and `params` maps a report
+    name to its parameters. Cached results are served directly; the misses
+    go through executar_consultas() and are cached like consulta_rows() does.
+    """
+    nomes = list(nomes or trabalho.CONSULTAS)
+    params = params or {}
+    resultado = {}
+    pendentes = []
+    for nome in nomes:
+        if nome not in trabalho.CONSULTAS:
+            raise ValueError(f"Relatório desconhecido: {nome}")
+        p = trabalho.parametros_consulta(nome, params.get(nome))
+        key = trabalho.chave_cache(nome, p)
+        cached = trabalho._cache.get(key) if usar_cache else None
+        if cached is not None:
+            resultado[nome] = list(cached)
+            continue
+        tabelas = trabalho.DEPENDENCIAS_CONSULTAS[nome]
+        pendentes.append((nome, p, key, tabelas, trabalho._cache.versions(tabelas)))
+
+    executados = await executar_consultas([(nome, p) for nome, p, *_ in pendentes], conexoes)
+    for (nome, _p, key, tabelas, versions), (colunas, rows) in zip(pendentes, executados):
+        linhas = [colunas, *rows]
+        if usar_cache and len(rows) < trabalho._cache.max_rows:
+            trabalho._cache.put(key, tuple(linhas), tabelas, versions, trabalho.config_consulta(nome).get('ttl'))
+        resultado[nome] = linhas
+    return {nome: resultado[nome] for nome in nomes}
+
+
+async def consulta(nome: str, params: Optional[dict] = None, header: bool = False,
+                   usar_cache: bool = True) -> list:
+    """Rows of report `nome` (async trabalho.consulta_rows(), materialized)."""
+    linhas = (await consultar_varias([nome], {nome: params}, 1, usar_cache))[nome]
+    return linhas if header else linhas[1:]
+
+
+# Default of an argument whose None means something else (e.g. dias=None disables a rule)
+_PADRAO = object()
+
+async def consultar_total_interacoes() -> list:
+    return await consulta('total_interacoes')
+
+async def consultar_reports_por_funcionario() -> list:
+    return await consulta('reports_por_funcionario')
+
+async def consultar_media_avaliacoes() -> list:
+    return await consulta('media_avaliacoes')
+
+async def consultar_funcionarios_todos_categorias(min_percentual: Optional[float] = None) -> list:
+    return await consulta('funcionarios_todos_categorias',
+                          None if min_percentual is None else {'min_percentual': min_percentual})
+
+async def consultar_reports_criticos(dias=_PADRAO, min_interacoes: Optional[int] = None) -> list:
+    """dias=None turns the staleness rule off; omitted, it keeps PARAMETROS_CONSULTAS' default."""
+    params = {} if min_interacoes is None else {'min_interacoes': min_interacoes}
+    if dias is not _PADRAO:
+        params['dias'] = dias
+    return await consulta('reports_criticos', params or None)
+
+async def consultar_areas_problematicas(limite: Optional[int] = None) -> list:
+    return await consulta('areas_problematicas', None if limite is None else {'limite': limite})
+
+async def consultar_comentarios_recentes(limite: Optional[int] = None) -> list:
+    return await consulta('comentarios_recentes', None if limite is None else {'limite': limite})
+
+
+# -------------------------
+# Comparação de vazão síncrono × assíncrono
+# -------------------------
+def _vazao_sync(itens) -> float:
+    """Requests per second running `itens` one after another on trabalho's pool."""
+    inicio = time.perf_counter()
+    for nome, params in itens:
+        with trabalho.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(trabalho.CONSULTAS[nome], params)
+                cur.fetchall()
+    return len(itens) / (time.perf_counter() - inicio)
+
+
+async def _vazao_async(itens) -> float:
+    """Requests per second with one task per request, bounded by the pool size."""
+    inicio = time.perf_counter()
+    await asyncio.gather(*(executar_consultas([item], 1) for item in itens))
+    return len(itens) / (time.perf_counter() - inicio)
+
+
+async def _vazao_pipeline(itens, conexoes: int) -> float:
+    """Requests per second pipelining every request over `conexoes` connections."""
+    inicio = time.perf_counter()
+    await executar_consultas(itens, conexoes)
+    return len(itens) / (time.perf_counter() - inicio)
+
+
+async def _comparar_async(itens, conexoes: int) -> dict:
+    try:
+        await executar_consultas(itens[:conexoes], conexoes)  # open and warm up the pool
+        return {
+            'async (gather)': await _vazao_async(itens),
+            f'async (pipeline, {conexoes} conexões)': await _vazao_pipeline(itens, conexoes),
+        }
+    finally:
+        await close_pool()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compara a vazão dos relatórios no caminho síncrono e no assíncrono.")
+    parser.add_argument('consultas', nargs='*', metavar='consulta',
+                        help="Relatórios a usar (padrão: todos)")
+    parser.add_argument('--requisicoes', type=int, default=100,
+                        help="Total de relatórios executados por modo (padrão 100)")
+    parser.add_argument('--conexoes', type=int, default=4,
+                        help="Conexões usadas no modo pipeline (padrão 4)")
+    trabalho.adicionar_argumentos_config(parser)
+    args = parser.parse_args(argv)
+    trabalho.aplicar_argumentos_config(args, parser)
+
+    nomes = args.consultas or list(trabalho.CONSULTAS)
+    desconhecidas = [n for n in nomes if n not in trabalho.CONSULTAS]
+    if desconhecidas:
+        parser.error(f"consultas desconhecidas: {', '.join(desconhecidas)}")
+    if args.requisicoes < 1 or args.conexoes < 1:
+        parser.error("--requisicoes e --conexoes devem ser positivos")
+
+    itens = [(nome, trabalho.parametros_consulta(nome))
+             for nome in itertools.islice(itertools.cycle(nomes), args.requisicoes)]
+    try:
+        _vazao_sync(itens[:1])  # warm up the pool
+        resultado = {'sync': _vazao_sync(itens)}
+        resultado.update(asyncio.run(_comparar_async(itens, args.conexoes)))
+    except (psycopg.Error, psycopg2.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        trabalho.close_pool()
+
+    base = resultado['sync']
+    print(f"{'Modo':<28} | {'Req/s':>9} | {'× sync':>7}")
+    print("-" * 50)
+    for modo, vazao in resultado.items():
+        print(f"{modo:<28} | {vazao:>9.1f} | {vazao / base:>7.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())